@@ -0,0 +1,319 @@
+"""
+Vectorized (NumPy) computation of the heuristic features of many positions at once.
+
+Positions are stacked in two arrays:
+    cells: (N, 64) int8 array of the cells of each board, indexed by x * 8 + y (see Board.get_cells)
+    turns: (N,) int8 array of the color to move in each position
+Every feature is computed for the player to move, with the same formulas as the boards use,
+so the results match Board.composite_features position by position.
+
+evaluate_batch computes the heuristics of several agent types the same way (with the same values
+as the boards' heuristics), and BatchAlphaBeta uses it to evaluate the leaves of its searches.
+
+NumPy is only needed by the offline tools (e.g. tune_weights.py) and by the players using
+BatchAlphaBeta (they import this module on demand), not by the game itself.
+"""
+import numpy as np
+
+import tuned_weights
+from bit_board import DIRECTION_SHIFTS
+from mini_max import SQUARE_WEIGHTS, AgentType, AlphaBeta
+
+# Internally, the positions are bitboards (like BitBoard: bit x * 8 + y is the cell (x,y)) in uint64 arrays,
+# so each step of the computations is a single NumPy operation on all the positions and directions
+
+# Shifts (as a column, to broadcast over the positions) and masks of the directions shifting left and right
+LEFT_SHIFTS = np.array([[shift] for shift, _ in DIRECTION_SHIFTS if shift > 0], dtype=np.uint64)
+LEFT_MASKS = np.array([[mask] for shift, mask in DIRECTION_SHIFTS if shift > 0], dtype=np.uint64)
+RIGHT_SHIFTS = np.array([[-shift] for shift, _ in DIRECTION_SHIFTS if shift < 0], dtype=np.uint64)
+RIGHT_MASKS = np.array([[mask] for shift, mask in DIRECTION_SHIFTS if shift < 0], dtype=np.uint64)
+DIRECTION_GROUPS = [(np.left_shift, LEFT_SHIFTS, LEFT_MASKS), (np.right_shift, RIGHT_SHIFTS, RIGHT_MASKS)]
+
+# Number of set bits of each byte
+BYTE_POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.int64)
+
+# Square weights of the composite heuristic, indexed by x * 8 + y
+WEIGHTS = np.array(SQUARE_WEIGHTS, dtype=np.float64).reshape(64)
+
+# Corner squares, and the three squares around each one
+CORNERS = np.array([0, 7, 56, 63])
+CORNER_NEIGHBOURS = np.array([[1, 9, 8], [6, 14, 15], [57, 49, 48], [55, 54, 62]])
+
+
+def boards_to_arrays(boards):
+    """
+    Stack the cells and turns of the given boards
+    :param boards: boards supporting get_cells and get_turn
+    :return: (cells, turns) arrays
+    """
+    cells = np.array([board.get_cells() for board in boards], dtype=np.int8).reshape(-1, 64)
+    turns = np.array([board.get_turn() for board in boards], dtype=np.int8)
+    return cells, turns
+
+
+def cells_to_bits(cells, turns):
+    """
+    Convert positions to bitboards
+    :param cells: (N, 64) array of cells
+    :param turns: (N,) array of colors to move
+    :return: (mine, opponent) uint64 arrays of the discs of the player to move and of the opponent
+    """
+    cells = np.asarray(cells).reshape(-1, 64)
+    turns = np.asarray(turns).reshape(-1, 1)
+
+    def pack(discs):
+        return np.packbits(discs, axis=1, bitorder='little').view('<u8').reshape(-1).astype(np.uint64)
+
+    return pack(cells == turns), pack(cells == -turns)
+
+
+def unpack_bits(bits):
+    """ Convert bitboards to (N, 64) boolean arrays (indexed by x * 8 + y) """
+    return np.unpackbits(bits.astype('<u8').view(np.uint8).reshape(-1, 8), axis=1, bitorder='little').astype(bool)
+
+
+def popcount(bits):
+    """ Number of set bits of each bitboard """
+    return BYTE_POPCOUNT[np.ascontiguousarray(bits).view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def neighbour_bits(bits):
+    """ Squares next to (in any direction) the set bits of each bitboard """
+    result = np.zeros_like(bits)
+    for shift, shifts, masks in DIRECTION_GROUPS:
+        result |= np.bitwise_or.reduce(shift(bits, shifts) & masks, axis=0)
+    return result
+
+
+def legal_move_bits(mine, opponent):
+    """
+    Compute the legal moves of many positions (see bit_board.legal_move_bits)
+    :param mine: uint64 array of the discs of the player to move
+    :param opponent: uint64 array of the discs of the opponent
+    :return: uint64 array of the legal moves
+    """
+    empty = ~(mine | opponent)
+    moves = np.zeros_like(mine)
+    for shift, shifts, masks in DIRECTION_GROUPS:
+        targets = opponent & masks
+        line = shift(mine, shifts) & targets
+        for _ in range(5):
+            line |= shift(line, shifts) & targets
+        moves |= np.bitwise_or.reduce(shift(line, shifts) & masks & empty, axis=0)
+    return moves
+
+
+def move_counts(mine, opponent):
+    """ Number of legal moves of the player to move and of the opponent (computed together) """
+    moves = popcount(legal_move_bits(np.concatenate((mine, opponent)), np.concatenate((opponent, mine))))
+    return moves[:len(mine)], moves[len(mine):]
+
+
+def signed_ratio(mine, opponent):
+    """
+    The ratio used by the composite heuristic for the disc and mobility terms:
+    100 * mine / total when mine is larger, -100 * mine / total when it's smaller, 0 otherwise
+    """
+    mine = mine.astype(np.float64)
+    opponent = opponent.astype(np.float64)
+    total = np.maximum(mine + opponent, 1.0)
+    ratio = 100.0 * mine / total
+    return np.where(mine > opponent, ratio, np.where(mine < opponent, -ratio, 0.0))
+
+
+def composite_features(cells, turns):
+    """
+    Compute the composite features (and the token difference) of many positions
+    :param cells: (N, 64) array of cells
+    :param turns: (N,) array of colors to move
+    :return: (N, 7) float array, with the columns in tuned_weights.FEATURES order:
+             p, c, l, m, f, d (see Board.composite_features) and the token difference
+    """
+    return composite_feature_bits(*cells_to_bits(cells, turns))
+
+
+def composite_feature_bits(mine, opponent):
+    """ Same as composite_features, for positions given as bitboards (see cells_to_bits) """
+    my_discs = popcount(mine)
+    opponent_discs = popcount(opponent)
+
+    # Tiles next to an empty square are counted twice (like Board.composite_features)
+    next_to_empty = neighbour_bits(~(mine | opponent))
+    p = signed_ratio(my_discs + popcount(mine & next_to_empty), opponent_discs + popcount(opponent & next_to_empty))
+
+    my_cells = unpack_bits(mine)
+    opponent_cells = unpack_bits(opponent)
+
+    # Corner occupancy
+    c = 25.0 * (my_cells[:, CORNERS].sum(axis=1).astype(np.float64) - opponent_cells[:, CORNERS].sum(axis=1))
+
+    # Corner closeness (squares around the empty corners)
+    empty_corners = ~(my_cells[:, CORNERS] | opponent_cells[:, CORNERS])[:, :, np.newaxis]
+    my_close = (my_cells[:, CORNER_NEIGHBOURS] & empty_corners).sum(axis=(1, 2))
+    opponent_close = (opponent_cells[:, CORNER_NEIGHBOURS] & empty_corners).sum(axis=(1, 2))
+    l = -12.5 * (my_close.astype(np.float64) - opponent_close)
+
+    # Mobility
+    m = signed_ratio(*move_counts(mine, opponent))
+
+    f = np.zeros(len(mine))
+    d = my_cells @ WEIGHTS - opponent_cells @ WEIGHTS
+    token_difference = (my_discs - opponent_discs).astype(np.float64)
+
+    return np.column_stack((p, c, l, m, f, d, token_difference))
+
+
+def corner_occupancy(mine, opponent):
+    """ Corner occupancy (see Board.corner_occupancy) of many positions """
+    corner_mask = np.uint64(sum(1 << int(square) for square in CORNERS))
+    return 25 * (popcount(mine & corner_mask) - popcount(opponent & corner_mask))
+
+
+def mobility(mine, opponent):
+    """ Mobility (see Board.mobility) of many positions """
+    my_moves, opponent_moves = move_counts(mine, opponent)
+
+    # Same formula as Board.mobility: the larger count is used, with the sign of the difference
+    total = np.maximum(my_moves + opponent_moves, 1)
+    return np.where(my_moves > opponent_moves, (100 * my_moves) / total,
+                    np.where(my_moves < opponent_moves, (-100 * opponent_moves) / total, 0.0))
+
+
+def simple_values(mine, opponent):
+    return popcount(mine) - popcount(opponent)
+
+
+def corner_values(mine, opponent):
+    return 10 * (popcount(mine) - popcount(opponent)) + 801 * corner_occupancy(mine, opponent)
+
+
+def mobile_values(mine, opponent):
+    return 10 * (popcount(mine) - popcount(opponent)) + 42 * mobility(mine, opponent)
+
+
+def composite_values(mine, opponent):
+    p, c, l, m, f, d, _ = composite_feature_bits(mine, opponent).T
+    # Same order of operations as Board.composite_heuristic, so the values are identical
+    return (10 * p) + (801.724 * c) + (382.026 * l) + (78.922 * m) + (74.396 * f) + (10 * d)
+
+
+def tuned_values(mine, opponent):
+    features = composite_feature_bits(mine, opponent)
+    values = np.zeros(len(features))
+    for column, weight in enumerate(tuned_weights.get_weights()):
+        values = values + weight * features[:, column]
+    return values
+
+
+# Batch version of the heuristic of each supported agent type, taking bitboards (see cells_to_bits)
+BATCH_HEURISTICS = {
+    AgentType.simple: simple_values,
+    AgentType.corner: corner_values,
+    AgentType.mobile: mobile_values,
+    AgentType.composite: composite_values,
+    AgentType.tuned: tuned_values,
+}
+
+
+def evaluate_batch(cells, turns, agent_type: AgentType):
+    """
+    Evaluate many positions with the heuristic of an agent type
+    :param cells: (N, 64) array of cells (see boards_to_arrays)
+    :param turns: (N,) array of colors to move
+    :param agent_type: agent type (one of BATCH_HEURISTICS)
+    :return: (N,) array of values, for the player to move in each position
+    """
+    return evaluate_bits(*cells_to_bits(cells, turns), agent_type=agent_type)
+
+
+def evaluate_bits(mine, opponent, agent_type: AgentType):
+    """
+    Same as evaluate_batch, for positions given as bitboards
+    :param mine: uint64 array of the discs of the player to move
+    :param opponent: uint64 array of the discs of the opponent
+    :param agent_type: agent type (one of BATCH_HEURISTICS)
+    :return: (N,) array of values, for the player to move in each position
+    """
+    if agent_type not in BATCH_HEURISTICS:
+        raise ValueError('No batch evaluation for the {} heuristic'.format(agent_type.value))
+    return BATCH_HEURISTICS[agent_type](mine, opponent)
+
+
+class BatchAlphaBeta(AlphaBeta):
+    """
+    AlphaBeta evaluating the leaves in batches: when the search reaches a node one ply above the leaves,
+    all its successors are evaluated with a single evaluate_bits call, then the node is searched as usual,
+    with the heuristic replaced by a lookup of the batch values.
+
+    The search itself is unchanged (same moves, cut-offs, transposition table use and statistics), so the
+    results are the same as AlphaBeta's; the evaluations of the leaves that are cut off are wasted.
+    """
+
+    def __init__(self, max_depth: int, agent_type: AgentType, **options):
+        """
+        :param max_depth: maximum depth of the search
+        :param agent_type: type of the agent (one of BATCH_HEURISTICS)
+        :param options: other options of AlphaBeta
+        """
+        if agent_type not in BATCH_HEURISTICS:
+            raise ValueError('No batch evaluation for the {} heuristic'.format(agent_type.value))
+        super().__init__(max_depth, agent_type, **options)
+
+        # Values of the leaves of the batch being searched, by hash (None outside of a batch)
+        self._batch_values = None  # type: dict
+
+    def maxi_min(self, board, depth: int, alpha, beta):
+        if self._batch_values is None and depth + 1 >= self._depth_limit:
+            return self._search_batch(super().maxi_min, board, depth, alpha, beta)
+        return super().maxi_min(board, depth, alpha, beta)
+
+    def mini_max(self, board, depth: int, alpha, beta):
+        if self._batch_values is None and depth + 1 >= self._depth_limit:
+            return self._search_batch(super().mini_max, board, depth, alpha, beta)
+        return super().mini_max(board, depth, alpha, beta)
+
+    def _search_batch(self, search, board, depth: int, alpha, beta):
+        """
+        Evaluate the leaves under the node (its successors, or the node itself) together, then search it
+        :param search: search function of the node (AlphaBeta's maxi_min or mini_max)
+        :return: best move and value, like maxi_min/mini_max
+        """
+        keys = []
+        positions = []
+        self._collect_leaves(board, depth, keys, positions, hasattr(board, 'get_bits'))
+
+        if hasattr(board, 'get_bits'):
+            mine, opponent = np.array(positions, dtype=np.uint64).reshape(-1, 2).T
+        else:
+            cells, turns = zip(*positions) if positions else ((), ())
+            mine, opponent = cells_to_bits(np.array(cells, dtype=np.int8), np.array(turns, dtype=np.int8))
+        self._batch_values = dict(zip(keys, evaluate_bits(mine, opponent, self.agent_type).tolist()))
+
+        heuristic = self._evaluate
+        self._evaluate = self._batch_value
+        try:
+            return search(board, depth, alpha, beta)
+        finally:
+            self._evaluate = heuristic
+            self._batch_values = None
+
+    def _collect_leaves(self, board, depth: int, keys, positions, bits: bool):
+        """
+        Add the hash and the position of every leaf under the board (the positions the search could evaluate)
+        :param bits: add the positions as bitboards (mine, opponent), otherwise as (cells, turn)
+        """
+        if depth == self._depth_limit or board.is_game_over():
+            keys.append(board.get_hash())
+            turn = board.get_turn()
+            positions.append((board.get_bits(turn), board.get_bits(-turn)) if bits else (board.get_cells(), turn))
+            return
+
+        # Same moves as the search (a pass when there isn't any legal move)
+        for move in board.get_legal_moves() or [None]:
+            undo = board.make_move(move)
+            self._collect_leaves(board, depth + 1, keys, positions, bits)
+            board.unmake_move(undo)
+
+    def _batch_value(self, board):
+        """ Heuristic used during a batch: the value computed for the leaf """
+        return self._batch_values[board.get_hash()]
@@ -0,0 +1,4 @@
+"""
+Benchmarks for the board engines and the search (run from the repository root):
+    python -m benchmarks.run_benchmarks --help
+"""
@@ -0,0 +1,321 @@
+"""
+Benchmark suite for the board engines and the search.
+
+Runs:
+    - perft: number of leaf positions reached by playing every legal move up to a depth
+      (a pass counts as a move, and a finished game counts as a leaf). The counts are
+      compared between the engines, and with the known values from the initial position,
+      so they also check the correctness of the move generator.
+    - search: fixed-depth AlphaBeta searches for every agent type on a set of positions
+    - drivers: iterative deepening (with a transposition table and move ordering) with every search
+      algorithm and driver, for every agent type on the same positions
+    - lazy_smp: time to complete the same iterative deepening searches with Lazy SMP, with 1, 2, 4, ...
+      processes (up to --workers), for every agent type on the same positions
+    - heuristics: evaluation of every heuristic on the same positions
+    - boards: time to copy a board, and memory used by each copy
+
+Results are printed, and written as JSON (with --json) so runs can be compared across commits:
+    python -m benchmarks.run_benchmarks --json bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from lazy_smp import LazySMPAlphaBeta
+from mini_max import AgentType, AlphaBeta, MoveOrderer, SearchDriver
+import parallel_search
+from pv_search import PVSearch
+from transposition import SharedTranspositionTable, TranspositionTable
+from utils import BoardEngine, create_board, convert_board, create_pass_configuration_board
+
+# Known perft counts from the initial position (index is the depth)
+INITIAL_PERFT = [1, 4, 12, 56, 244, 1396, 8200, 55092, 390216, 3005288]
+
+# Number of random plies (from the initial position) of the curated positions
+POSITION_PLIES = [8, 20, 32, 44]
+POSITION_SEED = 472
+
+
+def perft(board, depth: int, passed=False):
+    """
+    Count the leaf positions at the given depth
+    :param board: board to start from (it is modified during the count, and restored)
+    :param depth: number of moves (plies) to play
+    :param passed: whether the previous move was a pass
+    :return: number of leaf positions
+    """
+    if depth == 0:
+        return 1
+
+    moves = board.get_legal_moves()
+    if not moves:
+        if passed:
+            # Game over
+            return 1
+        undo = board.make_move(None)
+        count = perft(board, depth - 1, True)
+        board.unmake_move(undo)
+        return count
+
+    if depth == 1:
+        return len(moves)
+
+    count = 0
+    for move in moves:
+        undo = board.make_move(move)
+        count += perft(board, depth - 1)
+        board.unmake_move(undo)
+    return count
+
+
+def create_positions(engine: BoardEngine):
+    """
+    Create the positions used by the benchmarks: the initial position, the pass configuration
+    and positions reached by playing random (but reproducible) moves
+    :return: list of (name, board)
+    """
+    positions = [('initial', create_board(engine)),
+                 ('pass', convert_board(create_pass_configuration_board(), engine))]
+
+    generator = random.Random(POSITION_SEED)
+    for plies in POSITION_PLIES:
+        board = create_board(engine)
+        for _ in range(plies):
+            # Sort the moves so both engines play the same game
+            moves = sorted(board.get_legal_moves())
+            board = board.execute_move(generator.choice(moves) if moves else None)
+        positions.append(('ply {}'.format(plies), board))
+    return positions
+
+
+def rate(count, elapsed_time):
+    return count / elapsed_time if elapsed_time > 0 else 0.0
+
+
+def run_perft(engine: BoardEngine, depth: int):
+    print('perft ({}):'.format(engine.value))
+    results = []
+    for name, board in create_positions(engine)[:2]:
+        board = board.clone()
+        for current_depth in range(1, depth + 1):
+            start_time = time.time()
+            count = perft(board, current_depth)
+            elapsed_time = time.time() - start_time
+            results.append({'position': name, 'depth': current_depth, 'count': count,
+                            'time': elapsed_time, 'nodes_per_second': rate(count, elapsed_time)})
+            print('\t{:10} depth {:2}: {:10} positions {:9.3f}s {:12.0f} positions/s'.format(
+                name, current_depth, count, elapsed_time, rate(count, elapsed_time)))
+    return results
+
+
+def run_search(engine: BoardEngine, depth: int, agent_types):
+    print('search ({}, depth {}):'.format(engine.value, depth))
+    results = []
+    for agent_type in agent_types:
+        for name, board in create_positions(engine):
+            agent = AlphaBeta(depth, agent_type, collect_stats=True)
+            move, value, stats = agent.get_best_action_value_and_stats(board, float("inf"))
+            results.append({'agent': agent_type.value, 'position': name, 'depth': depth,
+                            'move': move, 'value': value, 'nodes': stats.nodes, 'time': stats.elapsed_time,
+                            'nodes_per_second': stats.nodes_per_second(),
+                            'branching_factor': stats.effective_branching_factor()})
+            print('\t{:10} {:10}: {:9} nodes {:9.3f}s {:10.0f} nodes/s  EBF {:5.2f}'.format(
+                agent_type.value, name, stats.nodes, stats.elapsed_time, stats.nodes_per_second(),
+                stats.effective_branching_factor()))
+    return results
+
+
+def run_drivers(engine: BoardEngine, depth: int, agent_types):
+    print('drivers ({}, iterative deepening to depth {}):'.format(engine.value, depth))
+    results = []
+    positions = create_positions(engine)
+    for agent_type in agent_types:
+        for search_class in (AlphaBeta, PVSearch):
+            for driver in SearchDriver:
+                if driver == SearchDriver.mtdf and not search_class.fail_soft:
+                    continue
+                nodes = root_searches = 0
+                elapsed_time = 0.0
+                for name, board in positions:
+                    agent = search_class(depth, agent_type, iterative=True, table=TranspositionTable(18),
+                                         ordering=MoveOrderer(), collect_stats=True, driver=driver)
+                    _, _, stats = agent.get_best_action_value_and_stats(board, float("inf"))
+                    nodes += stats.nodes
+                    root_searches += stats.root_searches
+                    elapsed_time += stats.elapsed_time
+                results.append({'agent': agent_type.value, 'search': search_class.__name__, 'driver': driver.value,
+                                'depth': depth, 'nodes': nodes, 'root_searches': root_searches,
+                                'time': elapsed_time, 'nodes_per_second': rate(nodes, elapsed_time)})
+                print('\t{:10} {:10} {:10}: {:9} nodes {:9.3f}s {:5} root searches'.format(
+                    agent_type.value, search_class.__name__, driver.value, nodes, elapsed_time, root_searches))
+    return results
+
+
+def run_lazy_smp(engine: BoardEngine, depth: int, agent_types, workers: int):
+    print('lazy_smp ({}, iterative deepening to depth {}):'.format(engine.value, depth))
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= workers:
+        worker_counts.append(worker_counts[-1] * 2)
+    results = []
+    positions = create_positions(engine)
+    for agent_type in agent_types:
+        single_time = 0.0
+        for worker_count in worker_counts:
+            nodes = 0
+            elapsed_time = 0.0
+            for name, board in positions:
+                table = SharedTranspositionTable(18)
+                agent = LazySMPAlphaBeta(depth, agent_type, workers=worker_count, iterative=True, table=table,
+                                         ordering=MoveOrderer(), collect_stats=True)
+                _, _, stats = agent.get_best_action_value_and_stats(board, float("inf"))
+                nodes += stats.nodes
+                elapsed_time += stats.elapsed_time
+                table.release()
+            if worker_count == 1:
+                single_time = elapsed_time
+            speed_up = single_time / elapsed_time if elapsed_time > 0 else 0.0
+            results.append({'agent': agent_type.value, 'workers': worker_count, 'depth': depth, 'nodes': nodes,
+                            'time': elapsed_time, 'speed_up': speed_up,
+                            'nodes_per_second': rate(nodes, elapsed_time)})
+            print('\t{:10} {:3} workers: {:9} nodes {:9.3f}s  speed-up {:5.2f}'.format(
+                agent_type.value, worker_count, nodes, elapsed_time, speed_up))
+    parallel_search.shutdown()
+    return results
+
+
+def run_heuristics(engine: BoardEngine, repetitions: int, agent_types):
+    print('heuristics ({}, {} evaluations per position):'.format(engine.value, repetitions))
+    results = []
+    positions = create_positions(engine)
+    for agent_type in agent_types:
+        # Evaluate fresh copies, so the legal moves cached by a board aren't reused between repetitions
+        boards = [board.clone() for _ in range(repetitions) for _, board in positions]
+        evaluate = type(boards[0]).HEURISTICS[agent_type]
+        start_time = time.time()
+        for board in boards:
+            evaluate(board)
+        elapsed_time = time.time() - start_time
+        count = len(boards)
+        results.append({'agent': agent_type.value, 'evaluations': count, 'time': elapsed_time,
+                        'evaluations_per_second': rate(count, elapsed_time)})
+        print('\t{:10}: {:9.3f}s {:12.0f} evaluations/s'.format(
+            agent_type.value, elapsed_time, rate(count, elapsed_time)))
+    return results
+
+
+def run_boards(engine: BoardEngine, count: int):
+    print('boards ({}, {} copies per position):'.format(engine.value, count))
+    results = []
+    for name, board in create_positions(engine):
+        start_time = time.time()
+        for _ in range(count):
+            board.clone()
+        elapsed_time = time.time() - start_time
+
+        # Memory held by the copies (the ones above are freed right away, so keep these alive)
+        tracemalloc.start()
+        copies = [board.clone() for _ in range(count)]
+        size = tracemalloc.get_traced_memory()[0] / count
+        tracemalloc.stop()
+        del copies
+
+        results.append({'position': name, 'copies': count, 'time': elapsed_time,
+                        'copies_per_second': rate(count, elapsed_time), 'bytes_per_board': size})
+        print('\t{:10}: {:9.3f}s {:12.0f} copies/s {:8.0f} bytes/board'.format(
+            name, elapsed_time, rate(count, elapsed_time), size))
+    return results
+
+
+def check_perft(results):
+    """
+    Check the perft counts against the known values and between the engines
+    :param results: perft results of each engine
+    :return: list of error messages
+    """
+    errors = []
+    counts = dict()
+    for engine, engine_results in results.items():
+        for result in engine_results:
+            key = (result['position'], result['depth'])
+            if result['position'] == 'initial' and result['depth'] < len(INITIAL_PERFT) and \
+                    result['count'] != INITIAL_PERFT[result['depth']]:
+                errors.append('{}: perft {} is {} instead of {}'.format(
+                    engine, key, result['count'], INITIAL_PERFT[result['depth']]))
+            if key in counts and counts[key][1] != result['count']:
+                errors.append('perft {}: {} counts {} but {} counts {}'.format(
+                    key, counts[key][0], counts[key][1], engine, result['count']))
+            counts.setdefault(key, (engine, result['count']))
+    return errors
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    engines = [member.value for _, member in BoardEngine.__members__.items()]
+    agents = [member.value for _, member in AgentType.__members__.items()]
+
+    parser = argparse.ArgumentParser(description='Benchmarks for the Othello Board Engines and Search')
+    parser.add_argument('-e', '--engine', help='Board Engines to Benchmark (default = all)',
+                        choices=engines, nargs='+', default=engines)
+    parser.add_argument('-a', '--agent', help='Agent Types to Benchmark (default = all)',
+                        choices=agents, nargs='+', default=agents)
+    parser.add_argument('-pd', '--perft_depth', help='Maximum perft Depth (default = 6)', type=int, default=6)
+    parser.add_argument('-sd', '--search_depth', help='Depth of the Searches (default = 4)', type=int, default=4)
+    parser.add_argument('-r', '--repetitions', help='Evaluations of each Heuristic per Position (default = 200)',
+                        type=int, default=200)
+    parser.add_argument('-b', '--boards', help='Copies of each Position for the Board Benchmark (default = 20000)',
+                        type=int, default=20000)
+    parser.add_argument('-w', '--workers', help='Maximum Number of Processes of the Lazy SMP Benchmark '
+                                                '(default = 0: all CPU cores)', type=int, default=0)
+    parser.add_argument('-s', '--skip', help='Benchmarks to Skip',
+                        choices=['perft', 'search', 'drivers', 'lazy_smp', 'heuristics', 'boards'], nargs='*',
+                        default=[])
+    parser.add_argument('--json', help='File to Write the Results to (as JSON)')
+    args = parser.parse_args()
+
+    agent_types = [AgentType(agent) for agent in args.agent]
+    report = {'commit': get_commit(), 'python': platform.python_version(), 'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+              'perft': dict(), 'search': dict(), 'drivers': dict(), 'lazy_smp': dict(), 'heuristics': dict(),
+              'boards': dict()}
+    workers = args.workers if args.workers > 0 else os.cpu_count() or 1
+
+    for engine in (BoardEngine(value) for value in args.engine):
+        if 'perft' not in args.skip:
+            report['perft'][engine.value] = run_perft(engine, args.perft_depth)
+        if 'search' not in args.skip:
+            report['search'][engine.value] = run_search(engine, args.search_depth, agent_types)
+        if 'drivers' not in args.skip:
+            report['drivers'][engine.value] = run_drivers(engine, args.search_depth, agent_types)
+        if 'lazy_smp' not in args.skip:
+            report['lazy_smp'][engine.value] = run_lazy_smp(engine, args.search_depth, agent_types, workers)
+        if 'heuristics' not in args.skip:
+            report['heuristics'][engine.value] = run_heuristics(engine, args.repetitions, agent_types)
+        if 'boards' not in args.skip:
+            report['boards'][engine.value] = run_boards(engine, args.boards)
+
+    errors = check_perft(report['perft'])
+    report['errors'] = errors
+    for error in errors:
+        print('ERROR: {}'.format(error))
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(report, json_file, indent=2)
+
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,637 @@
+"""
+Bitboard implementation of the Othello board.
+
+The board is stored as two 64-bit integers (one for black pieces and one for white pieces),
+and moves and flips are computed with shifts and masks instead of walking the cells one by one.
+It exposes the same public API as board.Board, so it can be used by AlphaBeta and OthelloRunner
+as a drop-in replacement.
+
+Squares are numbered column by column, the same way Board indexes its pieces:
+    square = x * 8 + y
+so bit 0 is (0,0) (A1), bit 7 is (0,7) (A8) and bit 63 is (7,7) (H8).
+"""
+import operator
+
+from board import Board, BLACK, WHITE, EMPTY, ZOBRIST_KEYS, ZOBRIST_TURN_KEY, RAYS, NEIGHBOURS
+from mini_max import AgentType, SQUARE_WEIGHTS
+import pattern_eval
+import tuned_weights
+
+FULL_MASK = 0xFFFFFFFFFFFFFFFF
+
+# Squares with y == 0 and y == 7 (used to stop shifts from wrapping to the next column)
+ROW_1_MASK = 0x0101010101010101
+ROW_8_MASK = 0x8080808080808080
+
+
+def _direction_shifts():
+    """
+    Build the (shift, mask) pair for each of the 8 directions.
+    The mask removes the squares that a shift would wrap to from the previous/next column.
+    """
+    result = []
+    for dx, dy in [(1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1), (0, 1)]:
+        mask = FULL_MASK
+        if dy == 1:
+            mask &= ~ROW_1_MASK
+        elif dy == -1:
+            mask &= ~ROW_8_MASK
+        result.append((dx * 8 + dy, mask & FULL_MASK))
+    return result
+
+
+DIRECTION_SHIFTS = _direction_shifts()
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(bits):
+        return bin(bits).count('1')
+
+
+def square_bit(x, y):
+    """ Return the bit corresponding to cell (x,y) """
+    return 1 << (x * 8 + y)
+
+
+def iterate_squares(bits):
+    """
+    Generator of the (x,y) coordinates of every set bit, in increasing square order
+    :param bits: bitboard to iterate
+    :return: cell coordinates of the set bits
+    """
+    while bits:
+        lowest = bits & -bits
+        square = lowest.bit_length() - 1
+        yield square >> 3, square & 7
+        bits ^= lowest
+
+
+def legal_move_bits(me, opponent):
+    """
+    Compute the bitboard of legal moves for the player owning 'me'
+    :param me: bitboard of the player to move
+    :param opponent: bitboard of the opponent
+    :return: bitboard where every set bit is a legal move
+    """
+    empty = ~(me | opponent) & FULL_MASK
+    moves = 0
+    for shift, mask in DIRECTION_SHIFTS:
+        targets = opponent & mask
+        if shift > 0:
+            line = (me << shift) & targets
+            line |= (line << shift) & targets
+            line |= (line << shift) & targets
+            line |= (line << shift) & targets
+            line |= (line << shift) & targets
+            line |= (line << shift) & targets
+            moves |= (line << shift) & mask & empty
+        else:
+            shift = -shift
+            line = (me >> shift) & targets
+            line |= (line >> shift) & targets
+            line |= (line >> shift) & targets
+            line |= (line >> shift) & targets
+            line |= (line >> shift) & targets
+            line |= (line >> shift) & targets
+            moves |= (line >> shift) & mask & empty
+    return moves
+
+
+# The rays and neighbours of board.RAYS / board.NEIGHBOURS as bits, indexed by square:
+# RAY_BITS[square] holds the non-empty rays (bits ordered from the closest to the farthest square)
+RAY_BITS = [tuple(tuple(square_bit(i, j) for i, j in ray) for ray in RAYS[x][y] if ray)
+            for x in range(8) for y in range(8)]
+NEIGHBOUR_MASKS = [sum(square_bit(i, j) for i, j in NEIGHBOURS[x][y]) for x in range(8) for y in range(8)]
+
+
+def flip_bits(me, opponent, square):
+    """
+    Compute the pieces flipped by playing on the given square
+    :param me: bitboard of the player to move
+    :param opponent: bitboard of the opponent
+    :param square: index of the square to play (x * 8 + y)
+    :return: bitboard of the opponent pieces that would be flipped (0 if the move is not legal)
+    """
+    flips = 0
+    if not NEIGHBOUR_MASKS[square] & opponent:
+        return flips
+
+    for ray in RAY_BITS[square]:
+        line = 0
+        for bit in ray:
+            if bit & opponent:
+                line |= bit
+            else:
+                if line and bit & me:
+                    flips |= line
+                break
+    return flips
+
+
+def neighbour_bits(bits):
+    """ Return the bitboard of all the squares adjacent to at least one square of 'bits' """
+    result = 0
+    for shift, mask in DIRECTION_SHIFTS:
+        if shift > 0:
+            result |= (bits << shift) & mask
+        else:
+            result |= (bits >> -shift) & mask
+    return result
+
+
+# Square weights used by the composite heuristic, grouped by value so they can be applied with masks
+def _weight_masks():
+    masks = dict()
+    for x in range(8):
+        for y in range(8):
+            weight = SQUARE_WEIGHTS[x][y]
+            masks[weight] = masks.get(weight, 0) | square_bit(x, y)
+    return list(masks.items())
+
+
+WEIGHT_MASKS = _weight_masks()
+
+# Corners, each with the three squares next to it
+CORNERS = [(square_bit(0, 0), square_bit(0, 1) | square_bit(1, 1) | square_bit(1, 0)),
+           (square_bit(0, 7), square_bit(0, 6) | square_bit(1, 6) | square_bit(1, 7)),
+           (square_bit(7, 0), square_bit(7, 1) | square_bit(6, 1) | square_bit(6, 0)),
+           (square_bit(7, 7), square_bit(6, 7) | square_bit(6, 6) | square_bit(7, 6))]
+CORNER_MASK = CORNERS[0][0] | CORNERS[1][0] | CORNERS[2][0] | CORNERS[3][0]
+
+
+class BitBoard:
+    # Boards are created for every node of the search, so keep them small
+    __slots__ = ('__black', '__white', '__turn', '__flips', '__hash', '__move_bits')
+
+    def __init__(self, turn=BLACK):
+        """ Set up initial board configuration. """
+        self.__black = square_bit(3, 3) | square_bit(4, 4)
+        self.__white = square_bit(3, 4) | square_bit(4, 3)
+
+        # Current turn
+        self.__turn = turn
+
+        # Total number of flips because of a move
+        self.__flips = 0
+
+        # Zobrist hash of the position (computed lazily, then updated incrementally by execute_move)
+        self.__hash = None
+
+        # Legal move bitboard of each color (computed lazily, dropped whenever the pieces change)
+        self.__move_bits = dict()
+
+    @property
+    def heuristics(self):
+        """ Heuristic functions of the different agent types, bound to this board (see HEURISTICS) """
+        return {agent_type: function.__get__(self) for agent_type, function in self.HEURISTICS.items()}
+
+    @staticmethod
+    def from_board(board):
+        """
+        Create a bitboard with the same pieces and turn as the given board
+        :param board: board to convert (any object supporting the [x][y] indexer and get_turn)
+        :return: the equivalent bitboard
+        """
+        result = BitBoard(board.get_turn())
+        result.__black = 0
+        result.__white = 0
+        for x in range(8):
+            for y in range(8):
+                if board[x][y] == BLACK:
+                    result.__black |= square_bit(x, y)
+                elif board[x][y] == WHITE:
+                    result.__white |= square_bit(x, y)
+        return result
+
+    def to_board(self):
+        """
+        Convert the bitboard to a list-based board
+        :return: a Board with the same pieces and turn
+        """
+        result = Board(self.__turn)
+        for x in range(8):
+            for y in range(8):
+                result[x][y] = self[x][y]
+        return result
+
+    def clone(self):
+        """
+        Returns a copy of the current board
+        :return: a copy of the current board
+        """
+        # Skip __init__, every field is set here
+        cloned = BitBoard.__new__(BitBoard)
+        cloned.__black = self.__black
+        cloned.__white = self.__white
+        cloned.__turn = self.__turn
+        cloned.__flips = 0
+        cloned.__hash = self.__hash
+        cloned.__move_bits = dict()
+        return cloned
+
+    # Add read-only [][] indexer syntax to the BitBoard: the column is a tuple, so board[x][y] = color raises a
+    # TypeError instead of changing a copy (edit a Board, then convert it with from_board)
+    def __getitem__(self, index):
+        black, white = self.__black, self.__white
+        return tuple(BLACK if black & square_bit(index, y) else WHITE if white & square_bit(index, y) else EMPTY
+                     for y in range(8))
+
+    def get_cells(self):
+        """
+        Get all the cells, column by column (the cell (x,y) is at index x * 8 + y)
+        :return: list of the 64 cell colors
+        """
+        black, white = self.__black, self.__white
+        return [BLACK if black >> square & 1 else WHITE if white >> square & 1 else EMPTY for square in range(64)]
+
+    def get_bits(self, color):
+        """ Get the bitboard of the given color (1 for white, -1 for black) """
+        return self.__black if color == BLACK else self.__white
+
+    def get_turn(self):
+        """ Get the current turn (-1 is black and 1 is white) """
+        return self.__turn
+
+    def change_turn(self):
+        """ Change the current turn to the other color """
+        self.__turn = -self.__turn
+        if self.__hash is not None:
+            self.__hash ^= ZOBRIST_TURN_KEY
+
+    def get_hash(self):
+        """
+        Get the Zobrist hash of the position (same keys as Board, so both engines hash a position the same way)
+        :return: 64-bit hash of the board
+        """
+        if self.__hash is None:
+            self.__hash = ZOBRIST_TURN_KEY if self.__turn == WHITE else 0
+            for x, y in iterate_squares(self.__black):
+                self.__hash ^= ZOBRIST_KEYS[BLACK][x * 8 + y]
+            for x, y in iterate_squares(self.__white):
+                self.__hash ^= ZOBRIST_KEYS[WHITE][x * 8 + y]
+        return self.__hash
+
+    def create_pass_successor(self):
+        result_board = self.clone()
+        result_board.change_turn()
+        return [(None, result_board)]
+
+    def is_game_over(self):
+        """ Check whether the game is over """
+        return self._move_bits(BLACK) == 0 and self._move_bits(WHITE) == 0
+
+    def display_official(self):
+        """Board display according to specs."""
+        result = "(\n"
+        for y in range(7, -1, -1):
+            result += "("
+            for x in range(8):
+                bit = square_bit(x, y)
+                result += "B" if self.__black & bit else "W" if self.__white & bit else "0"
+            result += ")\n"
+        result += ")"
+        return result
+
+    def __display(self):
+        """" Display the board. """
+        result = "    A B C D E F G H" + '\n'
+        result += "    ---------------" + '\n'
+        for y in range(7, -1, -1):
+            result += str(y + 1) + ' | '
+            for x in range(8):
+                bit = square_bit(x, y)
+                result += "B " if self.__black & bit else "W " if self.__white & bit else ". "
+            result += '| ' + str(y + 1) + '\n'
+        result += "    ---------------" + '\n'
+        result += "    A B C D E F G H" + '\n'
+        return result
+
+    def print_statistics(self):
+        """
+        Prints statistics: number of cells for each color, along with current turn
+        """
+        print("STATISTICS:")
+        print("-----------")
+        print("Black: {}".format(self.count(-1)))
+        print("White: {}".format(self.count(1)))
+        print("Current turn: {}".format(BitBoard.get_color_string(self.__turn)))
+
+    def __repr__(self):
+        return 'BitBoard(black={:#018x}, white={:#018x}, turn={})'.format(self.__black, self.__white, self.__turn)
+
+    def __str__(self):
+        """
+        Return the string representation of the board
+        :return: string representation of the board
+        """
+        return self.__display()
+
+    def count(self, color=10):
+        """
+        Count the number of pieces of the given color.
+        :param color: 1 for white, -1 for black, 0 for empty spaces (If not specified, uses current turn)
+        :return: number of cells associated with the specified color
+        """
+        # If color isn't specified, choose the current turn
+        if color == 10:
+            color = self.__turn
+
+        if color == BLACK:
+            return popcount(self.__black)
+        if color == WHITE:
+            return popcount(self.__white)
+        if color == EMPTY:
+            return 64 - popcount(self.__black | self.__white)
+        return 0
+
+    def get_final_score(self):
+        """
+        Get the final score of the two players; first one is for black, and second one is for white
+        :return:
+        """
+        black_count = popcount(self.__black)
+        white_count = popcount(self.__white)
+        total = black_count + white_count
+        if black_count == white_count:
+            return black_count, white_count
+        elif black_count > white_count:
+            return black_count + 64 - total, white_count
+        else:
+            return black_count, white_count + 64 - total
+
+    def get_squares(self, color=10):
+        """
+        Get the coordinates (x,y) for all pieces on the board of the given color.
+        :param color: 1 for white, -1 for black, 0 for empty spaces (If not specified, uses current turn)
+        :return: list of cell coordinates containing the specified color
+        """
+        # If color isn't specified, choose the current turn
+        if color == 10:
+            color = self.__turn
+
+        if color == EMPTY:
+            bits = ~(self.__black | self.__white) & FULL_MASK
+        else:
+            bits = self.get_bits(color)
+        return list(iterate_squares(bits))
+
+    def get_successors(self, color=0):
+        """
+        Get the successor states from the current board
+        :param color: color to do the move (If not specified uses current turn's color)
+        :return: list of successor board states
+        """
+        if color == 0:
+            color = self.__turn
+
+        return [(move, self.execute_move(move, color)) for move in self.get_legal_moves(color)]
+
+    def get_legal_moves(self, color=0):
+        """
+        Return all the legal moves for the given color.
+        :param color: 1 for white, -1 for black (If not specified, uses current turn)
+        :return: list of legal moves for the specified color
+        """
+        # If color isn't specified, choose the current turn
+        if color == 0:
+            color = self.__turn
+
+        return list(iterate_squares(self._move_bits(color)))
+
+    def _move_bits(self, color):
+        """
+        Get the bitboard of legal moves of the given color, computing it only once per position
+        :param color: 1 for white, -1 for black
+        :return: bitboard where every set bit is a legal move
+        """
+        moves = self.__move_bits.get(color)
+        if moves is None:
+            if color == BLACK:
+                moves = legal_move_bits(self.__black, self.__white)
+            else:
+                moves = legal_move_bits(self.__white, self.__black)
+            self.__move_bits[color] = moves
+        return moves
+
+    def execute_move(self, move, color=0):
+        """
+        Perform the given move on the board, and flips pieces as necessary.
+        :param move: the move to be executed on the board
+        :param color: 1 for white, -1 for black (If not specified, uses current turn)
+        :return: a new board with the move applied to it
+        """
+        # Create a copy and apply the change to the copy
+        result_board = self.clone()
+        result_board.make_move(move, color)
+
+        return result_board
+
+    def make_move(self, move, color=0):
+        """
+        Perform the given move on this board (in place), flipping pieces as necessary.
+        :param move: the move to be executed on the board (None to pass)
+        :param color: 1 for white, -1 for black (If not specified, uses current turn)
+        :return: information needed by unmake_move to restore the board
+        """
+        # If color isn't specified, choose the current turn
+        if color == 0:
+            color = self.__turn
+
+        if move is not None:
+            self.get_hash()
+
+        undo = (self.__black, self.__white, self.__flips, self.__hash, self.__move_bits)
+        self.__flips = 0
+
+        if move is not None:
+            self.__move_bits = dict()
+            square = move[0] * 8 + move[1]
+            move_bit = 1 << square
+            if color == BLACK:
+                flips = flip_bits(self.__black, self.__white, square)
+                if flips:
+                    self.__black |= flips | move_bit
+                    self.__white &= ~flips
+            else:
+                flips = flip_bits(self.__white, self.__black, square)
+                if flips:
+                    self.__white |= flips | move_bit
+                    self.__black &= ~flips
+
+            if flips:
+                # Same as Board: the played square counts as a flip when the move is legal
+                self.__flips = popcount(flips) + 1
+
+                black_keys = ZOBRIST_KEYS[BLACK]
+                white_keys = ZOBRIST_KEYS[WHITE]
+                self.__hash ^= ZOBRIST_KEYS[color][move[0] * 8 + move[1]]
+                for x, y in iterate_squares(flips):
+                    self.__hash ^= black_keys[x * 8 + y] ^ white_keys[x * 8 + y]
+
+        self.change_turn()
+
+        return undo
+
+    def unmake_move(self, undo):
+        """
+        Restore the board to the state it had before make_move
+        :param undo: value returned by make_move
+        """
+        self.__black, self.__white, self.__flips, self.__hash, self.__move_bits = undo
+        self.__turn = -self.__turn
+
+    def generate_successors(self, color=0):
+        """
+        Lazily generate the successor states from the current board (a board is only created when it's needed)
+        :param color: color to do the move (If not specified uses current turn's color)
+        :return: generator of (move, successor board)
+        """
+        if color == 0:
+            color = self.__turn
+
+        for move in self.get_legal_moves(color):
+            yield move, self.execute_move(move, color)
+
+    # ################# Functions used for heuristics ##########################
+
+    def _own_bits(self):
+        """ Get the bitboards of the current player and the opponent """
+        if self.__turn == BLACK:
+            return self.__black, self.__white
+        return self.__white, self.__black
+
+    def get_last_flip_count(self):
+        """
+        Get the number of flips caused by executing the last move on the board
+        :return: number of flips caused by the move
+        """
+        return self.__flips
+
+    def get_token_difference(self):
+        """
+        Get the difference between the tokens between the current player and the opponent
+        :return: difference between the tokens in the board
+        """
+        me, opponent = self._own_bits()
+        return popcount(me) - popcount(opponent)
+
+    def composite_features(self):
+        """
+        Same terms as Board.composite_features, computed with masks
+        """
+        me, opponent = self._own_bits()
+        empty = ~(me | opponent) & FULL_MASK
+
+        d = 0.0
+        for weight, mask in WEIGHT_MASKS:
+            d += weight * (popcount(me & mask) - popcount(opponent & mask))
+
+        # Board adds the tiles next to an empty square to the disc count, and never accumulates
+        # front tiles separately, so the frontier term 'f' is always zero; keep the same scores
+        frontier = neighbour_bits(empty)
+        my_tiles = popcount(me) + popcount(me & frontier)
+        opponent_tiles = popcount(opponent) + popcount(opponent & frontier)
+
+        if my_tiles > opponent_tiles:
+            p = (100.0 * my_tiles) / (my_tiles + opponent_tiles)
+        elif my_tiles < opponent_tiles:
+            p = -(100.0 * my_tiles) / (my_tiles + opponent_tiles)
+        else:
+            p = 0
+        f = 0
+
+        # Corner occupancy
+        c = 25 * (popcount(me & CORNER_MASK) - popcount(opponent & CORNER_MASK))
+
+        # Corner closeness
+        my_tiles = 0
+        opponent_tiles = 0
+        for corner, around in CORNERS:
+            if empty & corner:
+                my_tiles += popcount(me & around)
+                opponent_tiles += popcount(opponent & around)
+        l = -12.5 * (my_tiles - opponent_tiles)
+
+        # Mobility
+        my_tiles = popcount(self._move_bits(self.__turn))
+        opponent_tiles = popcount(self._move_bits(-self.__turn))
+
+        if my_tiles > opponent_tiles:
+            m = (100.0 * my_tiles) / (my_tiles + opponent_tiles)
+        elif my_tiles < opponent_tiles:
+            m = -(100.0 * my_tiles) / (my_tiles + opponent_tiles)
+        else:
+            m = 0
+
+        return p, c, l, m, f, d
+
+    def composite_heuristic(self):
+        p, c, l, m, f, d = self.composite_features()
+
+        # Final weighted score
+        return (10 * p) + (801.724 * c) + (382.026 * l) + (78.922 * m) + (74.396 * f) + (10 * d)
+
+    def tuned_heuristic(self):
+        """ See Board.tuned_heuristic """
+        features = self.composite_features() + (self.get_token_difference(),)
+        return sum(map(operator.mul, tuned_weights.get_weights(), features))
+
+    def mobile_greedy(self):
+        """ See Board.mobile_greedy """
+        return 10 * self.get_token_difference() + 42 * self.mobility()
+
+    def greedy_corner(self):
+        """ See Board.greedy_corner """
+        return 10 * self.get_token_difference() + 801 * self.corner_occupancy()
+
+    def half_greedy(self):
+        """ See Board.half_greedy """
+        me, opponent = self._own_bits()
+        my_tiles = popcount(self._move_bits(self.__turn))
+        opponent_tiles = popcount(self._move_bits(-self.__turn))
+
+        if (my_tiles + opponent_tiles) < 32:
+            return popcount(opponent) - popcount(me)
+        return popcount(me) - popcount(opponent)
+
+    def mobility(self):
+        """ See Board.mobility """
+        my_moves = popcount(self._move_bits(self.__turn))
+        opponent_moves = popcount(self._move_bits(-self.__turn))
+
+        if my_moves > opponent_moves:
+            return (100 * my_moves) / (my_moves + opponent_moves)
+        elif my_moves < opponent_moves:
+            return (-100 * opponent_moves) / (my_moves + opponent_moves)
+        else:
+            return 0
+
+    def corner_occupancy(self):
+        """ See Board.corner_occupancy """
+        me, opponent = self._own_bits()
+        return 25 * (popcount(me & CORNER_MASK) - popcount(opponent & CORNER_MASK))
+
+    # ##########################################################################
+
+    def pattern_heuristic(self):
+        """ See Board.pattern_heuristic """
+        return pattern_eval.evaluate_bits(self.__white, self.__black, self.__turn)
+
+    # Heuristic function of each agent type (look it up once, then call it with the board to evaluate)
+    HEURISTICS = {
+        AgentType.greedy: get_last_flip_count,
+        AgentType.simple: get_token_difference,
+        AgentType.composite: composite_heuristic,
+        AgentType.mobile: mobile_greedy,
+        AgentType.corner: greedy_corner,
+        AgentType.half: half_greedy,
+        AgentType.pattern: pattern_heuristic,
+        AgentType.tuned: tuned_heuristic,
+    }
+
+    get_col_char = staticmethod(Board.get_col_char)
+    moves_string = staticmethod(Board.moves_string)
+    print_moves = staticmethod(Board.print_moves)
+    move_string = staticmethod(Board.move_string)
+    get_color_string = staticmethod(Board.get_color_string)
@@ -11,37 +11,129 @@ Board class.
 
 Board data:
   1 = white, -1 = black, 0 = empty
-  first dim is column, 2nd is row:
-     pieces[1][7] is the square in column 2,
+  the cells are stored column by column in a flat list (square = x * 8 + y),
+  and board[x][y] still reads (and writes) the cell in column x and row y:
+     board[1][7] is the square in column 2,
      at the opposite end of the board in row 8.
 
 
 Squares are stored and manipulated as (x,y) tuples. 
 x is the column, y is the row.
 """
-from mini_max import AgentType
+import operator
+import random
+from mini_max import AgentType, SQUARE_WEIGHTS
+import pattern_eval
+import tuned_weights
 
 BLACK = -1
 WHITE = 1
 EMPTY = 0
 
 
+def _create_zobrist_keys():
+    """
+    Create the random keys used for Zobrist hashing (a fixed seed keeps the hashes stable between runs)
+    :return: keys for each square and color (indexed by [color][x * 8 + y]), and the key for white's turn
+    """
+    generator = random.Random(472)
+    keys = dict()
+    keys[BLACK] = [generator.getrandbits(64) for _ in range(64)]
+    keys[WHITE] = [generator.getrandbits(64) for _ in range(64)]
+    return keys, generator.getrandbits(64)
+
+
+ZOBRIST_KEYS, ZOBRIST_TURN_KEY = _create_zobrist_keys()
+
+# List of all 8 directions on the board, as (x,y) offsets
+DIRECTIONS = [(1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1), (0, 1)]
+
+
+def _create_rays():
+    """
+    Precompute, for every cell, the cells met when walking from it towards each direction
+    :return: rays indexed by [x][y], each one being a tuple (in DIRECTIONS order) of tuples of (x,y) cells,
+             ordered from the closest to the farthest (empty when the direction leaves the board right away)
+    """
+    rays = [[None] * 8 for _ in range(8)]
+    for x in range(8):
+        for y in range(8):
+            cell_rays = []
+            for dx, dy in DIRECTIONS:
+                ray = []
+                i, j = x + dx, y + dy
+                while 0 <= i < 8 and 0 <= j < 8:
+                    ray.append((i, j))
+                    i, j = i + dx, j + dy
+                cell_rays.append(tuple(ray))
+            rays[x][y] = tuple(cell_rays)
+    return rays
+
+
+# Cells along the 8 rays starting at each cell (RAYS[x][y][direction index])
+RAYS = _create_rays()
+
+# In-board neighbours of each cell (NEIGHBOURS[x][y]), in DIRECTIONS order
+NEIGHBOURS = [[tuple(ray[0] for ray in RAYS[x][y] if ray) for y in range(8)] for x in range(8)]
+
+# Same tables for the flat cell list, indexed by square (x * 8 + y) and holding squares
+RAY_SQUARES = [tuple(tuple(i * 8 + j for i, j in ray) for ray in RAYS[x][y] if ray)
+               for x in range(8) for y in range(8)]
+NEIGHBOUR_SQUARES = [tuple(i * 8 + j for i, j in NEIGHBOURS[x][y]) for x in range(8) for y in range(8)]
+
+# Square weights of the composite heuristic, indexed by square
+SQUARE_WEIGHT_LIST = [SQUARE_WEIGHTS[x][y] for x in range(8) for y in range(8)]
+
+# Each corner square, with the squares around it (used by the corner closeness)
+CORNER_SQUARES = [(0, (1, 9, 8)), (7, (6, 14, 15)), (56, (57, 49, 48)), (63, (55, 54, 62))]
+
+
+class _Column:
+    """
+    View on one column of a Board, so board[x][y] keeps working on the flat cell list.
+    Writing a cell goes through Board.set_cell, so the hash and the cached moves stay right.
+    """
+    __slots__ = ('__board', '__cells', '__offset')
+
+    def __init__(self, board, cells, x):
+        self.__board = board
+        self.__cells = cells
+        self.__offset = x * 8
+
+    def __getitem__(self, y):
+        if not 0 <= y < 8:
+            raise IndexError('row index out of range')
+        return self.__cells[self.__offset + y]
+
+    def __setitem__(self, y, color):
+        if not 0 <= y < 8:
+            raise IndexError('row index out of range')
+        self.__board.set_cell(self.__offset >> 3, y, color)
+
+    def __len__(self):
+        return 8
+
+    def __iter__(self):
+        return iter(self.__cells[self.__offset:self.__offset + 8])
+
+    def __repr__(self):
+        return repr(list(self))
+
+
 class Board:
-    # List of all 8 directions on the board, as (x,y) offsets
-    __directions = [(1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1), (0, 1)]
+    # Boards are created for every node of the search, so keep them small
+    __slots__ = ('__cells', '__turn', '__flips', '__hash', '__legal_moves')
 
     def __init__(self, turn=BLACK):
         """ Set up initial board configuration. """
-        # Create the empty board array
-        self.__pieces = [None] * 8
-        for i in range(8):
-            self.__pieces[i] = [EMPTY] * 8
+        # Create the empty board array (indexed by x * 8 + y)
+        self.__cells = [EMPTY] * 64
 
         # Set up the initial 4 pieces
-        self.__pieces[3][4] = WHITE
-        self.__pieces[4][3] = WHITE
-        self.__pieces[3][3] = BLACK
-        self.__pieces[4][4] = BLACK
+        self.__cells[3 * 8 + 4] = WHITE
+        self.__cells[4 * 8 + 3] = WHITE
+        self.__cells[3 * 8 + 3] = BLACK
+        self.__cells[4 * 8 + 4] = BLACK
 
         # Current turn
         self.__turn = turn
@@ -49,30 +141,64 @@ class Board:
         # Total number of flips because of a move
         self.__flips = 0
 
-        # Configure heuristic functions for different agent types
-        self.heuristics = dict()
-        self.heuristics[AgentType.greedy] = self.get_last_flip_count
-        self.heuristics[AgentType.simple] = self.get_token_difference
-        self.heuristics[AgentType.composite] = self.composite_heuristic
-        self.heuristics[AgentType.mobile] = self.mobile_greedy
-        self.heuristics[AgentType.corner] = self.greedy_corner
-        self.heuristics[AgentType.half] = self.half_greedy
+        # Zobrist hash of the position (computed lazily, then updated incrementally by execute_move)
+        self.__hash = None
+
+        # Legal moves of each color (computed lazily, dropped whenever the pieces change)
+        self.__legal_moves = dict()
+
+    @property
+    def heuristics(self):
+        """ Heuristic functions of the different agent types, bound to this board (see HEURISTICS) """
+        return {agent_type: function.__get__(self) for agent_type, function in self.HEURISTICS.items()}
 
     def clone(self):
         """
         Returns a copy of the current board
         :return: a copy of the current board
         """
-        cloned = Board(self.__turn)
-        for y in range(len(self.__pieces)):
-            for x in range(len(self.__pieces[y])):
-                cloned[x][y] = self[x][y]
+        # Skip __init__, every field is set here
+        cloned = Board.__new__(Board)
+        cloned.__cells = self.__cells[:]
+        cloned.__turn = self.__turn
+        cloned.__flips = 0
+        cloned.__hash = self.__hash
+        cloned.__legal_moves = dict()
 
         return cloned
 
     # Add [][] indexer syntax to the Board
     def __getitem__(self, index):
-        return self.__pieces[index]
+        if not 0 <= index < 8:
+            raise IndexError('column index out of range')
+        return _Column(self, self.__cells, index)
+
+    def get_cells(self):
+        """
+        Get a copy of all the cells, column by column (the cell (x,y) is at index x * 8 + y)
+        :return: list of the 64 cell colors
+        """
+        return self.__cells[:]
+
+    def set_cell(self, x, y, color):
+        """
+        Change the color of one cell (without flipping anything), keeping the hash and the cached moves right
+        :param x: column of the cell
+        :param y: row of the cell
+        :param color: 1 for white, -1 for black, 0 for empty
+        """
+        square = x * 8 + y
+        original_color = self.__cells[square]
+        if original_color == color:
+            return
+
+        self.__cells[square] = color
+        self.__legal_moves = dict()
+        if self.__hash is not None:
+            if original_color != EMPTY:
+                self.__hash ^= ZOBRIST_KEYS[original_color][square]
+            if color != EMPTY:
+                self.__hash ^= ZOBRIST_KEYS[color][square]
 
     def get_turn(self):
         """ Get the current turn (-1 is black and 1 is white) """
@@ -84,15 +210,30 @@ class Board:
         # result_board.__turn = -result_board.__turn
         # return [(None, result_board)]
         self.__turn = -self.__turn
+        if self.__hash is not None:
+            self.__hash ^= ZOBRIST_TURN_KEY
+
+    def get_hash(self):
+        """
+        Get the Zobrist hash of the position (pieces and turn).
+        The hash is computed on first use, then updated by every change to the board.
+        :return: 64-bit hash of the board
+        """
+        if self.__hash is None:
+            self.__hash = ZOBRIST_TURN_KEY if self.__turn == WHITE else 0
+            for square, color in enumerate(self.__cells):
+                if color != EMPTY:
+                    self.__hash ^= ZOBRIST_KEYS[color][square]
+        return self.__hash
 
     def create_pass_successor(self):
         result_board = self.clone()
-        result_board.__turn = -result_board.__turn
+        result_board.change_turn()
         return [(None, result_board)]
 
     def is_game_over(self):
         """ Check whether the game is over """
-        return len(self.get_legal_moves(WHITE)) == 0 and len(self.get_legal_moves(BLACK)) == 0
+        return len(self._legal_moves(WHITE)) == 0 and len(self._legal_moves(BLACK)) == 0
 
     def display_official(self):
         """Board display according to specs."""
@@ -169,7 +310,7 @@ class Board:
         print("Current turn: {}".format(Board.get_color_string(self.__turn)))
 
     def __repr__(self):
-        return str(self.__pieces)
+        return str([self.__cells[x * 8:x * 8 + 8] for x in range(8)])
 
     def __str__(self):
         """
@@ -185,17 +326,11 @@ class Board:
         :param color: 1 for white, -1 for black, 0 for empty spaces (If not specified, uses current turn)
         :return: number of cells associated with the specified color
         """
-        count = 0
-
         # If color isn't specified, choose the current turn
         if color == 10:
             color = self.__turn
 
-        for y in range(8):
-            for x in range(8):
-                if self[x][y] == color:
-                    count += 1
-        return count
+        return self.__cells.count(color)
 
     def get_final_score(self):
         """
@@ -224,9 +359,10 @@ class Board:
         if color == 10:
             color = self.__turn
 
+        cells = self.__cells
         for y in range(8):
             for x in range(8):
-                if self[x][y] == color:
+                if cells[x * 8 + y] == color:
                     squares.append((x, y))
         return squares
 
@@ -240,7 +376,7 @@ class Board:
         if color == 0:
             color = self.__turn
 
-        moves = self.get_legal_moves(color)
+        moves = self._legal_moves(color)
         result = []
 
         for move in moves:
@@ -254,22 +390,36 @@ class Board:
         :param color: 1 for white, -1 for black (If not specified, uses current turn)
         :return: list of legal moves for the specified color
         """
-
-        # Store the legal moves
-        moves = set()
-
         # If color isn't specified, choose the current turn
         if color == 0:
             color = self.__turn
 
-        # Get all the squares with pieces of the given color.
-        for square in self.get_squares(color):
-            # Find all moves using these pieces as base squares.
-            new_moves = self.get_moves_for_square(square)
-            # Store these in the moves set.
-            moves.update(new_moves)
+        # Return a copy, so the caller can't change the cached list
+        return list(self._legal_moves(color))
+
+    def _legal_moves(self, color):
+        """
+        Get the legal moves of the given color, computing them only once per position.
+        The cache is dropped by every change to the board (make_move/unmake_move, and set_cell, also used by the
+        [][] indexer).
+        :param color: 1 for white, -1 for black
+        :return: cached list of legal moves (must not be modified)
+        """
+        moves = self.__legal_moves.get(color)
+        if moves is None:
+            # Store the legal moves
+            moves = set()
 
-        return list(moves)
+            # Get all the squares with pieces of the given color.
+            for square in self.get_squares(color):
+                # Find all moves using these pieces as base squares.
+                new_moves = self.get_moves_for_square(square)
+                # Store these in the moves set.
+                moves.update(new_moves)
+
+            moves = list(moves)
+            self.__legal_moves[color] = moves
+        return moves
 
     def get_moves_for_square(self, square):
         """
@@ -284,7 +434,7 @@ class Board:
         (x, y) = square
 
         # Determine the color of the piece
-        color = self[x][y]
+        color = self.__cells[x * 8 + y]
 
         # Skip empty source squares
         if color == 0:
@@ -292,8 +442,8 @@ class Board:
 
         # Search all possible directions
         moves = []
-        for direction in self.__directions:
-            move = self._discover_move(square, direction)
+        for ray in RAY_SQUARES[x * 8 + y]:
+            move = self._discover_move(color, ray)
             if move:
                 moves.append(move)
         # Return the generated list of moves
@@ -308,71 +458,119 @@ class Board:
         """
         # Create a copy and apply the change to the copy
         result_board = self.clone()
+        result_board.make_move(move, color)
+
+        return result_board
 
+    def make_move(self, move, color=0):
+        """
+        Perform the given move on this board (in place), flipping pieces as necessary.
+        :param move: the move to be executed on the board (None to pass)
+        :param color: 1 for white, -1 for black (If not specified, uses current turn)
+        :return: information needed by unmake_move to restore the board
+        """
         # If color isn't specified, choose the current turn
         if color == 0:
             color = self.__turn
 
+        undo = ([], self.__flips, self.__hash, self.__legal_moves)
+        self.__flips = 0
+
         if move is not None:
+            self.__legal_moves = dict()
+
             # Start at the new piece's square and follow it on all 8 directions
             # to look for pieces allowing flipping
             # Add the piece to the empty square
-            flips = (flip for direction in self.__directions for flip in self._get_flips(move, direction, color))
+            move_square = move[0] * 8 + move[1]
+            flips = [flip for ray in RAY_SQUARES[move_square] for flip in self._get_flips(move_square, ray, color)]
 
-            result_board.__flips = 0
-            for x, y in flips:
+            changed = undo[0]
+            cells = self.__cells
+            self.get_hash()
+            for square in flips:
                 # ---self[x][y] = color
-                original_color = result_board[x][y]
-                result_board[x][y] = color
+                original_color = cells[square]
 
                 # If the resulting color is different than the original color, count it as a flip
                 if color != original_color:
-                    result_board.__flips += 1
+                    cells[square] = color
+                    changed.append((square, original_color))
+                    self.__flips += 1
+                    if original_color != EMPTY:
+                        self.__hash ^= ZOBRIST_KEYS[original_color][square]
+                    self.__hash ^= ZOBRIST_KEYS[color][square]
 
         # ---self.change_turn()
-        result_board.change_turn()
+        self.change_turn()
 
-        return result_board
+        return undo
+
+    def unmake_move(self, undo):
+        """
+        Restore the board to the state it had before make_move
+        :param undo: value returned by make_move
+        """
+        changed, self.__flips, self.__hash, self.__legal_moves = undo
+        cells = self.__cells
+        for square, original_color in changed:
+            cells[square] = original_color
+        self.__turn = -self.__turn
 
-    def _discover_move(self, origin, direction):
+    def generate_successors(self, color=0):
         """
-        Return the endpoint of a legal move, starting at the given origin,
-        and moving in the given direction.
+        Lazily generate the successor states from the current board (a board is only created when it's needed)
+        :param color: color to do the move (If not specified uses current turn's color)
+        :return: generator of (move, successor board)
         """
-        x, y = origin
-        color = int(self[x][y])
-        flips = []
+        if color == 0:
+            color = self.__turn
 
-        # ###for x, y in Board._increment_move(origin, direction):
-        for x, y in Board._increment_move(origin, direction):
-            if self[x][y] == 0 and flips:
-                return x, y
-            elif self[x][y] == color or (self[x][y] == 0 and not flips):
+        for move in self._legal_moves(color):
+            yield move, self.execute_move(move, color)
+
+    def _discover_move(self, color, ray):
+        """
+        Return the endpoint of a legal move, starting next to a piece of the given color
+        and walking along the given ray.
+        :param color: color of the piece the ray starts from
+        :param ray: squares to walk (see RAY_SQUARES)
+        :return: the cell (x,y) of the move, or None if there is no move along the ray
+        """
+        cells = self.__cells
+        found_opponent = False
+        for square in ray:
+            piece = cells[square]
+            if piece == -color:
+                found_opponent = True
+            elif piece == EMPTY and found_opponent:
+                return square >> 3, square & 7
+            else:
                 return None
-            elif self[x][y] == -color:
-                flips.append((x, y))
+        return None
 
-    def _get_flips(self, origin, direction, color):
+    def _get_flips(self, origin, ray, color):
         """
         Get the list of flips for a vertex and a direction to use within
         the execute_move function.
-        :param origin: the cell to start
-        :param direction: the direction to follow
+        :param origin: the square to start
+        :param ray: squares to walk from the origin (see RAY_SQUARES)
         :param color: the color to check
-        :return: total number of flips
+        :return: the origin and the flipped squares (empty if nothing is flipped along the ray)
         """
+        cells = self.__cells
 
         # Initialize variable
         flips = [origin]
 
-        # ###for x, y in Board._increment_move(origin, direction):
-        for x, y in Board._increment_move(origin, direction):
-            if self[x][y] == -color:
-                flips.append((x, y))
-            elif self[x][y] == 0 or (self[x][y] == color and len(flips) == 1):
-                break
-            elif self[x][y] == color and len(flips) > 1:
+        for square in ray:
+            piece = cells[square]
+            if piece == -color:
+                flips.append(square)
+            elif piece == color and len(flips) > 1:
                 return flips
+            else:
+                break
         return []
 
     # ################# Functions used for heuristics ##########################
@@ -392,16 +590,13 @@ class Board:
         return self.count(self.__turn) - self.count(-self.__turn)
 
     # Code for heuristic from here: https://kartikkukreja.wordpress.com/2013/03/30/heuristic-function-for-reversiothello/
-    def composite_heuristic(self):
-        v = [[None] * 8] * 8
-        v[0] = [20, -3, 11, 8, 8, 11, -3, 20]
-        v[1] = [-3, -7, -4, 1, 1, -4, -7, -3]
-        v[2] = [11, -4, 2, 2, 2, 2, -4, 11]
-        v[3] = [8, 1, 2, -3, -3, 2, 1, 8]
-        v[4] = [8, 1, 2, -3, -3, 2, 1, 8]
-        v[5] = [11, -4, 2, 2, 2, 2, -4, 11]
-        v[6] = [-3, -7, -4, 1, 1, -4, -7, -3]
-        v[7] = [20, -3, 11, 8, 8, 11, -3, 20]
+    def composite_features(self):
+        """
+        Compute the terms of the composite heuristic, for the player to move
+        :return: (p, c, l, m, f, d): disc ratio, corner occupancy, corner closeness, mobility,
+                 frontier (always 0, the front tiles are added to the discs) and square weights
+        """
+        v = SQUARE_WEIGHT_LIST
 
         my_tiles = 0
         opponent_tiles = 0
@@ -414,24 +609,25 @@ class Board:
         f = 0.0
         d = 0.0
 
-        for i in range(8):
-            for j in range(8):
-                if self[i][j] == self.__turn:
-                    d += v[i][j]
-                    my_tiles += 1
-                elif self[i][j] == -self.__turn:
-                    d -= v[i][j]
-                    opponent_tiles += 1
-
-                if self[i][j] != EMPTY:
-                    for direction in self.__directions:
-                        x_neighbor, y_neighbor = map(sum, zip((i, j), direction))
-                        if 0 <= x_neighbor < 8 and 0 <= y_neighbor < 8 and self[x_neighbor][y_neighbor] == EMPTY:
-                            if self[i][j] == self.__turn:
-                                my_tiles += 1
-                            elif self[i][j] == -self.__turn:
-                                opponent_tiles += 1
-                            break
+        cells = self.__cells
+        turn = self.__turn
+        for square in range(64):
+            color = cells[square]
+            if color == turn:
+                d += v[square]
+                my_tiles += 1
+            elif color == -turn:
+                d -= v[square]
+                opponent_tiles += 1
+
+            if color != EMPTY:
+                for neighbour in NEIGHBOUR_SQUARES[square]:
+                    if cells[neighbour] == EMPTY:
+                        if color == turn:
+                            my_tiles += 1
+                        else:
+                            opponent_tiles += 1
+                        break
 
         if my_tiles > opponent_tiles:
             p = (100.0 * my_tiles) / (my_tiles + opponent_tiles)
@@ -448,96 +644,25 @@ class Board:
             f = 0
 
         # Corner occupancy
-        my_tiles = 0
-        opponent_tiles = 0
-
-        if self[0][0] == self.__turn:
-            my_tiles += 1
-        elif self[0][0] == -self.__turn:
-            opponent_tiles += 1
-
-        if self[0][7] == self.__turn:
-            my_tiles += 1
-        elif self[0][7] == -self.__turn:
-            opponent_tiles += 1
-
-        if self[7][0] == self.__turn:
-            my_tiles += 1
-        elif self[7][0] == -self.__turn:
-            opponent_tiles += 1
-
-        if self[7][7] == self.__turn:
-            my_tiles += 1
-        elif self[7][7] == -self.__turn:
-            opponent_tiles += 1
-
-        c = 25 * (my_tiles - opponent_tiles)
+        c = self.corner_occupancy()
 
         # Corner closeness
         my_tiles = 0
         opponent_tiles = 0
 
-        if self[0][0] == EMPTY:
-            if self[0][1] == self.__turn:
-                my_tiles += 1
-            elif self[0][1] == -self.__turn:
-                opponent_tiles += 1
-            if self[1][1] == self.__turn:
-                my_tiles += 1
-            elif self[1][1] == -self.__turn:
-                opponent_tiles += 1
-            if self[1][0] == self.__turn:
-                my_tiles += 1
-            elif self[1][0] == -self.__turn:
-                opponent_tiles += 1
-
-        if self[0][7] == EMPTY:
-            if self[0][6] == self.__turn:
-                my_tiles += 1
-            elif self[0][6] == -self.__turn:
-                opponent_tiles += 1
-            if self[1][6] == self.__turn:
-                my_tiles += 1
-            elif self[1][6] == -self.__turn:
-                opponent_tiles += 1
-            if self[1][7] == self.__turn:
-                my_tiles += 1
-            elif self[1][7] == -self.__turn:
-                opponent_tiles += 1
-
-        if self[7][0] == EMPTY:
-            if self[7][1] == self.__turn:
-                my_tiles += 1
-            elif self[7][1] == -self.__turn:
-                opponent_tiles += 1
-            if self[6][1] == self.__turn:
-                my_tiles += 1
-            elif self[6][1] == -self.__turn:
-                opponent_tiles += 1
-            if self[6][0] == self.__turn:
-                my_tiles += 1
-            elif self[6][0] == -self.__turn:
-                opponent_tiles += 1
-
-        if self[7][7] == EMPTY:
-            if self[6][7] == self.__turn:
-                my_tiles += 1
-            elif self[6][7] == -self.__turn:
-                opponent_tiles += 1
-            if self[6][6] == self.__turn:
-                my_tiles += 1
-            elif self[6][6] == -self.__turn:
-                opponent_tiles += 1
-            if self[7][6] == self.__turn:
-                my_tiles += 1
-            elif self[7][6] == -self.__turn:
-                opponent_tiles += 1
+        for corner, around in CORNER_SQUARES:
+            if cells[corner] == EMPTY:
+                for square in around:
+                    if cells[square] == turn:
+                        my_tiles += 1
+                    elif cells[square] == -turn:
+                        opponent_tiles += 1
 
         l = -12.5 * (my_tiles - opponent_tiles)
 
         # Mobility
-        my_tiles = len(self.get_legal_moves(self.__turn))
-        opponent_tiles = len(self.get_legal_moves(-self.__turn))
+        my_tiles = len(self._legal_moves(self.__turn))
+        opponent_tiles = len(self._legal_moves(-self.__turn))
 
         if my_tiles > opponent_tiles:
             m = (100.0 * my_tiles) / (my_tiles + opponent_tiles)
@@ -546,9 +671,22 @@ class Board:
         else:
             m = 0
 
+        return p, c, l, m, f, d
+
+    def composite_heuristic(self):
+        p, c, l, m, f, d = self.composite_features()
+
         # Final weighted score
         return (10 * p) + (801.724 * c) + (382.026 * l) + (78.922 * m) + (74.396 * f) + (10 * d)
 
+    def tuned_heuristic(self):
+        """
+        Weighted sum of the composite features and the token difference,
+        with the weights fitted by tune_weights (see tuned_weights)
+        """
+        features = self.composite_features() + (self.get_token_difference(),)
+        return sum(map(operator.mul, tuned_weights.get_weights(), features))
+
     # ##########################################################################
 
     def mobile_greedy(self):
@@ -571,8 +709,8 @@ class Board:
         This heuristic is the opposite of greedy, meaning that it gives advantages to the adversary.
         When half of the game is reached this heuristic becomes greedy.
         """
-        my_tiles = len(self.get_legal_moves(self.__turn))
-        opponent_tiles = len(self.get_legal_moves(-self.__turn))
+        my_tiles = len(self._legal_moves(self.__turn))
+        opponent_tiles = len(self._legal_moves(-self.__turn))
 
         if (my_tiles + opponent_tiles) < 32:
             return self.count(-self.__turn) - self.count(self.__turn)
@@ -586,8 +724,8 @@ class Board:
         and expand its own mobility.
         """
         # Get my moves
-        my_moves = len(self.get_legal_moves(self.__turn))
-        opponent_moves = len(self.get_legal_moves(-self.__turn))
+        my_moves = len(self._legal_moves(self.__turn))
+        opponent_moves = len(self._legal_moves(-self.__turn))
 
         if my_moves > opponent_moves:
             return (100 * my_moves) / (my_moves + opponent_moves)
@@ -604,45 +742,37 @@ class Board:
         This heuristic simply establishes a score on them based on the adversary and the current players
         token that are in the corners.
         """
+        cells = self.__cells
+        turn = self.__turn
         my_tiles = 0
         opponent_tiles = 0
-        if self[0][0] == self.__turn:
-            my_tiles += 1
-        elif self[0][0] == -self.__turn:
-            opponent_tiles += 1
-
-        if self[0][7] == self.__turn:
-            my_tiles += 1
-        elif self[0][7] == -self.__turn:
-            opponent_tiles += 1
-
-        if self[7][0] == self.__turn:
-            my_tiles += 1
-        elif self[7][0] == -self.__turn:
-            opponent_tiles += 1
-
-        if self[7][7] == self.__turn:
-            my_tiles += 1
-        elif self[7][7] == -self.__turn:
-            opponent_tiles += 1
+        for corner, _ in CORNER_SQUARES:
+            if cells[corner] == turn:
+                my_tiles += 1
+            elif cells[corner] == -turn:
+                opponent_tiles += 1
 
         # Here we multiply by 25 the score to give a special emphasis on the
         # corners.
         return 25 * (my_tiles - opponent_tiles)
 
-    @staticmethod
-    def _increment_move(move, direction):
+    def pattern_heuristic(self):
         """
-        Generator expression for incrementing moves
-        :param move: the move to consider
-        :param direction: the direction to follow
-        :return: moves in the specified direction
+        Sum of the pattern tables (edges, corners, diagonals, ...) for the current position, see pattern_eval
         """
-        move = list(map(sum, list(zip(move, direction))))
+        return pattern_eval.evaluate(self.__cells, self.__turn)
 
-        while all(list(map(lambda x: 0 <= x < 8, move))):
-            yield move
-            move = list(map(sum, list(zip(move, direction))))
+    # Heuristic function of each agent type (look it up once, then call it with the board to evaluate)
+    HEURISTICS = {
+        AgentType.greedy: get_last_flip_count,
+        AgentType.simple: get_token_difference,
+        AgentType.composite: composite_heuristic,
+        AgentType.mobile: mobile_greedy,
+        AgentType.corner: greedy_corner,
+        AgentType.half: half_greedy,
+        AgentType.pattern: pattern_heuristic,
+        AgentType.tuned: tuned_heuristic,
+    }
 
     @staticmethod
     def get_col_char(col):
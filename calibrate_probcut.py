@@ -0,0 +1,244 @@
+"""
+Offline calibration of Multi-ProbCut (see probcut.py), and measurement of its speed-up and strength loss.
+
+Calibration:
+    1. positions: self-play games played by OthelloRunner (see tune_weights.play_games)
+    2. values: each position is searched to every calibrated depth and to its shallow depths (2 and 4 plies
+       less, so the leaves are evaluated for the same player), both as a node of the root player (like the
+       root) and as a node of the opponent (like the successors of the root)
+    3. fit: for each agent type, type of node, depth pair and stage of the game, the deep values are regressed
+       on the shallow ones: deep = slope * shallow + intercept, with the standard deviation of the errors
+The parameters are written to probcut.PROBCUT_FILE, where AlphaBeta loads them.
+
+Measurement (--measure): fixed-depth searches of the positions with and without ProbCut (nodes, time and
+how often the best move changes), and games between players with and without ProbCut (both colors).
+
+Examples:
+    python calibrate_probcut.py -a Composite Corner -g 40
+    python calibrate_probcut.py -a Composite --measure -ml 5 -mg 20 -t 1.5
+"""
+import argparse
+import math
+import random
+import time
+
+import probcut
+from board import BLACK, WHITE
+from mini_max import AgentType, AlphaBeta, MoveOrderer
+from othello_runner import OthelloRunner
+from player import PlayerType, create_player
+from transposition import TranspositionTable
+from tune_weights import board_from_cells, create_opening, play_games
+from utils import BoardEngine, convert_board
+
+# Agent types with a player type of the same name (the ones that can be calibrated)
+AGENT_TYPES = [agent_type for agent_type in AgentType
+               if agent_type.value in [player_type.value for player_type in PlayerType]]
+
+# Plies between the deep and the shallow searches of the depth pairs (even, so the leaves are evaluated for the
+# same player)
+SHALLOW_REDUCTIONS = (2, 4)
+
+# Minimum number of samples to fit the parameters of a depth pair and stage
+MINIMUM_SAMPLES = 30
+
+
+def search_value(board, agent_type: AgentType, depth: int, max_node: bool):
+    """
+    Search a position like a node of the search
+    :param board: board to search
+    :param agent_type: agent type (heuristic)
+    :param depth: depth left to search
+    :param max_node: search it as a node of the root player (otherwise as a node of the opponent)
+    :return: value of the node
+    """
+    if max_node:
+        agent = AlphaBeta(depth, agent_type, table=TranspositionTable(16), ordering=MoveOrderer())
+        return agent.get_best_action_and_value(board, float("inf"))[1]
+    agent = AlphaBeta(depth + 1, agent_type, table=TranspositionTable(16), ordering=MoveOrderer())
+    return agent.search_successor(board, float("-inf"), float("inf"), float("inf"))
+
+
+def collect_samples(boards, agent_type: AgentType, depths):
+    """
+    Search the positions to the shallow and deep depths
+    :param boards: positions (not over)
+    :param agent_type: agent type
+    :param depths: depths to calibrate
+    :return: dictionary {(max node, depth, shallow depth, stage): list of (shallow value, deep value)}
+    """
+    pairs = [(depth, depth - reduction) for depth in depths for reduction in SHALLOW_REDUCTIONS
+             if depth - reduction > 0]
+    searched_depths = sorted(set(depth for pair in pairs for depth in pair))
+    samples = dict()
+    for index, board in enumerate(boards):
+        stage = probcut.get_stage(board.count(0))
+        for max_node in (True, False):
+            values = {depth: search_value(board, agent_type, depth, max_node) for depth in searched_depths}
+            for depth, shallow_depth in pairs:
+                samples.setdefault((max_node, depth, shallow_depth, stage), []).append(
+                    (values[shallow_depth], values[depth]))
+        print('\r{}: {:5}/{} positions'.format(agent_type.value, index + 1, len(boards)), end='', flush=True)
+    print()
+    return samples
+
+
+def fit_line(pairs):
+    """
+    Fit deep = slope * shallow + intercept by least squares
+    :param pairs: list of (shallow value, deep value)
+    :return: slope, intercept and standard deviation of the errors (None if the shallow values are all equal)
+    """
+    count = len(pairs)
+    mean_x = sum(x for x, _ in pairs) / count
+    mean_y = sum(y for _, y in pairs) / count
+    variance_x = sum((x - mean_x) ** 2 for x, _ in pairs)
+    if variance_x == 0:
+        return None
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in pairs) / variance_x
+    intercept = mean_y - slope * mean_x
+    sigma = math.sqrt(sum((y - slope * x - intercept) ** 2 for x, y in pairs) / count)
+    return slope, intercept, sigma
+
+
+def fit_cuts(samples):
+    """
+    Fit the parameters of every node type, depth pair and stage with enough samples
+    :param samples: dictionary {(max node, depth, shallow depth, stage): list of (shallow value, deep value)}
+    :return: dictionary {(max node, depth, stage): list of (shallow depth, slope, intercept, sigma)}
+    """
+    cuts = dict()
+    for (max_node, depth, shallow_depth, stage), pairs in sorted(samples.items()):
+        line = fit_line(pairs) if len(pairs) >= MINIMUM_SAMPLES else None
+        # A shallow search that doesn't predict the deep one (or predicts it backwards) can't cut anything
+        if line is None or line[0] <= 0:
+            continue
+        cuts.setdefault((max_node, depth, stage), []).append((shallow_depth,) + line)
+        print('\t{:8} depth {} from {} stage {}: {:5} samples, slope {:7.3f}, intercept {:10.3f}, '
+              'sigma {:10.3f}'.format('max node' if max_node else 'min node', depth, shallow_depth, stage,
+                                      len(pairs), *line))
+    return cuts
+
+
+def measure_speed(boards, agent_type: AgentType, level: int, threshold: float):
+    """
+    Search the positions with and without ProbCut
+    :return: nodes and time of the searches without and with ProbCut, and number of different best moves
+    """
+    nodes = [0, 0]
+    times = [0.0, 0.0]
+    different_moves = 0
+    for board in boards:
+        moves = []
+        for index, probcut_threshold in enumerate((None, threshold)):
+            agent = AlphaBeta(level, agent_type, table=TranspositionTable(18), ordering=MoveOrderer(),
+                              collect_stats=True, probcut_threshold=probcut_threshold)
+            move, _, stats = agent.get_best_action_value_and_stats(board, float("inf"))
+            nodes[index] += stats.nodes
+            times[index] += stats.elapsed_time
+            moves.append(move)
+        different_moves += moves[0] != moves[1]
+    return nodes, times, different_moves
+
+
+def measure_strength(player_type: PlayerType, level: int, threshold: float, games: int, engine: BoardEngine,
+                     random_plies: int, seed: int):
+    """
+    Play games between a player with ProbCut and one without, from random openings (each one played with both
+    colors)
+    :return: points of the player with ProbCut (1 per win, 0.5 per tie) and number of games
+    """
+    generator = random.Random(seed)
+    runner = OthelloRunner(engine)
+    runner.time_out = float("inf")
+    points = 0.0
+    for game in range(games):
+        opening = create_opening(engine, random_plies, generator)
+        for probcut_color in (BLACK, WHITE):
+            runner.board = opening.clone()
+            for color in (BLACK, WHITE):
+                runner.players[color] = create_player(player_type, 'BLACK' if color == BLACK else 'WHITE')
+                runner.players[color].search_options = {
+                    'ordering': MoveOrderer(), 'probcut_threshold': threshold if color == probcut_color else None}
+                runner.players[color].table_bits = 18
+            runner.run_game(level)
+            black_score, white_score = runner.board.get_final_score()
+            difference = (black_score - white_score) * (1 if probcut_color == BLACK else -1)
+            points += 1.0 if difference > 0 else 0.5 if difference == 0 else 0.0
+        print('\rgame {:4}/{}: {:.1f} points'.format(game + 1, games, points), end='', flush=True)
+    print()
+    return points, 2 * games
+
+
+def main():
+    agent_choices = [agent_type.value for agent_type in AGENT_TYPES]
+    engines = [member.value for _, member in BoardEngine.__members__.items()]
+
+    parser = argparse.ArgumentParser(description='Calibrate ProbCut from Self-Play Games, or Measure it')
+    parser.add_argument('-a', '--agents', help='Agent Types (default = Composite)', choices=agent_choices,
+                        nargs='+', default=[AgentType.composite.value])
+    parser.add_argument('-g', '--games', help='Number of Self-Play Games (default = 40)', type=int, default=40)
+    parser.add_argument('-l', '--level', help='Level of the Self-Play Players (default = 2)', type=int, default=2)
+    parser.add_argument('-p', '--positions', help='Positions Searched per Agent Type (default = 600)',
+                        type=int, default=600)
+    parser.add_argument('-d', '--depths', help='Depths to Calibrate (default = 3 4 5)', type=int, nargs='+',
+                        default=[3, 4, 5])
+    parser.add_argument('-rm', '--random_moves', help='Random Moves at the Start of each Game (default = 6)',
+                        type=int, default=6)
+    parser.add_argument('-e', '--engine', help='Board Engine (default = Bitboard)',
+                        choices=engines, default=BoardEngine.bitboard.value)
+    parser.add_argument('--seed', help='Seed of the Random Moves (default = 472)', type=int, default=472)
+    parser.add_argument('-o', '--output', help='File to Write the Parameters to (default = {})'.format(
+        probcut.PROBCUT_FILE), default=probcut.PROBCUT_FILE)
+    parser.add_argument('--measure', help='Measure ProbCut (with the Parameters of the Output File) instead',
+                        action='store_true')
+    parser.add_argument('-t', '--threshold', help='ProbCut Threshold Measured (default = 1.5)', type=float,
+                        default=1.5)
+    parser.add_argument('-ml', '--measure_level', help='Level of the Measurements (default = 5)', type=int,
+                        default=5)
+    parser.add_argument('-mp', '--measure_positions', help='Positions Searched by the Speed Measurement '
+                                                           '(default = 100)', type=int, default=100)
+    parser.add_argument('-mg', '--measure_games', help='Openings of the Strength Measurement, each Played with '
+                                                       'both Colors (default = 10)', type=int, default=10)
+    args = parser.parse_args()
+
+    engine = BoardEngine(args.engine)
+    agent_types = [AgentType(agent) for agent in args.agents]
+    start_time = time.time()
+
+    positions = play_games(args.games, args.level, [PlayerType(agent_type.value) for agent_type in agent_types],
+                           engine, args.random_moves, args.seed)
+    boards = [convert_board(board_from_cells(cells, turn), engine) for cells, turn, _ in positions]
+    boards = [board for board in boards if not board.is_game_over()]
+    random.Random(args.seed).shuffle(boards)
+    boards = boards[:args.positions]
+    print('{} positions ({:.1f}s)'.format(len(boards), time.time() - start_time))
+
+    if args.measure:
+        probcut.set_parameters(probcut.load_parameters(args.output))
+        for agent_type in agent_types:
+            nodes, times, different_moves = measure_speed(boards[:args.measure_positions], agent_type,
+                                                          args.measure_level, args.threshold)
+            print('{} (level {}, threshold {}): {} -> {} nodes ({:.1%}), {:.1f}s -> {:.1f}s, '
+                  '{} different moves in {} positions'.format(
+                    agent_type.value, args.measure_level, args.threshold, nodes[0], nodes[1], nodes[1] / nodes[0],
+                    times[0], times[1], different_moves, min(len(boards), args.measure_positions)))
+            points, games = measure_strength(PlayerType(agent_type.value), args.measure_level, args.threshold,
+                                             args.measure_games, engine, args.random_moves, args.seed)
+            print('{}: ProbCut scores {:.1f}/{} ({:.1%}) against no ProbCut ({:.1f}s)'.format(
+                agent_type.value, points, games, points / games, time.time() - start_time))
+        return 0
+
+    parameters = dict()
+    for agent_type in agent_types:
+        samples = collect_samples(boards, agent_type, args.depths)
+        parameters[agent_type.value] = fit_cuts(samples)
+    probcut.save_parameters(parameters, args.output, details={
+        'positions': len(boards), 'games': args.games, 'level': args.level,
+        'date': time.strftime('%Y-%m-%d %H:%M:%S')})
+    print('Parameters written to {} ({:.1f}s)'.format(args.output, time.time() - start_time))
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,148 @@
+"""
+Lazy SMP: several processes search the same position at the same time, and share their results through a
+transposition table in shared memory (see transposition.SharedTranspositionTable).
+
+The main search runs in the current process, and its result is the one returned. The helpers run
+iterative deepening searches of the same position in worker processes, to slightly different depths (every
+other helper searches one ply deeper) and with slightly different move orderings, so they don't all search
+the same nodes in the same order: the main search finds the results of the helpers' subtrees in the table
+instead of searching them. Unlike the root splitting of parallel_search, the number of processes isn't
+limited by the number of root moves. The helpers are stopped as soon as the main search is done.
+"""
+import os
+import random
+import time
+from concurrent.futures import wait
+from multiprocessing import shared_memory
+
+from mini_max import AgentType, AlphaBeta, MoveOrderer
+from parallel_search import get_executor
+from pv_search import PVSearch
+from transposition import SharedTranspositionTable, attach_shared_memory
+
+# Options of the main search also used by the helpers (the others are the helpers' own)
+HELPER_OPTIONS = ('collect_stats', 'driver', 'probcut_threshold')
+
+# Range of the random history scores the move ordering of a helper starts with
+HELPER_HISTORY_NOISE = 16
+
+
+class SharedCancellationToken:
+    """
+    CancellationToken in shared memory: the main search cancels the searches of its helper processes with it.
+    It's created by one process, and the others attach to it by its name.
+    """
+
+    def __init__(self, name: str = None):
+        """
+        :param name: name of an existing token to attach to (None creates a new token)
+        """
+        self.__owner = name is None
+        self.__memory = None
+        if self.__owner:
+            self.__memory = shared_memory.SharedMemory(create=True, size=1)
+        else:
+            self.__memory = attach_shared_memory(name)
+        self.name = self.__memory.name
+
+    @property
+    def cancelled(self):
+        return self.__memory.buf[0] != 0
+
+    def cancel(self):
+        self.__memory.buf[0] = 1
+
+    def release(self):
+        """ Detach from the shared memory (and free it, in the process that created the token) """
+        if self.__memory is None:
+            return
+        self.__memory.close()
+        if self.__owner:
+            self.__memory.unlink()
+        self.__memory = None
+
+    def __del__(self):
+        self.release()
+
+
+def create_helper_ordering(worker_id: int) -> MoveOrderer:
+    """
+    Create the move ordering of a helper: its history scores start with a little noise (seeded by the worker),
+    so the moves the history doesn't know yet are searched in a different order by each helper
+    :param worker_id: number of the helper (from 1)
+    :return: the move ordering
+    """
+    generator = random.Random(worker_id)
+    ordering = MoveOrderer()
+    ordering.history = [[generator.randrange(HELPER_HISTORY_NOISE) for _ in range(8)] for _ in range(8)]
+    return ordering
+
+
+def _helper_search(search_class, board, max_depth: int, agent_type: AgentType, worker_id: int, table_name: str,
+                   table_bits: int, token_name: str, time_out, options: dict):
+    """
+    Search of a helper, in a worker process: iterative deepening until its depth, the time-out or the end
+    of the main search
+    :return: statistics of the search (None if they're not collected)
+    """
+    table = SharedTranspositionTable(table_bits, table_name)
+    token = SharedCancellationToken(token_name)
+    try:
+        agent = search_class(max_depth + worker_id % 2, agent_type, iterative=True, table=table,
+                             ordering=create_helper_ordering(worker_id), cancel_token=token, **options)
+        _, _, stats = agent.get_best_action_value_and_stats(board, time_out)
+        return stats
+    finally:
+        table.release()
+        token.release()
+
+
+class LazySMPAlphaBeta(AlphaBeta):
+
+    # Search of the helpers (the same as the main one: the values in the table depend on it)
+    helper_class = AlphaBeta
+
+    def __init__(self, max_depth: int, agent_type: AgentType, workers: int = 0, **options):
+        """
+        :param max_depth: depth of the search
+        :param agent_type: type of the agent (selects the heuristic used at the leaves)
+        :param workers: number of processes searching, including this one (0 uses all the CPU cores)
+        :param options: other options of the main search (its table must be a SharedTranspositionTable)
+        """
+        super().__init__(max_depth, agent_type, **options)
+        self.workers = workers if workers > 0 else os.cpu_count() or 1
+        if self.workers > 1 and not isinstance(self.table, SharedTranspositionTable):
+            raise ValueError('Lazy SMP needs a SharedTranspositionTable')
+        self._helper_options = {name: options[name] for name in HELPER_OPTIONS if name in options}
+
+    def _search(self, board, time_out):
+        # The endgame solver doesn't use the table: the helpers couldn't help it
+        if self.workers < 2 or (self.endgame_empties > 0 and board.count(0) <= self.endgame_empties):
+            return super()._search(board, time_out)
+
+        token = SharedCancellationToken()
+        executor = get_executor(self.workers)
+        remaining_time = time_out - (time.time() - self.start_time)
+        futures = [executor.submit(_helper_search, self.helper_class, board, self._max_depth, self.agent_type,
+                                   worker_id, self.table.name, self.table.size_bits, token.name, remaining_time,
+                                   self._helper_options)
+                   for worker_id in range(1, self.workers)]
+        try:
+            result = super()._search(board, time_out)
+        finally:
+            # The helpers are only useful to the main search
+            token.cancel()
+            wait(futures)
+            token.release()
+
+        for future in futures:
+            stats = future.result()
+            if stats is not None and self.stats is not None:
+                self.stats.merge(stats)
+        return result
+
+
+class LazySMPPVSearch(LazySMPAlphaBeta, PVSearch):
+    """ Lazy SMP with principal variation searches (see pv_search) """
+
+    helper_class = PVSearch
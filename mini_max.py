@@ -1,5 +1,7 @@
 from enum import Enum
 import time
+import probcut
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
 
 
 class AgentType(Enum):
@@ -9,61 +11,952 @@ class AgentType(Enum):
     mobile = 'Mobile'
     corner = 'Corner'
     half = 'Half'
+    pattern = 'Pattern'
+    tuned = 'Tuned'
+
+
+# Agent types whose heuristic depends on the last move played (the flips it made), not only on the position:
+# a position reached by another move order has another value, so their evaluations aren't stored in the table
+PATH_DEPENDENT_AGENT_TYPES = (AgentType.greedy,)
+
+
+class SearchDriver(Enum):
+    """ How each iteration of iterative deepening searches the root (see AlphaBeta.search_root) """
+    full = 'Full'
+    aspiration = 'Aspiration'
+    mtdf = 'MTD(f)'
+
+
+# Value of each square (indexed by [x][y]), from the composite heuristic:
+# https://kartikkukreja.wordpress.com/2013/03/30/heuristic-function-for-reversiothello/
+SQUARE_WEIGHTS = [[20, -3, 11, 8, 8, 11, -3, 20],
+                  [-3, -7, -4, 1, 1, -4, -7, -3],
+                  [11, -4, 2, 2, 2, 2, -4, 11],
+                  [8, 1, 2, -3, -3, 2, 1, 8],
+                  [8, 1, 2, -3, -3, 2, 1, 8],
+                  [11, -4, 2, 2, 2, 2, -4, 11],
+                  [-3, -7, -4, 1, 1, -4, -7, -3],
+                  [20, -3, 11, 8, 8, 11, -3, 20]]
+
+
+class MoveOrderer:
+    """
+    Orders the moves of a node so the ones most likely to cause a cutoff are searched first:
+    the best move stored in the transposition table, then the killer moves of the ply,
+    then by history score and finally by the static value of the square.
+    """
+
+    # Priorities of the move classes (history and square values break the ties)
+    table_move_priority = 3
+    first_killer_priority = 2
+    second_killer_priority = 1
+
+    def __init__(self, use_killers=True, use_history=True, use_square_values=True):
+        self.use_killers = use_killers
+        self.use_history = use_history
+        self.use_square_values = use_square_values
+
+        # Two killer moves per ply
+        self.killers = []
+
+        # History score of each square (indexed by [x][y])
+        self.history = [[0] * 8 for _ in range(8)]
+
+        # Statistics
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def clear(self):
+        """ Forget everything learned and reset the statistics """
+        self.killers = []
+        self.history = [[0] * 8 for _ in range(8)]
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def new_search(self):
+        """ Prepare for a new search: killers are forgotten, and old history scores count less """
+        self.killers = []
+        for column in self.history:
+            for y in range(8):
+                column[y] >>= 1
+
+    def order(self, moves, depth: int, table_move=None):
+        """
+        Sort the moves of a node
+        :param moves: legal moves of the node
+        :param depth: depth (ply) of the node
+        :param table_move: best move stored in the transposition table for the node (if any)
+        :return: the moves sorted from most to least promising
+        """
+        first_killer = second_killer = None
+        if self.use_killers and depth < len(self.killers):
+            first_killer, second_killer = self.killers[depth]
+        history = self.history if self.use_history else None
+        weights = SQUARE_WEIGHTS if self.use_square_values else None
+
+        def move_score(move):
+            if move == table_move:
+                priority = self.table_move_priority
+            elif move == first_killer:
+                priority = self.first_killer_priority
+            elif move == second_killer:
+                priority = self.second_killer_priority
+            else:
+                priority = 0
+            x, y = move
+            return (priority,
+                    history[x][y] if history is not None else 0,
+                    weights[x][y] if weights is not None else 0)
+
+        return sorted(moves, key=move_score, reverse=True)
+
+    def record_cutoff(self, move, depth: int, remaining_depth: int, move_index: int):
+        """
+        Update the killers and history with a move that caused a cutoff
+        :param move: the move causing the cutoff
+        :param depth: depth (ply) of the node
+        :param remaining_depth: depth that was left to search below the node
+        :param move_index: position of the move in the ordered moves
+        """
+        self.cutoffs += 1
+        if move_index == 0:
+            self.first_move_cutoffs += 1
+
+        # A pass is the only move of its node: there's nothing to learn from it
+        if move is None:
+            return
+
+        if self.use_killers:
+            while len(self.killers) <= depth:
+                self.killers.append((None, None))
+            if self.killers[depth][0] != move:
+                self.killers[depth] = (move, self.killers[depth][0])
+
+        if self.use_history:
+            x, y = move
+            self.history[x][y] += remaining_depth * remaining_depth
+
+    def first_move_cutoff_rate(self):
+        """ Fraction of the cutoffs caused by the first move searched """
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def __str__(self):
+        return 'Move ordering: {} cutoffs, {:.1%} on the first move'.format(
+            self.cutoffs, self.first_move_cutoff_rate())
+
+
+class CancellationToken:
+    """
+    Tells searches to stop as soon as possible. It can be set from another thread, and shared by several
+    searches; they check it with the clock (every few nodes), and return their best completed result.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class EndgameSolver:
+    """
+    Solves endgame positions exactly (perfect play until the end of the game) with a negamax search.
+    The score of a position is the final disc difference for the player to move (empty squares go
+    to the winner, like in Board.get_final_score), or only its sign (win/draw/loss) when not exact.
+
+    Moves are tried fastest-first (fewest opponent replies) while many squares are empty,
+    then by parity (squares in regions of the board with an odd number of empties first),
+    and the last few empties are handled by trying the empty squares directly instead of
+    generating the legal moves.
+    """
+
+    # How often (in nodes) the clock is checked
+    time_check_interval = 1024
+
+    def __init__(self, exact=True, fastest_first_empties=7, last_empties=4, cancel_token: CancellationToken = None):
+        """
+        :param exact: compute the exact disc difference (otherwise only win/draw/loss)
+        :param fastest_first_empties: use fastest-first ordering above this number of empty squares
+        :param last_empties: number of empty squares handled by the last-empties routine
+        :param cancel_token: token stopping the search when it's cancelled (like a time-out)
+        """
+        self.exact = exact
+        self.fastest_first_empties = fastest_first_empties
+        self.last_empties = last_empties
+        self.cancel_token = cancel_token if cancel_token is not None else CancellationToken()
+        self.start_time = 0
+        self.time_out = 0
+        self.node_limit = 0
+        self.timed_out = False
+
+        # Statistics
+        self.nodes = 0
+        self.elapsed_time = 0.0
+
+    def solve(self, board, time_out=float("inf"), node_limit: int = 0):
+        """
+        Find the best move of an endgame position
+        :param board: board to solve (it isn't modified)
+        :param time_out: time-out (in seconds); check timed_out before using the result
+        :param node_limit: maximum number of nodes searched (0 for no limit), like time_out
+        :return: the best move (None to pass) and the score of the position for the player to move
+        """
+        self.start_time = time.time()
+        self.time_out = time_out
+        self.node_limit = node_limit
+        self.timed_out = False
+        self.nodes = 0
+
+        board = board.clone()
+        empties = board.count(0)
+        alpha, beta = (-65, 65) if self.exact else (-2, 2)
+
+        best_move = None
+        moves = self._ordered_moves(board, board.get_legal_moves(), empties)
+        if not moves:
+            value = self._search(board, alpha, beta, False, empties)
+        else:
+            for move in moves:
+                undo = board.make_move(move)
+                value = -self._search(board, -beta, -alpha, False, empties - 1)
+                board.unmake_move(undo)
+                if value > alpha:
+                    best_move, alpha = move, value
+            value = alpha
+
+        self.elapsed_time = time.time() - self.start_time
+        return best_move, value
+
+    def _is_timed_out(self):
+        if self.nodes % self.time_check_interval == 0 and (
+                self.cancel_token.cancelled or 0 < self.node_limit < self.nodes
+                or time.time() - self.start_time > self.time_out):
+            self.timed_out = True
+        return self.timed_out
+
+    def _final_score(self, board):
+        """ Final score for the player to move (sign only if not exact) """
+        turn = board.get_turn()
+        mine = board.count(turn)
+        opponent = board.count(-turn)
+        if mine > opponent:
+            score = 64 - 2 * opponent
+        elif mine < opponent:
+            score = 2 * mine - 64
+        else:
+            score = 0
+        if not self.exact:
+            return (score > 0) - (score < 0)
+        return score
+
+    @staticmethod
+    def _odd_regions(board):
+        """ Get the set of quadrants containing an odd number of empty squares """
+        counts = [0, 0, 0, 0]
+        for x, y in board.get_squares(0):
+            counts[(x >> 2) * 2 + (y >> 2)] += 1
+        return {region for region in range(4) if counts[region] % 2 == 1}
+
+    def _ordered_moves(self, board, moves, empties: int):
+        """ Order the moves by parity, and fastest-first when many squares are empty """
+        if len(moves) < 2:
+            return moves
+
+        odd_regions = self._odd_regions(board)
+        if empties <= self.fastest_first_empties:
+            return sorted(moves, key=lambda move: ((move[0] >> 2) * 2 + (move[1] >> 2)) not in odd_regions)
+
+        scored = []
+        for move in moves:
+            undo = board.make_move(move)
+            replies = len(board.get_legal_moves())
+            board.unmake_move(undo)
+            scored.append((replies, ((move[0] >> 2) * 2 + (move[1] >> 2)) not in odd_regions, move))
+        scored.sort()
+        return [move for _, _, move in scored]
+
+    def _search(self, board, alpha, beta, passed: bool, empties: int):
+        """
+        Negamax search of a position until the end of the game
+        :param passed: whether the previous move was a pass
+        :param empties: number of empty squares
+        :return: score of the position for the player to move
+        """
+        self.nodes += 1
+        if self._is_timed_out():
+            return 0
+
+        if empties <= self.last_empties:
+            return self._search_last_empties(board, alpha, beta, passed)
+
+        moves = board.get_legal_moves()
+        if not moves:
+            if passed:
+                return self._final_score(board)
+            board.change_turn()
+            value = -self._search(board, -beta, -alpha, True, empties)
+            board.change_turn()
+            return value
+
+        best_value = float("-inf")
+        for move in self._ordered_moves(board, moves, empties):
+            undo = board.make_move(move)
+            value = -self._search(board, -beta, -alpha, False, empties - 1)
+            board.unmake_move(undo)
+
+            if value > best_value:
+                best_value = value
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+
+        return best_value
+
+    def _search_last_empties(self, board, alpha, beta, passed: bool):
+        """
+        Search of the last few empty squares: every empty square is tried directly
+        (a move that flips nothing isn't legal and is undone right away)
+        """
+        squares = board.get_squares(0)
+        if not squares:
+            return self._final_score(board)
+
+        odd_regions = self._odd_regions(board)
+        squares.sort(key=lambda square: ((square[0] >> 2) * 2 + (square[1] >> 2)) not in odd_regions)
+
+        best_value = None
+        for square in squares:
+            undo = board.make_move(square)
+            if board.get_last_flip_count() == 0:
+                board.unmake_move(undo)
+                continue
+
+            self.nodes += 1
+            value = -self._search_last_empties(board, -beta, -alpha, False)
+            board.unmake_move(undo)
+
+            if best_value is None or value > best_value:
+                best_value = value
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+
+        if best_value is not None:
+            return best_value
+
+        # No legal move: pass, or the game is over
+        if passed:
+            return self._final_score(board)
+        board.change_turn()
+        value = -self._search_last_empties(board, -beta, -alpha, True)
+        board.change_turn()
+        return value
+
+    def positions_per_second(self):
+        """ Number of positions solved per second by the last call to solve """
+        return self.nodes / self.elapsed_time if self.elapsed_time > 0 else 0.0
+
+    def __str__(self):
+        return 'Endgame solver: {} positions in {:.3f}s ({:.0f} positions/s)'.format(
+            self.nodes, self.elapsed_time, self.positions_per_second())
+
+
+class SearchStats:
+    """ Statistics collected by a search """
+
+    def __init__(self):
+        self.nodes = 0
+        # Number of leaf evaluations per heuristic (AgentType value)
+        self.leaf_evaluations = dict()
+        # Number of beta cutoffs by index of the move causing it (0 is the first move searched)
+        self.cutoffs = dict()
+        self.time_outs = 0
+        self.max_depth_completed = 0
+        self.solved_positions = 0
+        self.elapsed_time = 0.0
+        # Driver of the search (SearchDriver value) and number of searches of the root it did
+        self.driver = SearchDriver.full.value
+        self.root_searches = 0
+        # Nodes cut by ProbCut
+        self.probcuts = 0
+
+    def merge(self, other):
+        """ Add the statistics of another search (e.g. done by another process) """
+        self.nodes += other.nodes
+        for name, count in other.leaf_evaluations.items():
+            self.leaf_evaluations[name] = self.leaf_evaluations.get(name, 0) + count
+        for index, count in other.cutoffs.items():
+            self.cutoffs[index] = self.cutoffs.get(index, 0) + count
+        self.time_outs += other.time_outs
+        self.solved_positions += other.solved_positions
+        self.root_searches += other.root_searches
+        self.probcuts += other.probcuts
+
+    def effective_branching_factor(self):
+        """ Branching factor of a uniform tree of the depth reached that would have the same number of nodes """
+        if self.max_depth_completed == 0 or self.nodes == 0:
+            return 0.0
+        return self.nodes ** (1.0 / self.max_depth_completed)
+
+    def nodes_per_second(self):
+        return self.nodes / self.elapsed_time if self.elapsed_time > 0 else 0.0
+
+    def __str__(self):
+        total_cutoffs = sum(self.cutoffs.values())
+        cutoffs = ', '.join('{}: {}'.format(index, self.cutoffs[index]) for index in sorted(self.cutoffs)[:4])
+        return 'nodes: {}, leaves: {}, cutoffs: {} ({}{}), time-outs: {}, depth: {}, EBF: {:.2f}, ' \
+               '{:.0f} nodes/s, driver: {} ({} root searches){}{}'.format(
+                self.nodes, sum(self.leaf_evaluations.values()), total_cutoffs, cutoffs,
+                ', ...' if len(self.cutoffs) > 4 else '', self.time_outs, self.max_depth_completed,
+                self.effective_branching_factor(), self.nodes_per_second(), self.driver, self.root_searches,
+                ', solved positions: {}'.format(self.solved_positions) if self.solved_positions else '',
+                ', probcuts: {}'.format(self.probcuts) if self.probcuts else '')
 
 
 class AlphaBeta:
 
-    def __init__(self, max_depth: int, agent_type: AgentType):
+    # Growth factor assumed for the next iteration when the previous one was too fast to be measured
+    default_iteration_growth = 4.0
+
+    # Fraction of the time-out (and of the node budget) given to the endgame solver
+    # (the regular search uses the rest if it doesn't finish)
+    endgame_time_fraction = 0.5
+
+    # How often (in nodes) the clock and the cancellation token are checked
+    time_check_interval = 256
+
+    # Whether the value returned by a node can be outside of its window (needed by the MTD(f) driver)
+    fail_soft = False
+
+    # Width of the null windows (the values of the heuristics aren't integers)
+    null_window = 1e-6
+
+    # Aspiration driver: half-width of the first window (fraction of the expected value, with a minimum),
+    # growth factor of the side the value falls out of, and number of failures before it's fully open
+    aspiration_fraction = 0.1
+    aspiration_minimum = 1.0
+    aspiration_growth = 4.0
+    aspiration_widenings = 3
+
+    # MTD(f) driver: maximum number of null-window searches before searching the remaining window normally
+    mtdf_max_searches = 24
+
+    def __init__(self, max_depth: int, agent_type: AgentType, iterative=False, table: TranspositionTable = None,
+                 ordering: MoveOrderer = None, endgame_empties: int = 0, endgame_exact=True, collect_stats=False,
+                 cancel_token: CancellationToken = None, node_limit: int = 0,
+                 driver: SearchDriver = SearchDriver.full, probcut_threshold: float = None):
+        """
+        :param max_depth: maximum depth of the search
+        :param agent_type: type of the agent (selects the heuristic used at the leaves)
+        :param iterative: search depth 1, 2, ... up to max_depth instead of a single fixed-depth search
+        :param table: transposition table to use (boards must support get_hash)
+        :param ordering: move orderer to use (moves are searched in the board's order if not specified)
+        :param endgame_empties: solve the position with EndgameSolver when there are this many empty squares or fewer
+        :param endgame_exact: solve for the exact score (otherwise only for win/draw/loss)
+        :param collect_stats: collect a SearchStats during each search
+        :param cancel_token: token stopping the search when it's cancelled (see cancel)
+        :param node_limit: maximum number of nodes of each search (0 for no limit). It stops the search like
+                           the time-out does, but the result only depends on the position (not on the machine load)
+        :param driver: how iterative deepening searches the root, from the value of the previous iterations
+                       (MTD(f) needs a fail-soft search, and a transposition table to be efficient)
+        :param probcut_threshold: cut the nodes whose value is predicted outside of the window by this many
+                                  standard deviations (see probcut; None disables ProbCut)
+        """
+        if driver == SearchDriver.mtdf and not self.fail_soft:
+            raise ValueError('MTD(f) needs a fail-soft search (see pv_search.PVSearch)')
+
         self._max_depth = max_depth
+        self._depth_limit = max_depth
         self.agent_type = agent_type
+        self.iterative = iterative
+        self.table = table
+        self.ordering = ordering
+        self.endgame_empties = endgame_empties
+        self.endgame_exact = endgame_exact
+        self.solver = None  # type: EndgameSolver
+        self.collect_stats = collect_stats
+        self.stats = None  # type: SearchStats
+        self.cancel_token = cancel_token if cancel_token is not None else CancellationToken()
+        self.node_limit = node_limit
+        self.driver = driver
+        self.probcut_threshold = probcut_threshold
         self.start_time = 0
         self.time_out = 0
+        self.timed_out = False
+        self.completed_depth = 0
+
+        # Nodes searched by the current search (including the ones of the endgame solver)
+        self.nodes = 0
+        # Nodes left until the next check of the clock and the cancellation token
+        self._nodes_until_check = 0
+
+        # Heuristic function of the searched board type (set at the start of each search)
+        self._evaluate = None
+
+        # Store the evaluated nodes (leaves and finished games) in the table: not if their value depends on the
+        # path (the values of the other nodes only depend on the moves below them, so they're still stored)
+        self._store_evaluations = agent_type not in PATH_DEPENDENT_AGENT_TYPES
+
+        # Multi-ProbCut parameters of the agent type (None when ProbCut is off, or during its shallow searches)
+        self._probcuts = probcut.get_cuts(agent_type) if probcut_threshold is not None else None
 
     def get_best_action_and_value(self, board, time_out):
+        move, value, _ = self.get_best_action_value_and_stats(board, time_out)
+        return move, value
+
+    def get_best_action_value_and_stats(self, board, time_out):
+        """
+        Search the best move
+        :param board: board to search
+        :param time_out: time-out (in seconds)
+        :return: best move, its value and the statistics of the search (None if collect_stats is False)
+        """
+        self.start_time = time.time()
+        self.nodes = self._nodes_until_check = 0
+        self.stats = SearchStats() if self.collect_stats else None
+        if self.stats is not None:
+            self.stats.driver = self.driver.value
+        self._evaluate = type(board).HEURISTICS[self.agent_type]
+        move, value = self._search(board, time_out)
+        if self.stats is not None:
+            self.stats.max_depth_completed = self.completed_depth
+            self.stats.elapsed_time = time.time() - self.start_time
+        return move, value, self.stats
+
+    def _search(self, board, time_out):
+        self.time_out = time_out
+        self.timed_out = False
+        self.completed_depth = 0
+
+        # The search makes and unmakes moves in place, so work on a copy of the board
+        board = board.clone()
+
+        if self.endgame_empties > 0 and board.count(0) <= self.endgame_empties:
+            self.solver = EndgameSolver(self.endgame_exact, cancel_token=self.cancel_token)
+            result = self.solver.solve(board, time_out * self.endgame_time_fraction,
+                                       int(self.node_limit * self.endgame_time_fraction))
+            self.nodes = self.solver.nodes
+            if self.stats is not None:
+                self.stats.solved_positions = self.solver.nodes
+            if not self.solver.timed_out:
+                self.completed_depth = board.count(0)
+                return result
+
+        if self.ordering is not None:
+            self.ordering.new_search()
+
+        if self.iterative:
+            return self.iterative_deepening(board)
+
+        self._depth_limit = self._max_depth
+        result = self.search_root(board)
+        if not self.timed_out:
+            self.completed_depth = self._max_depth
+        elif result[0] is None:
+            # Stopped before the first move was searched: play any legal move rather than nothing
+            moves = board.get_legal_moves()
+            if moves:
+                result = moves[0], 0
+        return result
+
+    def search_successor(self, board, alpha, beta, time_out):
+        """
+        Search one successor of the root (a position where the opponent is to move) with the given window.
+        Used when the root moves are split between several searches.
+        :param board: successor board to search
+        :param alpha: best value already guaranteed at the root
+        :param beta: value above which the root doesn't care about the exact result
+        :param time_out: time-out (in seconds) for this search
+        :return: value of the successor (check timed_out before using it)
+        """
         self.start_time = time.time()
         self.time_out = time_out
-        return self.maxi_min(board, 0, float("-inf"), float("inf"))
+        self.timed_out = False
+        self.nodes = self._nodes_until_check = 0
+        self._depth_limit = self._max_depth
+        self.stats = SearchStats() if self.collect_stats else None
+        self._evaluate = type(board).HEURISTICS[self.agent_type]
+
+        if self.ordering is not None:
+            self.ordering.new_search()
+
+        _, value = self.mini_max(board.clone(), 1, alpha, beta)
+        if self.stats is not None:
+            self.stats.elapsed_time = time.time() - self.start_time
+            if not self.timed_out:
+                self.stats.max_depth_completed = self._max_depth
+        return value
+
+    def iterative_deepening(self, board):
+        """
+        Search with increasing depths, keeping the result of the last completed iteration.
+        A new iteration is only started if it's expected to finish within the time-out and the node budget.
+        :param board: board to search
+        :return: best move and its value from the deepest completed iteration
+        """
+        best_move, best_value = None, 0
+        previous_duration = 0
+        previous_nodes = 0
+        # Value of each completed iteration (by depth)
+        values = [None]
+
+        for depth in range(1, self._max_depth + 1):
+            iteration_start = time.time()
+            iteration_start_nodes = self.nodes
+            self._depth_limit = depth
+            # The leaves are evaluated for the player to move, so the value of the previous iteration has the
+            # opposite point of view: the expected value is the one of the iteration before it
+            move, value = self.search_root(board, values[depth - 2] if depth > 2 else None)
+
+            # Results of an interrupted iteration are not reliable
+            if self.timed_out:
+                break
+
+            best_move, best_value = move, value
+            self.completed_depth = depth
+            values.append(value)
+            if self.cancel_token.cancelled:
+                break
+
+            # Estimate the duration of the next iteration from the growth of the last two
+            duration = time.time() - iteration_start
+            if previous_duration > 0.001:
+                growth = max(duration / previous_duration, 1.0)
+            else:
+                growth = self.default_iteration_growth
+            previous_duration = duration
+
+            if time.time() - self.start_time + duration * growth > self.time_out:
+                break
+
+            # Same with the number of nodes (which doesn't depend on the machine, unlike the durations)
+            nodes = self.nodes - iteration_start_nodes
+            if self.node_limit > 0:
+                growth = max(nodes / previous_nodes, 1.0) if previous_nodes > 0 else self.default_iteration_growth
+                if self.nodes + nodes * growth > self.node_limit:
+                    break
+            previous_nodes = nodes
+
+        # The first iteration couldn't complete: play any legal move rather than nothing
+        if best_move is None and self.completed_depth == 0:
+            moves = board.get_legal_moves()
+            if moves:
+                best_move = moves[0]
+
+        return best_move, best_value
+
+    def search_root(self, board, guess=None):
+        """
+        Search the root to the current depth limit, with the driver
+        :param board: board to search
+        :param guess: expected value of the root (None if there isn't any: the full window is searched)
+        :return: best move and its value (check timed_out before using them)
+        """
+        if guess is None or self.driver == SearchDriver.full:
+            return self._search_window(board, float("-inf"), float("inf"))
+        if self.driver == SearchDriver.aspiration:
+            return self._aspiration_search(board, guess)
+        return self._mtdf_search(board, guess)
+
+    def _search_window(self, board, alpha, beta):
+        """ Search the root with the given window """
+        if self.stats is not None:
+            self.stats.root_searches += 1
+        return self.maxi_min(board, 0, alpha, beta)
+
+    def _aspiration_search(self, board, guess):
+        """
+        Search the root with a narrow window around the expected value, widening the side of the window
+        the value falls out of until it falls in it
+        """
+        delta = max(abs(guess) * self.aspiration_fraction, self.aspiration_minimum)
+        alpha, beta = guess - delta, guess + delta
+        failures = 0
+        while True:
+            move, value = self._search_window(board, alpha, beta)
+            if self.timed_out or alpha < value < beta:
+                return move, value
+
+            failures += 1
+            delta *= self.aspiration_growth
+            if value <= alpha:
+                alpha = guess - delta if failures < self.aspiration_widenings else float("-inf")
+            else:
+                beta = guess + delta if failures < self.aspiration_widenings else float("inf")
+
+    def _mtdf_search(self, board, guess):
+        """
+        Search the root with null windows only (MTD(f)): each one tells whether the value is above or below
+        the current guess, and the fail-soft value is the next guess, until the bounds meet.
+        The searches are done again and again, so most of the nodes come from the transposition table.
+        """
+        lower, upper = float("-inf"), float("inf")
+        best_move, value = None, guess
+        for _ in range(self.mtdf_max_searches):
+            beta = max(value, lower + self.null_window)
+            move, value = self._search_window(board, beta - self.null_window, beta)
+            if self.timed_out:
+                return best_move, value
+
+            if value < beta:
+                upper = value
+            else:
+                best_move, lower = move, value
+            if lower >= upper:
+                return best_move, lower
+
+        # Too slow to converge: search what's left of the window
+        return self._search_window(board, lower - self.null_window, upper + self.null_window)
+
+    def get_principal_variation(self, board, max_length: int = 0):
+        """
+        Get the principal variation of the last search from the transposition table:
+        the best move of the board, then the best reply, and so on
+        :param board: board the search started from
+        :param max_length: maximum number of moves (0 uses the depth of the search)
+        :return: list of moves (empty if there isn't any table)
+        """
+        variation = []
+        if self.table is None:
+            return variation
+
+        board = board.clone()
+        while len(variation) < (max_length or self._max_depth):
+            entry = self.table.probe(board.get_hash())
+            if entry is None or entry[3] is None or entry[3] not in board.get_legal_moves():
+                break
+            variation.append(entry[3])
+            board.make_move(entry[3])
+        return variation
+
+    def cancel(self):
+        """ Stop the search (e.g. from another thread): it returns its best completed result """
+        self.cancel_token.cancel()
+
+    def _is_timed_out(self):
+        if self.timed_out:
+            return True
+
+        self.nodes += 1
+        if 0 < self.node_limit < self.nodes:
+            self.timed_out = True
+            if self.stats is not None:
+                self.stats.time_outs += 1
+            return True
+
+        # Reading the clock at every node would be costly
+        self._nodes_until_check -= 1
+        if self._nodes_until_check > 0:
+            return False
+        self._nodes_until_check = self.time_check_interval
+
+        if self.cancel_token.cancelled or time.time() - self.start_time > self.time_out:
+            self.timed_out = True
+            if self.stats is not None:
+                self.stats.time_outs += 1
+        return self.timed_out
+
+    def _probe_table(self, key, depth: int, alpha, beta):
+        """
+        Look up the position in the transposition table
+        :return: (move, value) if the stored result can be used instead of searching (None otherwise),
+                 and the stored best move (None if there isn't any)
+        """
+        entry = self.table.probe(key)
+        if entry is None:
+            return None, None
+
+        stored_depth, value, bound, move, _ = entry
+
+        # Always search the root, so a move is returned
+        if depth == 0:
+            return None, move
+
+        # The leaf evaluation is done from the point of view of the player to move at the leaf,
+        # so only results searched with the same parity of remaining depth are comparable
+        remaining = self._depth_limit - depth
+        if stored_depth < remaining or (stored_depth - remaining) % 2 != 0:
+            return None, move
+
+        if bound == EXACT or (bound == LOWER_BOUND and value >= beta) or (bound == UPPER_BOUND and value <= alpha):
+            return (move, value), move
+        return None, move
+
+    def _probcut(self, board, depth: int, alpha, beta):
+        """
+        Multi-ProbCut: predict from shallow searches whether the search of the node would fail outside of the
+        window (the shallowest depth pair first)
+        :param board: board of the node
+        :param depth: depth (ply) of the node (not the root)
+        :param alpha: alpha of the node
+        :param beta: beta of the node
+        :return: the bound of the window the node fails on (None if it has to be searched)
+        """
+        max_node = depth % 2 == 0
+        pairs = self._probcuts.get((max_node, self._depth_limit - depth, probcut.get_stage(board.count(0))))
+        if not pairs:
+            return None
+        search = self.maxi_min if max_node else self.mini_max
+
+        # The shallow searches don't use ProbCut themselves
+        cuts, depth_limit = self._probcuts, self._depth_limit
+        self._probcuts = None
+        try:
+            for shallow_depth, slope, intercept, sigma in pairs:
+                self._depth_limit = depth + shallow_depth
+                margin = self.probcut_threshold * sigma
+                # Shallow values above (below) this bound predict a deep value above beta (below alpha)
+                if beta < float("inf"):
+                    bound = (beta + margin - intercept) / slope
+                    _, value = search(board, depth, bound - self.null_window, bound)
+                    if self.timed_out:
+                        return None
+                    if value >= bound:
+                        return beta
+                if alpha > float("-inf"):
+                    bound = (alpha - margin - intercept) / slope
+                    _, value = search(board, depth, bound, bound + self.null_window)
+                    if self.timed_out:
+                        return None
+                    if value <= bound:
+                        return alpha
+            return None
+        finally:
+            self._probcuts, self._depth_limit = cuts, depth_limit
+
+    def _ordered_moves(self, board, depth: int, table_move):
+        """ Get the legal moves of the board, in the order they should be searched (None to pass) """
+        moves = board.get_legal_moves()
+        if not moves:
+            # The player has to pass (the game isn't over, it's checked before). The pass is made in place and
+            # counts as a ply, so the player to move at the leaves is the same as in the other lines
+            return [None]
+        if self.ordering is not None:
+            return self.ordering.order(moves, depth, table_move)
+        return moves
+
+    def _store_table(self, key, depth: int, value, alpha, beta, best_move):
+        """ Store a search result (searched with the [alpha, beta] window) in the transposition table """
+        if self.timed_out:
+            return
+
+        if value <= alpha:
+            bound = UPPER_BOUND
+        elif value >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.table.store(key, self._depth_limit - depth, value, bound, best_move)
 
     def maxi_min(self, board, depth: int, alpha, beta):
-        if time.time() - self.start_time > self.time_out:
+        if self._is_timed_out():
             return None, 0
 
-        if depth == self._max_depth or board.is_game_over():
-            evaluation_function = board.heuristics[self.agent_type]
-            return None, evaluation_function()
+        stats = self.stats
+        if stats is not None:
+            stats.nodes += 1
+
+        key = table_move = None
+        if self.table is not None:
+            key = board.get_hash()
+            result, table_move = self._probe_table(key, depth, alpha, beta)
+            if result is not None:
+                return result
+
+        if depth == self._depth_limit or board.is_game_over():
+            value = self._evaluate(board)
+            if stats is not None:
+                stats.leaf_evaluations[self.agent_type.value] = stats.leaf_evaluations.get(self.agent_type.value, 0) + 1
+            if key is not None and self._store_evaluations:
+                self.table.store(key, self._depth_limit - depth, value, EXACT, None)
+            return None, value
 
+        if self._probcuts and depth > 0:
+            cut = self._probcut(board, depth, alpha, beta)
+            if cut is not None:
+                if stats is not None:
+                    stats.probcuts += 1
+                return None, cut
+
+        original_alpha = alpha
         best_move = None
-        successors = board.get_successors()
+        for index, next_move in enumerate(self._ordered_moves(board, depth, table_move)):
+            undo = board.make_move(next_move)
+            _, value = self.mini_max(board, depth + 1, alpha, beta)
+            board.unmake_move(undo)
 
-        for next_move, next_state in successors:
-            _, value = self.mini_max(next_state, depth + 1, alpha, beta)
+            # The value of an interrupted search isn't reliable: keep the best of the moves searched before
+            if self.timed_out:
+                break
 
             if value > alpha:
                 best_move, alpha = next_move, value
 
             if alpha >= beta:
+                if self.ordering is not None:
+                    self.ordering.record_cutoff(next_move, depth, self._depth_limit - depth, index)
+                if stats is not None:
+                    stats.cutoffs[index] = stats.cutoffs.get(index, 0) + 1
                 break
 
+        if key is not None:
+            self._store_table(key, depth, alpha, original_alpha, beta, best_move)
+
         return best_move, alpha
 
     def mini_max(self, board, depth: int, alpha, beta):
-        if time.time() - self.start_time > self.time_out:
+        if self._is_timed_out():
             return None, 0
 
-        if depth == self._max_depth or board.is_game_over():
-            evaluation_function = board.heuristics[self.agent_type]
-            return None, evaluation_function()
+        stats = self.stats
+        if stats is not None:
+            stats.nodes += 1
+
+        key = table_move = None
+        if self.table is not None:
+            key = board.get_hash()
+            result, table_move = self._probe_table(key, depth, alpha, beta)
+            if result is not None:
+                return result
 
+        if depth == self._depth_limit or board.is_game_over():
+            value = self._evaluate(board)
+            if stats is not None:
+                stats.leaf_evaluations[self.agent_type.value] = stats.leaf_evaluations.get(self.agent_type.value, 0) + 1
+            if key is not None and self._store_evaluations:
+                self.table.store(key, self._depth_limit - depth, value, EXACT, None)
+            return None, value
+
+        if self._probcuts and depth > 0:
+            cut = self._probcut(board, depth, alpha, beta)
+            if cut is not None:
+                if stats is not None:
+                    stats.probcuts += 1
+                return None, cut
+
+        original_beta = beta
         best_move = None
-        successors = board.get_successors()
+        for index, next_move in enumerate(self._ordered_moves(board, depth, table_move)):
+            undo = board.make_move(next_move)
+            _, value = self.maxi_min(board, depth + 1, alpha, beta)
+            board.unmake_move(undo)
 
-        for next_move, next_state in successors:
-            _, value = self.maxi_min(next_state, depth + 1, alpha, beta)
+            if self.timed_out:
+                break
 
             if value < beta:
                 best_move, beta = next_move, value
 
             if alpha >= beta:
+                if self.ordering is not None:
+                    self.ordering.record_cutoff(next_move, depth, self._depth_limit - depth, index)
+                if stats is not None:
+                    stats.cutoffs[index] = stats.cutoffs.get(index, 0) + 1
                 break
 
+        if key is not None:
+            self._store_table(key, depth, beta, alpha, original_beta, best_move)
+
         return best_move, beta
@@ -0,0 +1,364 @@
+"""
+Opening book: win statistics of the moves played from the positions of the first plies of many games,
+so the players can answer well-known openings instantly instead of searching them.
+
+The book is built from game records:
+    - WTHOR files (.wtb, the standard archive format of the French Othello federation)
+    - logs of othello_runner.py (every game is logged with a 'Moves:' line, see format_moves)
+Positions are normalised with the 8 symmetries of the board (rotations and reflections), so games
+reaching the same position in different orientations add to the same statistics.
+
+The book is stored in a compact binary file (OPENING_BOOK_FILE), built by running this module:
+    python opening_book.py -w archive/WTH_2019.wtb archive/WTH_2020.wtb -l logs/*.log
+"""
+import argparse
+import os
+import re
+import struct
+import zlib
+
+from bit_board import BitBoard
+from board import Board, BLACK, WHITE
+from utils import BoardEngine, convert_board
+
+OPENING_BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+
+# File format: header (magic, version, number of records), then the records compressed with zlib.
+# A record is a position (black and white bitboards, color to move), a move (square x * 8 + y)
+# and the number of games won, drawn and lost by the player making the move.
+FILE_MAGIC = b'OBOK'
+FILE_VERSION = 1
+HEADER_FORMAT = '<4sHI'
+RECORD = struct.Struct('<QQbBIII')
+
+# WTHOR files: a 16-byte header (the number of games is a 32-bit integer at offset 4), then 68 bytes per game:
+# tournament, black and white player numbers, black's final disc count, black's theoretical disc count
+# and 60 moves (10 * row + column, both from 1; row 1 is the top of the board, 0 ends the game)
+WTHOR_HEADER = struct.Struct('<BBBBIHHBBBB')
+WTHOR_GAME = struct.Struct('<HHHBB60s')
+
+# Number of plies of every game added to the book
+DEFAULT_PLIES = 20
+
+# Number of games a move needs in the book to be played
+DEFAULT_MIN_GAMES = 3
+
+# Text of a pass in the move lists of the logs
+PASS_STRING = '--'
+
+MOVES_PATTERN = re.compile(r'Moves:\s*(.*)$')
+
+FULL_MASK = 0xFFFFFFFFFFFFFFFF
+
+
+def _flip_columns(bits):
+    """ Mirror a bitboard from left to right (x -> 7 - x): reverse the bytes """
+    return int.from_bytes(bits.to_bytes(8, 'little'), 'big')
+
+
+def _flip_rows(bits):
+    """ Mirror a bitboard from top to bottom (y -> 7 - y): reverse the bits of every byte """
+    bits = ((bits >> 1) & 0x5555555555555555) | ((bits & 0x5555555555555555) << 1)
+    bits = ((bits >> 2) & 0x3333333333333333) | ((bits & 0x3333333333333333) << 2)
+    return ((bits >> 4) & 0x0F0F0F0F0F0F0F0F) | ((bits & 0x0F0F0F0F0F0F0F0F) << 4)
+
+
+def _transpose(bits):
+    """ Mirror a bitboard along its diagonal ((x,y) -> (y,x)) """
+    swap = 0x0F0F0F0F00000000 & (bits ^ (bits << 28))
+    bits ^= swap ^ (swap >> 28)
+    swap = 0x3333000033330000 & (bits ^ (bits << 14))
+    bits ^= swap ^ (swap >> 14)
+    swap = 0x5500550055005500 & (bits ^ (bits << 7))
+    bits ^= swap ^ (swap >> 7)
+    return bits & FULL_MASK
+
+
+def transform(bits, symmetry: int):
+    """
+    Apply one of the 8 symmetries of the board to a bitboard
+    :param bits: bitboard (bit x * 8 + y is the cell (x,y))
+    :param symmetry: 0 to 7: transpose (bit 2), then mirror the rows (bit 1), then the columns (bit 0)
+    :return: transformed bitboard
+    """
+    if symmetry & 4:
+        bits = _transpose(bits)
+    if symmetry & 2:
+        bits = _flip_rows(bits)
+    if symmetry & 1:
+        bits = _flip_columns(bits)
+    return bits
+
+
+def normalise(black, white):
+    """
+    Find the canonical orientation of a position: the smallest one of its 8 symmetric positions
+    :param black: bitboard of the black discs
+    :param white: bitboard of the white discs
+    :return: (black, white) of the canonical position, and the symmetries giving it
+    """
+    best = None
+    symmetries = []
+    for symmetry in range(8):
+        position = (transform(black, symmetry), transform(white, symmetry))
+        if best is None or position < best:
+            best = position
+            symmetries = [symmetry]
+        elif position == best:
+            symmetries.append(symmetry)
+    return best, symmetries
+
+
+def _canonical_move(move, symmetries):
+    """ Square of a move in the canonical orientation (the smallest one when the position is symmetric) """
+    bit = 1 << (move[0] * 8 + move[1])
+    return min(transform(bit, symmetry).bit_length() - 1 for symmetry in symmetries)
+
+
+def format_moves(moves):
+    """
+    Write a list of moves as text (e.g. 'F5 D6 C3 -- D3'), see parse_moves
+    :param moves: list of moves ((x,y), None for a pass)
+    :return: the moves, separated by spaces
+    """
+    return ' '.join(PASS_STRING if move is None else Board.move_string(move) for move in moves)
+
+
+def parse_moves(text: str):
+    """
+    Read a list of moves written by format_moves (or any list of moves like 'f5d6c3')
+    :param text: moves, with or without spaces
+    :return: list of moves ((x,y), None for a pass)
+    """
+    moves = []
+    for token in re.findall(r'[a-hA-H][1-8]|' + re.escape(PASS_STRING), text):
+        if token == PASS_STRING:
+            moves.append(None)
+        else:
+            moves.append((ord(token[0].upper()) - ord('A'), int(token[1]) - 1))
+    return moves
+
+
+def read_wthor(path: str):
+    """
+    Read the games of a WTHOR file
+    :param path: file to read
+    :return: list of games, each one being a list of moves ((x,y), passes aren't recorded)
+    """
+    with open(path, 'rb') as wthor_file:
+        content = wthor_file.read()
+
+    if len(content) < WTHOR_HEADER.size:
+        raise ValueError('{} is not a WTHOR file'.format(path))
+    header = WTHOR_HEADER.unpack_from(content)
+    count, board_size = header[4], header[8]
+    if board_size not in (0, 8) or len(content) < WTHOR_HEADER.size + count * WTHOR_GAME.size:
+        raise ValueError('{} is not a WTHOR file of 8x8 games'.format(path))
+
+    games = []
+    for offset in range(WTHOR_HEADER.size, WTHOR_HEADER.size + count * WTHOR_GAME.size, WTHOR_GAME.size):
+        codes = WTHOR_GAME.unpack_from(content, offset)[5]
+        moves = []
+        for code in codes:
+            if code == 0:
+                break
+            # Row 1 is the top of the board, where y is 7
+            moves.append((code % 10 - 1, 8 - code // 10))
+        games.append(moves)
+    return games
+
+
+def read_runner_log(path: str):
+    """
+    Read the games of a log of othello_runner.py
+    :param path: file to read
+    :return: list of games, each one being a list of moves ((x,y), None for a pass)
+    """
+    games = []
+    with open(path) as log_file:
+        for line in log_file:
+            match = MOVES_PATTERN.search(line)
+            if match:
+                games.append(parse_moves(match.group(1)))
+    return games
+
+
+class OpeningBook:
+    """
+    Statistics of the moves played from the positions of the book, stored in their canonical orientation:
+    positions[(black, white, turn)][move square] = [wins, draws, losses] of the player making the move
+    """
+
+    def __init__(self):
+        self.positions = dict()
+        self.games = 0
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add_game(self, moves, plies: int = DEFAULT_PLIES):
+        """
+        Replay a game and add its first moves to the book
+        :param moves: moves of the game ((x,y), passes can be omitted)
+        :param plies: number of moves added to the book
+        :return: True if the game was added, False if it's invalid or unfinished
+        """
+        board = BitBoard()
+        played = []
+        for move in moves:
+            if move is None:
+                board.make_move(None)
+                continue
+            # Passes can be implicit (like in WTHOR files)
+            if move not in board.get_legal_moves() and not board.get_legal_moves():
+                board.make_move(None)
+            if move not in board.get_legal_moves():
+                return False
+            played.append((board.get_bits(BLACK), board.get_bits(WHITE), board.get_turn(), move))
+            board.make_move(move)
+
+        if not board.is_game_over():
+            return False
+
+        black_score, white_score = board.get_final_score()
+        for black, white, turn, move in played[:plies]:
+            (black, white), symmetries = normalise(black, white)
+            moves_stats = self.positions.setdefault((black, white, turn), dict())
+            stats = moves_stats.setdefault(_canonical_move(move, symmetries), [0, 0, 0])
+            difference = (white_score - black_score) * turn
+            stats[0 if difference > 0 else 1 if difference == 0 else 2] += 1
+        self.games += 1
+        return True
+
+    def get_move_stats(self, board):
+        """
+        Get the statistics of the legal moves of a position
+        :param board: position to look up
+        :return: list of (move, wins, draws, losses) for the moves in the book
+        """
+        board = convert_board(board, BoardEngine.bitboard)
+        (black, white), symmetries = normalise(board.get_bits(BLACK), board.get_bits(WHITE))
+        moves_stats = self.positions.get((black, white, board.get_turn()))
+        if not moves_stats:
+            return []
+
+        result = []
+        for move in board.get_legal_moves():
+            stats = moves_stats.get(_canonical_move(move, symmetries))
+            if stats is not None:
+                result.append((move,) + tuple(stats))
+        return result
+
+    def get_move(self, board, min_games: int = DEFAULT_MIN_GAMES):
+        """
+        Choose the book move of a position: the one with the best score (wins + draws / 2) per game,
+        among the moves played in at least min_games games
+        :param board: position to look up
+        :param min_games: minimum number of games of a move
+        :return: the move, or None if the position (or none of its moves) is in the book
+        """
+        best_move, best_key = None, None
+        for move, wins, draws, losses in self.get_move_stats(board):
+            games = wins + draws + losses
+            if games < min_games:
+                continue
+            key = ((wins + draws / 2) / games, games)
+            if best_key is None or key > best_key:
+                best_move, best_key = move, key
+        return best_move
+
+    def save(self, path=OPENING_BOOK_FILE):
+        """
+        Write the book to a binary file
+        :param path: file to write
+        """
+        data = bytearray()
+        count = 0
+        for (black, white, turn), moves_stats in sorted(self.positions.items()):
+            for move, (wins, draws, losses) in sorted(moves_stats.items()):
+                data += RECORD.pack(black, white, turn, move, wins, draws, losses)
+                count += 1
+
+        with open(path, 'wb') as book_file:
+            book_file.write(struct.pack(HEADER_FORMAT, FILE_MAGIC, FILE_VERSION, count))
+            book_file.write(zlib.compress(bytes(data), 9))
+
+    @staticmethod
+    def load(path=OPENING_BOOK_FILE):
+        """
+        Read a book from a binary file
+        :param path: file to read
+        :return: the book
+        """
+        with open(path, 'rb') as book_file:
+            content = book_file.read()
+
+        magic, version, count = struct.unpack_from(HEADER_FORMAT, content)
+        if magic != FILE_MAGIC or version != FILE_VERSION:
+            raise ValueError('{} is not an opening book file (version {})'.format(path, FILE_VERSION))
+        data = zlib.decompress(content[struct.calcsize(HEADER_FORMAT):])
+        if len(data) != count * RECORD.size:
+            raise ValueError('{}: expected {} records, found {} bytes'.format(path, count, len(data)))
+
+        book = OpeningBook()
+        for black, white, turn, move, wins, draws, losses in RECORD.iter_unpack(data):
+            book.positions.setdefault((black, white, turn), dict())[move] = [wins, draws, losses]
+        return book
+
+
+# Book used by the players (loaded on first use, False when there isn't any)
+_book = None
+
+
+def get_book():
+    """ Get the book in use, loading it from OPENING_BOOK_FILE on first use (None if the file doesn't exist) """
+    global _book
+    if _book is None:
+        _book = OpeningBook.load() if os.path.exists(OPENING_BOOK_FILE) else False
+    return _book if _book is not False else None
+
+
+def set_book(book: OpeningBook):
+    """
+    Replace the book in use
+    :param book: book to use (None to play without a book)
+    """
+    global _book
+    _book = book if book is not None else False
+
+
+def lookup(board):
+    """
+    Get the book move of a position with the book in use
+    :param board: position to look up
+    :return: the move, or None if there isn't any
+    """
+    book = get_book()
+    return book.get_move(board) if book is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the Opening Book from Game Records')
+    parser.add_argument('-w', '--wthor', help='WTHOR Files (.wtb) to Read', nargs='*', default=[])
+    parser.add_argument('-l', '--logs', help='Logs of othello_runner.py to Read', nargs='*', default=[])
+    parser.add_argument('-p', '--plies', help='Number of Plies of each Game added to the Book (default = {})'.format(
+        DEFAULT_PLIES), type=int, default=DEFAULT_PLIES)
+    parser.add_argument('-o', '--output', help='File to Write the Book to (default = {})'.format(OPENING_BOOK_FILE),
+                        default=OPENING_BOOK_FILE)
+    args = parser.parse_args()
+
+    book = OpeningBook()
+    skipped = 0
+    for path in args.wthor:
+        for moves in read_wthor(path):
+            skipped += not book.add_game(moves, args.plies)
+    for path in args.logs:
+        for moves in read_runner_log(path):
+            skipped += not book.add_game(moves, args.plies)
+
+    book.save(args.output)
+    print('{} games ({} skipped), {} positions written to {}'.format(book.games, skipped, len(book), args.output))
+
+
+if __name__ == '__main__':
+    main()
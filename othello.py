@@ -150,6 +150,7 @@ class Othello:
         self.black_player_level = IntVar()
         self.white_player_level = IntVar()
         self.time_out_value = IntVar()
+        self.ponder_value = BooleanVar()
 
         # Default player types and levels
         self.black_player_type.set(PlayerType.human.value)
@@ -271,6 +272,12 @@ class Othello:
         self.start_game_button.configure(image=self.start_game_button.img, compound=LEFT)
         self.start_game_button.grid(row=2, column=2, sticky='ew')
 
+        # Pondering check-box (the computer thinks on the expected reply while the human plays)
+        self.ponder_check = ttk.Checkbutton(self.players_frame, text="Think during the Human's Turn",
+                                            name='ponder_check',
+                                            variable=self.ponder_value)
+        self.ponder_check.grid(row=3, column=2, sticky=W)
+
         # Configure column weights on the parent
         self.players_frame.grid_columnconfigure(0, weight=1)
         self.players_frame.grid_columnconfigure(1, weight=1)
@@ -530,11 +537,14 @@ class Othello:
 
         self.players[BLACK] = create_player(black_player_type, black_player_name)
         self.players[WHITE] = create_player(white_player_type, white_player_name)
+        for player in self.players.values():
+            player.pondering = self.ponder_value.get()
 
         self.current_player = BLACK
 
         # Enable and disable widgets accordingly
         self.start_game_button.config(state=DISABLED)
+        self.ponder_check.config(state=DISABLED)
         self.black_player_name_entry.config(state=DISABLED)
         self.black_player_type_combo.config(state=DISABLED)
         self.white_player_name_entry.config(state=DISABLED)
@@ -553,7 +563,7 @@ class Othello:
         self.white_player_type.set(PlayerType.human.value)
         self.black_player_name.set('')
         self.white_player_name.set('')
-        self.players = []
+        self.players = dict()
         self.current_player = 0
 
     def reset_game(self):
@@ -564,12 +574,17 @@ class Othello:
         self.game_started = False
         self.stop_timer = True
 
+        # Stop the AI thinking (its move thread sees that the game was reset, and drops the move)
+        for player in self.players.values():
+            player.stop_move()
+
         # Enable and disable widgets accordingly
         self.black_player_name_entry.config(state=NORMAL)
         self.black_player_type_combo.config(state=NORMAL)
         self.white_player_name_entry.config(state=NORMAL)
         self.white_player_type_combo.config(state=NORMAL)
         self.start_game_button.config(state=NORMAL)
+        self.ponder_check.config(state=NORMAL)
         self.reset_button.config(state=DISABLED)
         self.white_player_level_spin.configure(state=DISABLED)
         self.black_level_spin.configure(state=DISABLED)
@@ -645,10 +660,16 @@ class Othello:
         current_player = self.players[self.current_player]
         player_level = self.black_player_level.get() if self.current_player == BLACK else self.white_player_level.get()
         next_move, value = current_player.get_best_move(self.board, player_level, self.time_out_value.get())
+        if self.players.get(self.current_player) is not current_player:
+            return
         self.last_move = next_move
         self.last_color = self.current_player
         self.execute_move()
 
+        # Think on the expected reply while the human plays
+        if current_player.pondering and not self.board.is_game_over():
+            current_player.ponder(self.board, player_level)
+
     def execute_move(self):
         self.all_moves.append(self.last_move)
         self.move_history_index += 1
@@ -3,15 +3,29 @@ Run Game in the console (AI vs AI).
 """
 import time
 import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # User defined modules
-from player import Player, PlayerType, create_player
+from player import Player, PlayerType, SearchAlgorithm, create_player
+from mini_max import MoveOrderer, SearchDriver
+import parallel_search
 from board import Board, BLACK, WHITE
 from log import logger
+from utils import BoardEngine, create_board, save_positions
+from opening_book import format_moves
 
 # Valid choices for player type
 player_types = [member.value for _, member in PlayerType.__members__.items() if member.value != 'Human']
 
+# Valid choices for the search algorithm
+search_algorithms = [member.value for _, member in SearchAlgorithm.__members__.items()]
+
+# Valid choices for the driver of iterative deepening
+search_drivers = [member.value for _, member in SearchDriver.__members__.items()]
+
+# Valid choices for the board engine
+board_engines = [member.value for _, member in BoardEngine.__members__.items()]
+
 # Minimum and maximum values
 minimum_level = 1
 maximum_level = 6
@@ -30,6 +44,10 @@ parser.add_argument('-bp', '--black_player', help='Type of the Black Player', ty
                     choices=player_types)
 parser.add_argument('-wp', '--white_player', help='Type of the White Player', type=str,
                     choices=player_types)
+parser.add_argument('-bs', '--black_search', help='Search Algorithm of the Black Player (default = AlphaBeta)',
+                    type=str, choices=search_algorithms, default=SearchAlgorithm.alpha_beta.value)
+parser.add_argument('-ws', '--white_search', help='Search Algorithm of the White Player (default = AlphaBeta)',
+                    type=str, choices=search_algorithms, default=SearchAlgorithm.alpha_beta.value)
 parser.add_argument('-min', '--min_level', help='Minimum Level to Start with (default = 1)',
                     type=int, choices=range(minimum_level, maximum_level + 1), default=1,
                     metavar=range_meta_variable.format(minimum_level, maximum_level))
@@ -39,13 +57,122 @@ parser.add_argument('-max', '--max_level', help='Maximum Level to Reach (default
 parser.add_argument('-t', '--time_out', help='Time-out Value (in Seconds) for each Move (default = 10)',
                     type=int, choices=range(minimum_timeout, maximum_timeout + 1), default=10,
                     metavar=range_meta_variable.format(minimum_timeout, maximum_timeout))
-
-args = parser.parse_args()
+parser.add_argument('-nl', '--node_limit', help='Maximum Number of Nodes Searched for each Move '
+                                                '(default = 0: no limit).\nReplaces the Time-out, so the Games '
+                                                'only Depend on the Settings',
+                    type=int, default=0)
+parser.add_argument('-e', '--engine', help='Board Engine used by the Game and the Search (default = List)',
+                    type=str, choices=board_engines, default=BoardEngine.list.value)
+parser.add_argument('-id', '--iterative', help='Use Iterative Deepening up to the Level (within the Time-out)',
+                    action='store_true')
+parser.add_argument('-dr', '--driver', help='How each Iteration of Iterative Deepening Searches the Root '
+                                           '(default = Full).\nMTD(f) needs the PVS Search Algorithm',
+                    type=str, choices=search_drivers, default=SearchDriver.full.value)
+parser.add_argument('-pc', '--probcut', help='Prune Nodes with ProbCut when a Shallow Search Predicts a Cut-off '
+                                            'with this many Standard Deviations of Confidence (e.g. 1.5, '
+                                            'default = no ProbCut).\nNeeds the Parameters of calibrate_probcut.py',
+                    type=float)
+parser.add_argument('-tt', '--table_bits',
+                    help='Size of the Transposition Table as a Power of 2 (default = 0: no table)',
+                    type=int, choices=range(0, 27), default=0, metavar=range_meta_variable.format(0, 26))
+parser.add_argument('-pt', '--persist_table', help='Keep the Transposition Table between Moves of a Game',
+                    action='store_true')
+parser.add_argument('-j', '--jobs', help='Number of Processes Searching the Root Moves in Parallel '
+                                        '(AlphaBeta only, or any Search with Lazy SMP, default = 1, '
+                                        '0 = all CPU cores)',
+                    type=int, default=1)
+parser.add_argument('-ls', '--lazy_smp', help='With several Jobs, every Process Searches the whole Position '
+                                             '(Lazy SMP), Sharing a Transposition Table, instead of Splitting '
+                                             'the Root Moves',
+                    action='store_true')
+parser.add_argument('-eg', '--endgame',
+                    help='Solve the Endgame Exactly from this many Empty Squares (default = 0: never)',
+                    type=int, choices=range(0, 21), default=0, metavar=range_meta_variable.format(0, 20))
+parser.add_argument('-wld', '--win_loss_draw',
+                    help='Only Solve the Endgame for Win/Loss/Draw (faster than Exact Score)', action='store_true')
+parser.add_argument('-s', '--stats', help='Collect Search Statistics and Log them for every Move',
+                    action='store_true')
+parser.add_argument('-o', '--ordering', help='Order Moves using Killer Moves, History and Square Values',
+                    action='store_true')
+parser.add_argument('-bl', '--batch_leaves', help='Evaluate the Leaves of the Search in Batches with NumPy '
+                                                '(AlphaBeta with Simple, Corner, Mobile, Composite and Tuned Players)',
+                    action='store_true')
+parser.add_argument('-ub', '--use_book', help='Play the Moves of the Opening Book (built with opening_book.py) '
+                                             'instead of Searching them',
+                    action='store_true')
+parser.add_argument('-tp', '--tournament_players', help='Play a Tournament between these Player Types '
+                                                      '(all pairings, both colors, every level)',
+                    type=str, choices=player_types, nargs='+', metavar='PLAYER_TYPE')
+parser.add_argument('-tw', '--tournament_workers', help='Number of Games Played at the Same Time in a Tournament '
+                                                        '(default = 0: one per CPU core)',
+                    type=int, default=0)
+parser.add_argument('-rp', '--record_positions', help='Append the Positions of every Game (with its Final Score) '
+                                                      'to this File (used by tune_weights.py)',
+                    type=str)
+
+
+def time_out_message(time_out):
+    """ Describe the time-out of the moves (there isn't any when the searches are limited by a node budget) """
+    if time_out == float("inf"):
+        return 'No Move Time-out'
+    return 'Move Time-out Value is {} Second{}'.format(time_out, 's' if time_out > 1 else '')
+
+
+def configure_player(player: Player, settings: dict, color: int):
+    """
+    Configure the search of a player from the command-line settings
+    :param player: player to configure
+    :param settings: command-line arguments (as a dictionary)
+    :param color: color of the player
+    """
+    player.search_algorithm = SearchAlgorithm(settings['black_search' if color == BLACK else 'white_search'])
+    player.search_options['iterative'] = settings['iterative']
+    player.table_bits = settings['table_bits']
+    player.persistent_table = settings['persist_table']
+    player.workers = settings['jobs']
+    player.lazy_smp = settings['lazy_smp']
+    player.search_options['endgame_empties'] = settings['endgame']
+    player.search_options['endgame_exact'] = not settings['win_loss_draw']
+    player.search_options['collect_stats'] = settings['stats']
+    player.search_options['node_limit'] = settings['node_limit']
+    player.search_options['driver'] = SearchDriver(settings['driver'])
+    player.search_options['probcut_threshold'] = settings['probcut']
+    if settings['ordering']:
+        player.search_options['ordering'] = MoveOrderer()
+    player.batch_leaves = settings['batch_leaves']
+    player.use_book = settings['use_book']
+
+
+def play_tournament_game(black_type: PlayerType, white_type: PlayerType, level: int, time_out: int,
+                         engine: BoardEngine, settings: dict, record_positions=False):
+    """
+    Play one game of a tournament (in a worker process)
+    :return: the player types, the level, the final scores (black, white), the duration of the game,
+             its moves and its positions (None if record_positions is False)
+    """
+    black_player = create_player(black_type, 'BLACK')
+    white_player = create_player(white_type, 'WHITE')
+    for color, player in ((BLACK, black_player), (WHITE, white_player)):
+        configure_player(player, settings, color)
+        # The games already run in parallel
+        player.workers = 1
+
+    runner = OthelloRunner(engine)
+    runner.time_out = time_out
+    runner.board = create_board(engine)
+    runner.players[BLACK] = black_player
+    runner.players[WHITE] = white_player
+    if record_positions:
+        runner.positions = []
+    elapsed_time = runner.run_game(level)
+
+    return black_type, white_type, level, runner.board.get_final_score(), elapsed_time, runner.moves, runner.positions
 
 
 class OthelloRunner:
 
-    def __init__(self):
+    def __init__(self, engine: BoardEngine = BoardEngine.list):
+        self.engine = engine
         self.board = None
         self.players = dict()
         self.scores = dict()
@@ -56,6 +183,15 @@ class OthelloRunner:
         self.ties = 0
         self.time_out = 0
 
+        # When it's a list, the positions of the games are added to it (see utils.save_positions)
+        self.positions = None  # type: list
+
+        # Moves of the last game (None for a pass)
+        self.moves = []
+
+        # Set by stop: the game being played is abandoned, and no other game is started
+        self.stopped = False
+
     def play_series(self, black_player: Player, white_player: Player, min_level: int, max_level: int, time_out: int):
         self.wins[BLACK] = 0
         self.wins[WHITE] = 0
@@ -76,8 +212,7 @@ class OthelloRunner:
             header = '{}\n{}'.format(header1, header2)
             header_length = len(header1) - 2
 
-        move_timeout_message = 'Move Time-out Value is {} Second{}'.format(
-            args.time_out, 's' if args.time_out > 1 else '')
+        move_timeout_message = time_out_message(time_out)
         header_line = '+{}+'.format('-' * header_length)
         separator = '=' * separator_length
         logger.info('\n{}\n'.format(separator))
@@ -89,7 +224,9 @@ class OthelloRunner:
         logger.info('\n')
 
         for level in range(min_level, max_level + 1):
-            self.board = Board()
+            if self.stopped:
+                break
+            self.board = create_board(self.engine)
             self.players[BLACK] = black_player
             self.players[WHITE] = white_player
             self.scores[BLACK] = 0
@@ -99,27 +236,122 @@ class OthelloRunner:
         self.print_final_results()
         logger.info('\n{}\n'.format(separator))
 
-    def _play_game(self, level: int):
-        final_message = "Running game with level: '{}': ".format(level)
+    def play_tournament(self, tournament_types: list, min_level: int, max_level: int, time_out: int,
+                        settings: dict, workers: int = 0):
+        """
+        Play all the pairings (in both colors) of the given player types at every level,
+        with games running concurrently in worker processes
+        :param tournament_types: types of the players taking part
+        :param min_level: minimum level
+        :param max_level: maximum level
+        :param time_out: time-out for each move
+        :param settings: command-line arguments (as a dictionary) used to configure the players
+        :param workers: number of worker processes (0 uses one per CPU core)
+        """
+        separator = '=' * 89
+        logger.info('\n{}\n'.format(separator))
+        logger.info('Tournament between {} with levels from \'{}\' to \'{}\''.format(
+            ', '.join(player_type.value for player_type in tournament_types), min_level, max_level))
+        logger.info('{}\n'.format(time_out_message(time_out)))
+
+        pairings = [(black_type, white_type, level)
+                    for level in range(min_level, max_level + 1)
+                    for black_type in tournament_types
+                    for white_type in tournament_types
+                    if black_type != white_type]
+
+        # Results of each player type: [wins, losses, ties]
+        results = {player_type: [0, 0, 0] for player_type in tournament_types}
+
+        start_time = time.time()
+        with ProcessPoolExecutor(max_workers=workers if workers > 0 else None) as executor:
+            futures = [executor.submit(play_tournament_game, black_type, white_type, level, time_out,
+                                       self.engine, settings, self.positions is not None)
+                       for black_type, white_type, level in pairings]
+
+            # Report the games as they finish
+            for finished, future in enumerate(as_completed(futures), 1):
+                black_type, white_type, level, (black_score, white_score), elapsed_time, moves, positions = \
+                    future.result()
+                if positions is not None:
+                    self.positions.extend(positions)
+                if black_score > white_score:
+                    results[black_type][0] += 1
+                    results[white_type][1] += 1
+                elif black_score < white_score:
+                    results[black_type][1] += 1
+                    results[white_type][0] += 1
+                else:
+                    results[black_type][2] += 1
+                    results[white_type][2] += 1
+
+                logger.info("[{:3}/{:3}] level '{}': {:>9} (BLACK) {:2} - {:2} {:<9} (WHITE) (time: {:7.3f}s)".format(
+                    finished, len(futures), level, black_type.value, black_score, white_score, white_type.value,
+                    elapsed_time))
+                logger.debug('\tMoves: {}'.format(format_moves(moves)))
+
+        logger.info('\nTournament Results (total time: {:.3f}s):'.format(time.time() - start_time))
+        logger.info('\t{:10} {:>5} {:>7} {:>5}'.format('Player', 'Wins', 'Losses', 'Ties'))
+        for player_type in sorted(tournament_types, key=lambda t: results[t][0], reverse=True):
+            logger.info('\t{:10} {:5} {:7} {:5}'.format(player_type.value, *results[player_type]))
+        logger.info('\n{}\n'.format(separator))
+
+    def run_game(self, level: int):
+        """
+        Play a game from the current board until it's over
+        :param level: level (search depth) of the players
+        :return: duration of the game (in seconds)
+        """
+        for player in self.players.values():
+            player.new_game()
 
         logger.debug('+++++++++++ Board Progression +++++++++++\n')
         move = 0
+        game_positions = []
+        self.moves = []
         start_time = time.time()
-        while not self.board.is_game_over():
+        while not self.board.is_game_over() and not self.stopped:
             # logger.info(self.board)
             # logger.info(Board.get_color_string(self.board.get_turn()))
             # input()
             current_player = self.players[self.board.get_turn()]  # type: Player
+            if self.positions is not None:
+                game_positions.append((self.board.get_cells(), self.board.get_turn()))
 
             next_move, _ = current_player.get_best_move(self.board, level, self.time_out)
+            if current_player.agent is not None and current_player.agent.solver is not None:
+                logger.debug(current_player.agent.solver)
+            if current_player.agent is not None and current_player.agent.stats is not None:
+                logger.debug('{} ({}): {}'.format(Board.get_color_string(self.board.get_turn()),
+                                                  current_player.get_type_name(), current_player.agent.stats))
+            if current_player.principal_variation:
+                logger.debug('{} ({}): principal variation: {}'.format(
+                    Board.get_color_string(self.board.get_turn()), current_player.get_type_name(),
+                    format_moves(current_player.principal_variation)))
 
             self.board = self.board.execute_move(next_move)
+            self.moves.append(next_move)
             move += 1
             logger.debug('------- Move {:3} ------\n'.format(move))
             logger.debug(self.board)
         end_time = time.time()
         logger.debug('-----------------------------------------')
 
+        # The positions of an unfinished game have no result
+        if self.positions is not None and not self.stopped:
+            black_score, white_score = self.board.get_final_score()
+            self.positions.extend((cells, turn, white_score - black_score) for cells, turn in game_positions)
+
+        return end_time - start_time
+
+    def _play_game(self, level: int):
+        final_message = "Running game with level: '{}': ".format(level)
+
+        elapsed_time = self.run_game(level)
+        if self.stopped:
+            logger.info(final_message + ' stopped')
+            return
+
         self.scores[BLACK], self.scores[WHITE] = self.board.get_final_score()
         if self.scores[BLACK] == self.scores[WHITE]:
             self.ties += 1
@@ -138,9 +370,23 @@ class OthelloRunner:
                 Board.get_color_string(self.winner), Board.get_color_string(-self.winner),
                 self.scores[self.winner], self.scores[-self.winner]))
 
-        elapsed_time = end_time - start_time
-        final_message += ' (time: {:7.3}s)'.format(elapsed_time)
+        final_message += ' (time: {:7.3f}s)'.format(elapsed_time)
         logger.info(final_message)
+        # In the log file only (read by opening_book.py)
+        logger.debug('\tMoves: {}'.format(format_moves(self.moves)))
+
+        for color in (BLACK, WHITE):
+            if self.players[color].table is not None:
+                logger.info('\t{}: {}'.format(Board.get_color_string(color), self.players[color].table))
+            if self.players[color].search_options.get('ordering') is not None:
+                logger.info('\t{}: {}'.format(Board.get_color_string(color),
+                                              self.players[color].search_options['ordering']))
+
+    def stop(self):
+        """ Stop playing (e.g. on shutdown, or from another thread): the searches of the players are cancelled """
+        self.stopped = True
+        for player in self.players.values():
+            player.stop_move()
 
     def print_final_results(self):
         logger.info('\nFinal Results:')
@@ -151,6 +397,35 @@ class OthelloRunner:
 
 
 if __name__ == '__main__':
+    args = parser.parse_args()
+
+    if SearchDriver(args.driver) == SearchDriver.mtdf and SearchAlgorithm.alpha_beta.value in (args.black_search,
+                                                                                            args.white_search):
+        logger.info('The MTD(f) driver needs the PVS search algorithm (for both players)')
+        exit(1)
+
+    # The node budget replaces the time-out
+    move_time_out = float("inf") if args.node_limit > 0 else args.time_out
+
+    if args.tournament_players is not None:
+        tournament_player_types = list(dict.fromkeys(PlayerType(value) for value in args.tournament_players))
+        if len(tournament_player_types) < 2:
+            logger.info('A tournament needs at least two different player types')
+            exit(1)
+
+        runner = OthelloRunner(BoardEngine(args.engine))
+        if args.record_positions:
+            runner.positions = []
+        runner.play_tournament(tournament_types=tournament_player_types,
+                               min_level=args.min_level,
+                               max_level=args.max_level,
+                               time_out=move_time_out,
+                               settings=vars(args),
+                               workers=args.tournament_workers)
+        if args.record_positions:
+            save_positions(args.record_positions, runner.positions)
+        exit(0)
+
     if args.black_player is None or args.white_player is None:
         logger.info('You must specify both player types')
         exit(1)
@@ -161,10 +436,25 @@ if __name__ == '__main__':
     black = create_player(black_player_type, 'BLACK')
     white = create_player(white_player_type, 'WHITE')
 
-    runner = OthelloRunner()
-
-    runner.play_series(black_player=black,
-                       white_player=white,
-                       min_level=args.min_level,
-                       max_level=args.max_level,
-                       time_out=args.time_out)
+    for color, player in ((BLACK, black), (WHITE, white)):
+        configure_player(player, vars(args), color)
+
+    runner = OthelloRunner(BoardEngine(args.engine))
+    if args.record_positions:
+        runner.positions = []
+
+    try:
+        runner.play_series(black_player=black,
+                           white_player=white,
+                           min_level=args.min_level,
+                           max_level=args.max_level,
+                           time_out=move_time_out)
+    except KeyboardInterrupt:
+        logger.info('\nInterrupted')
+    finally:
+        runner.stop()
+        parallel_search.shutdown()
+
+    if args.record_positions:
+        save_positions(args.record_positions, runner.positions)
+        logger.info('{} positions recorded in {}'.format(len(runner.positions), args.record_positions))
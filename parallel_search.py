@@ -0,0 +1,148 @@
+"""
+Parallel root search: the moves of the root are split between worker processes.
+
+The first root move is searched in the current process to get a good lower bound (alpha),
+then the other moves are searched concurrently with the window (alpha, beta).
+A move whose value doesn't exceed alpha can't be better than the first one, and the
+values above alpha are exact, so at a fixed depth the best move and its value are
+the same as the ones returned by the serial AlphaBeta search.
+
+Every search of the root is split this way (see AlphaBeta.search_root), so it works with iterative
+deepening and the drivers as well: each iteration (or window) is split between the workers.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import resource_tracker
+
+from mini_max import AgentType, AlphaBeta, MoveOrderer
+from transposition import TranspositionTable
+
+# Pool of worker processes (created on first use, shared by all the searches)
+_executor = None  # type: ProcessPoolExecutor
+_executor_workers = 0
+
+
+def get_executor(workers: int) -> ProcessPoolExecutor:
+    """
+    Get the pool of worker processes, (re)creating it if the number of workers changed
+    :param workers: number of worker processes
+    :return: the process pool
+    """
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers != workers:
+        shutdown()
+        # The workers share the resource tracker of this process (they would start their own one otherwise),
+        # so the shared memory they attach to is only freed by the process creating it (see lazy_smp)
+        resource_tracker.ensure_running()
+        _executor = ProcessPoolExecutor(max_workers=workers)
+        _executor_workers = workers
+    return _executor
+
+
+def shutdown():
+    """ Stop the worker processes (if any) """
+    global _executor, _executor_workers
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+        _executor_workers = 0
+
+
+def _search_successor(board, max_depth: int, agent_type: AgentType, use_ordering: bool, collect_stats: bool,
+                      alpha, beta, deadline, node_limit: int, table_bits: int, probcut_threshold):
+    """
+    Search a root successor in a worker process
+    :param deadline: time (time.time()) the search has to be done by (the moves can wait for a free worker)
+    :param table_bits: size of the transposition table of the search, as a power of 2 (0 for no table)
+    :return: value of the successor, whether the search timed out, and its statistics
+    """
+    agent = AlphaBeta(max_depth, agent_type, table=TranspositionTable(table_bits) if table_bits > 0 else None,
+                      ordering=MoveOrderer() if use_ordering else None, collect_stats=collect_stats,
+                      node_limit=node_limit, probcut_threshold=probcut_threshold)
+    value = agent.search_successor(board, alpha, beta, deadline - time.time())
+    return value, agent.timed_out, agent.stats
+
+
+class ParallelAlphaBeta(AlphaBeta):
+
+    # How often (in seconds) the cancellation token is checked while waiting for the worker processes
+    cancel_check_interval = 0.05
+
+    def __init__(self, max_depth: int, agent_type: AgentType, workers: int = 0, **options):
+        """
+        :param max_depth: depth of the search
+        :param agent_type: type of the agent (selects the heuristic used at the leaves)
+        :param workers: number of worker processes (0 uses all the CPU cores)
+        :param options: other AlphaBeta options (used by the search of the first move). The workers search
+                        with the same move ordering, ProbCut threshold and size of transposition table (a table
+                        of their own: their processes don't share it)
+        """
+        super().__init__(max_depth, agent_type, **options)
+        self.workers = workers if workers > 0 else os.cpu_count() or 1
+        # Size of the workers' tables, as a power of 2 (0 for no table)
+        self._worker_table_bits = self.table.size.bit_length() - 1 if self.table is not None else 0
+
+    def _search_window(self, board, alpha, beta):
+        """ Search the root with the given window, to the current depth limit, splitting the moves """
+        key = table_move = None
+        if self.table is not None:
+            key = board.get_hash()
+            table_move = self._probe_table(key, 0, alpha, beta)[1]
+        moves = self._ordered_moves(board, 0, table_move)
+        if len(moves) < 2 or self.workers < 2:
+            return super()._search_window(board, alpha, beta)
+
+        if self.stats is not None:
+            self.stats.root_searches += 1
+            self.stats.nodes += 1
+        original_alpha = alpha
+        best_move = None
+
+        # Search the first move here to get a bound for the other ones
+        first_state = board.clone()
+        first_state.make_move(moves[0])
+        _, value = self.mini_max(first_state, 1, alpha, beta)
+        if self.timed_out:
+            return best_move, alpha
+        if value > alpha:
+            best_move, alpha = moves[0], value
+        if alpha >= beta:
+            return best_move, alpha
+
+        # Search the other moves in the worker processes
+        executor = get_executor(self.workers)
+        # The rest of the node budget is shared equally by the other moves (so the result doesn't depend on
+        # the order the workers finish in)
+        node_limit = max((self.node_limit - self.nodes) // (len(moves) - 1), 1) if self.node_limit > 0 else 0
+        futures = [executor.submit(_search_successor, board.execute_move(move), self._depth_limit, self.agent_type,
+                                   self.ordering is not None, self.stats is not None, alpha, beta,
+                                   self.start_time + self.time_out, node_limit, self._worker_table_bits,
+                                   self.probcut_threshold)
+                   for move in moves[1:]]
+
+        # Wait for the workers until they're done or the search is cancelled. The workers can't see the token:
+        # the moves not started yet are dropped, the ones being searched finish (or time out) on their own
+        pending = set(futures)
+        while pending and not self.cancel_token.cancelled:
+            pending = wait(pending, timeout=self.cancel_check_interval).not_done
+        for future in pending:
+            future.cancel()
+
+        # Keep the first move with the highest value, like the serial search does
+        # (the values of the moves whose search timed out, or was cancelled, are unknown, so they're skipped)
+        for move, future in zip(moves[1:], futures):
+            if future in pending:
+                self.timed_out = True
+                continue
+            value, timed_out, stats = future.result()
+            if stats is not None:
+                self.stats.merge(stats)
+            if timed_out:
+                self.timed_out = True
+            elif value > alpha:
+                best_move, alpha = move, value
+
+        if key is not None:
+            self._store_table(key, 0, alpha, original_alpha, beta, best_move)
+        return best_move, alpha
@@ -0,0 +1,300 @@
+"""
+Pattern-based evaluation: the score of a position is the sum of lookup tables indexed by the
+contents of a few groups of squares (patterns), so evaluating a leaf costs a handful of index
+computations and table reads instead of scanning the board.
+
+Each pattern (e.g. an edge with its two X squares) is placed on the board several times
+(its rotations), and all the placements share one table. A placement is read as a base-3
+number, one digit per square (first square = most significant digit):
+    0 = empty, 1 = white, 2 = black (that is, color % 3)
+Table values are scores for white, in hundredths of a square weight (see SQUARE_WEIGHTS);
+the score for black is the same value negated, so a single table serves both colors.
+
+The tables are loaded from a compact binary file (PATTERN_FILE). When the file doesn't exist,
+default tables are built in memory; they can be written to the file by running this module:
+    python pattern_eval.py
+"""
+import os
+import struct
+import zlib
+from array import array
+
+from mini_max import SQUARE_WEIGHTS
+
+PATTERN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pattern_tables.bin')
+
+# File format: header (magic, version, number of tables), then the name and size of each table,
+# then the values of all the tables as little-endian signed 16-bit integers, compressed with zlib
+FILE_MAGIC = b'OPAT'
+FILE_VERSION = 1
+HEADER_FORMAT = '<4sHH'
+TABLE_FORMAT = '<16sI'
+
+# Value of a stable disc on an edge (a disc that can't be flipped any more), used by the default tables
+STABLE_EDGE_DISC = 400
+
+
+def _rotate(square):
+    """ Rotate the cell (x,y) by 90 degrees """
+    x, y = square
+    return 7 - y, x
+
+
+def _placements(cells):
+    """
+    Get the distinct placements of a pattern on the board (its 4 rotations, skipping the duplicates)
+    :param cells: cells of the pattern, as (x,y)
+    :return: list of placements, each one being a tuple of squares (x * 8 + y) in the pattern's order
+    """
+    placements = []
+    seen = set()
+    for _ in range(4):
+        squares = tuple(x * 8 + y for x, y in cells)
+        if frozenset(squares) not in seen:
+            seen.add(frozenset(squares))
+            placements.append(squares)
+        cells = [_rotate(cell) for cell in cells]
+    return placements
+
+
+# Patterns, as (name, cells of the first placement)
+PATTERNS = [
+    ('edge_2x', [(x, 0) for x in range(8)] + [(1, 1), (6, 1)]),
+    ('corner_3x3', [(x, y) for x in range(3) for y in range(3)]),
+    ('line_2', [(x, 1) for x in range(8)]),
+    ('diagonal_8', [(i, i) for i in range(8)]),
+    ('diagonal_7', [(i, i + 1) for i in range(7)]),
+    ('diagonal_6', [(i, i + 2) for i in range(6)]),
+    ('diagonal_5', [(i, i + 3) for i in range(5)]),
+    ('diagonal_4', [(i, i + 4) for i in range(4)]),
+]
+
+# Placements of each pattern (same order as PATTERNS)
+PLACEMENTS = [_placements(cells) for _, cells in PATTERNS]
+
+
+def _coverage():
+    """ Count, for each square, the placements it belongs to """
+    coverage = [0] * 64
+    for placements in PLACEMENTS:
+        for squares in placements:
+            for square in squares:
+                coverage[square] += 1
+    return coverage
+
+
+def _stable_edge_discs(codes):
+    """
+    Score the discs of an edge that can't be flipped: the ones in a run of the same color starting at a corner
+    :param codes: digits of the 8 edge squares
+    :return: number of stable white discs minus number of stable black discs
+    """
+    score = 0
+    for line in (codes, codes[::-1]):
+        if line[0] == 0:
+            continue
+        run = 0
+        while run < 8 and line[run] == line[0]:
+            run += 1
+        # A full edge is seen from both corners, count it once
+        if run == 8 and line is not codes:
+            continue
+        score += run if line[0] == 1 else -run
+    return score
+
+
+def create_default_tables():
+    """
+    Build the default tables: the square weights of the composite heuristic (split between the placements
+    covering each square, so the sum over the board is the weighted disc count), plus a bonus for the
+    stable discs of the edges
+    :return: list of tables (array of ints, same order as PATTERNS)
+    """
+    coverage = _coverage()
+    tables = []
+    for (name, cells), placements in zip(PATTERNS, PLACEMENTS):
+        squares = placements[0]
+        weights = [100.0 * SQUARE_WEIGHTS[x][y] / coverage[square] for (x, y), square in zip(cells, squares)]
+        size = len(cells)
+        table = array('h', [0] * (3 ** size))
+        for index in range(len(table)):
+            # Digits of the index, first square first
+            codes = []
+            remainder = index
+            for _ in range(size):
+                codes.append(remainder % 3)
+                remainder //= 3
+            codes.reverse()
+
+            value = 0.0
+            for code, weight in zip(codes, weights):
+                if code == 1:
+                    value += weight
+                elif code == 2:
+                    value -= weight
+            if name == 'edge_2x':
+                value += STABLE_EDGE_DISC * _stable_edge_discs(codes[:8])
+            table[index] = int(round(value))
+        tables.append(table)
+    return tables
+
+
+def save_tables(tables, path=PATTERN_FILE):
+    """
+    Write the tables to a binary file
+    :param tables: list of tables (same order as PATTERNS)
+    :param path: file to write
+    """
+    data = array('h')
+    for table in tables:
+        data.extend(table)
+    if struct.pack('=H', 1) != struct.pack('<H', 1):
+        data.byteswap()
+
+    with open(path, 'wb') as pattern_file:
+        pattern_file.write(struct.pack(HEADER_FORMAT, FILE_MAGIC, FILE_VERSION, len(tables)))
+        for (name, _), table in zip(PATTERNS, tables):
+            pattern_file.write(struct.pack(TABLE_FORMAT, name.encode('ascii'), len(table)))
+        pattern_file.write(zlib.compress(data.tobytes(), 9))
+
+
+def load_tables(path=PATTERN_FILE):
+    """
+    Read the tables from a binary file
+    :param path: file to read
+    :return: list of tables (same order as PATTERNS)
+    """
+    with open(path, 'rb') as pattern_file:
+        content = pattern_file.read()
+
+    magic, version, count = struct.unpack_from(HEADER_FORMAT, content)
+    if magic != FILE_MAGIC or version != FILE_VERSION:
+        raise ValueError('{} is not a pattern file (version {})'.format(path, FILE_VERSION))
+    if count != len(PATTERNS):
+        raise ValueError('{} has {} tables instead of {}'.format(path, count, len(PATTERNS)))
+
+    offset = struct.calcsize(HEADER_FORMAT)
+    sizes = []
+    for name, cells in PATTERNS:
+        table_name, size = struct.unpack_from(TABLE_FORMAT, content, offset)
+        offset += struct.calcsize(TABLE_FORMAT)
+        if table_name.rstrip(b'\0').decode('ascii') != name or size != 3 ** len(cells):
+            raise ValueError('{}: unexpected table {} ({} entries)'.format(path, table_name, size))
+        sizes.append(size)
+
+    data = array('h')
+    data.frombytes(zlib.decompress(content[offset:]))
+    if struct.pack('=H', 1) != struct.pack('<H', 1):
+        data.byteswap()
+    if len(data) != sum(sizes):
+        raise ValueError('{}: expected {} values, found {}'.format(path, sum(sizes), len(data)))
+
+    tables = []
+    start = 0
+    for size in sizes:
+        tables.append(data[start:start + size])
+        start += size
+    return tables
+
+
+def _index_steps(multiplier):
+    """
+    Get, for each square, how a disc on it changes the index of the placements covering it
+    :param multiplier: digit of the disc (1 for white, 2 for black)
+    :return: list indexed by square of tuples of (placement number, index increment)
+    """
+    steps = [[] for _ in range(64)]
+    slot = 0
+    for placements in PLACEMENTS:
+        for squares in placements:
+            for position, square in enumerate(squares):
+                steps[square].append((slot, multiplier * 3 ** (len(squares) - 1 - position)))
+            slot += 1
+    return [tuple(square_steps) for square_steps in steps]
+
+
+# Number of placements of all the patterns
+PLACEMENT_COUNT = sum(len(placements) for placements in PLACEMENTS)
+
+# Index increments of the white and black discs on each square
+WHITE_STEPS = _index_steps(1)
+BLACK_STEPS = _index_steps(2)
+
+# Table used by each placement (loaded on first use)
+_placement_tables = None
+
+
+def get_tables():
+    """ Get the tables in use, loading them from PATTERN_FILE (or building the defaults) on first use """
+    if _placement_tables is None:
+        set_tables(load_tables() if os.path.exists(PATTERN_FILE) else create_default_tables())
+
+    tables = []
+    slot = 0
+    for placements in PLACEMENTS:
+        tables.append(_placement_tables[slot])
+        slot += len(placements)
+    return tables
+
+
+def set_tables(tables):
+    """
+    Replace the tables in use
+    :param tables: list of tables (same order as PATTERNS)
+    """
+    global _placement_tables
+    # Plain lists are faster to index than arrays
+    _placement_tables = []
+    for table, placements in zip(tables, PLACEMENTS):
+        table = list(table)
+        _placement_tables.extend(table for _ in placements)
+
+
+def _score(indices, turn):
+    """ Sum the table values of the placement indices, for the player to move """
+    score = sum(map(list.__getitem__, _placement_tables, indices))
+    return score if turn == 1 else -score
+
+
+def evaluate(cells, turn):
+    """
+    Evaluate a position with the pattern tables
+    :param cells: the 64 cells, indexed by x * 8 + y (see Board.get_cells)
+    :param turn: color of the player to move (the score is for this player)
+    :return: score of the position
+    """
+    if _placement_tables is None:
+        get_tables()
+
+    indices = [0] * PLACEMENT_COUNT
+    for square, cell in enumerate(cells):
+        if cell:
+            for slot, step in (WHITE_STEPS[square] if cell == 1 else BLACK_STEPS[square]):
+                indices[slot] += step
+    return _score(indices, turn)
+
+
+def evaluate_bits(white, black, turn):
+    """
+    Evaluate a position with the pattern tables
+    :param white: bitboard of the white discs (bit x * 8 + y is the cell (x,y), see BitBoard)
+    :param black: bitboard of the black discs
+    :param turn: color of the player to move (the score is for this player)
+    :return: score of the position
+    """
+    if _placement_tables is None:
+        get_tables()
+
+    indices = [0] * PLACEMENT_COUNT
+    for bits, steps in ((white, WHITE_STEPS), (black, BLACK_STEPS)):
+        while bits:
+            lowest = bits & -bits
+            for slot, step in steps[lowest.bit_length() - 1]:
+                indices[slot] += step
+            bits ^= lowest
+    return _score(indices, turn)
+
+
+if __name__ == '__main__':
+    save_tables(create_default_tables())
+    print('Pattern tables written to {}'.format(PATTERN_FILE))
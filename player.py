@@ -1,6 +1,22 @@
+import threading
 from enum import Enum
 from board import Board, BLACK, WHITE
-from mini_max import AgentType, AlphaBeta
+from mini_max import AgentType, AlphaBeta, CancellationToken
+from lazy_smp import LazySMPAlphaBeta, LazySMPPVSearch
+from parallel_search import ParallelAlphaBeta
+from pv_search import PVSearch
+from utils import BoardEngine, convert_board
+from transposition import SharedTranspositionTable, TranspositionTable
+import opening_book
+
+
+# Agent types whose heuristic can be evaluated in batches (see batch_eval.BATCH_HEURISTICS)
+BATCH_AGENT_TYPES = (AgentType.simple, AgentType.corner, AgentType.mobile, AgentType.composite, AgentType.tuned)
+
+
+class SearchAlgorithm(Enum):
+    alpha_beta = 'AlphaBeta'
+    pvs = 'PVS'
 
 
 class PlayerType(Enum):
@@ -11,6 +27,8 @@ class PlayerType(Enum):
     mobile = 'Mobile'
     corner = 'Corner'
     half = 'Half'
+    pattern = 'Pattern'
+    tuned = 'Tuned'
 
 
 class Player:
@@ -18,13 +36,185 @@ class Player:
     def __init__(self, name):
         self.name = name
         self.agent = None  # type: AlphaBeta
+        self.engine = None  # type: BoardEngine
+        # Extra keyword arguments for the search (e.g. iterative=True)
+        self.search_options = dict()
+
+        # Search algorithm: AlphaBeta (possibly in parallel or with batches, see workers and batch_leaves)
+        # or the principal variation search (see pv_search)
+        self.search_algorithm = SearchAlgorithm.alpha_beta
+
+        # Transposition table: size (as a power of 2, 0 disables it) and whether it's kept between moves
+        self.table_bits = 0
+        self.persistent_table = False
+        self.table = None  # type: TranspositionTable
+
+        # Number of processes searching the root moves in parallel (1 searches serially, 0 uses all the cores)
+        self.workers = 1
+
+        # With several workers, run Lazy SMP searches (see lazy_smp) instead of splitting the root moves:
+        # the workers search the whole position and share a transposition table in shared memory (of
+        # table_bits, or ponder_table_bits if it's 0)
+        self.lazy_smp = False
+
+        # Evaluate the leaves in batches with NumPy (see batch_eval.BatchAlphaBeta), when searching serially
+        # with one of the heuristics it supports
+        self.batch_leaves = False
+
+        # Cancels the searches of this player, once it's stopped (see stop_move)
+        self.cancel_token = CancellationToken()
+
+        # Play the moves of the opening book (see opening_book, built with opening_book.py) when the position is
+        # in it. Off by default: the players search every move, like before the book existed
+        self.use_book = False
+
+        # Search the position after the opponent's expected reply while the opponent is thinking (see ponder).
+        # It keeps the transposition table between moves (of table_bits, or ponder_table_bits if it's 0)
+        self.pondering = False
+        self.ponder_table_bits = 20
+
+        # Principal variation of the last search (this player's move, the expected reply, ...)
+        self.principal_variation = []
+
+        self._ponder_thread = None  # type: threading.Thread
+        self._ponder_agent = None  # type: AlphaBeta
+        # Position searched by the last ponder (its hash), the depth it completed and its best move and value
+        self._ponder_result = None  # type: tuple
+
+    def new_game(self):
+        """ Forget everything kept from the previous game """
+        self.stop_pondering()
+        self.table = None
+        self.principal_variation = []
+        if self.search_options.get('ordering') is not None:
+            self.search_options['ordering'].clear()
 
     def get_best_move(self, board: Board, max_level, time_out):
-        self.agent = AlphaBeta(max_level, self.player_type)
-        return self.agent.get_best_action_and_value(board, time_out)
+        ponder_result = self.stop_pondering()
+
+        if self.use_book:
+            book_move = opening_book.lookup(board)
+            if book_move is not None:
+                self.agent = None
+                # Nothing is known about the reply (so there isn't anything to ponder)
+                self.principal_variation = [book_move]
+                return book_move, 0
+
+        # Search using the configured board engine (if any)
+        if self.engine is not None:
+            board = convert_board(board, self.engine)
+
+        # The opponent played the expected reply, and the ponder searched it to the full depth
+        if ponder_result is not None:
+            key, depth, move, value = ponder_result
+            if key == board.get_hash() and depth >= max_level and move is not None:
+                self.principal_variation = self.agent.get_principal_variation(board, max_level) or [move]
+                return move, value
+
+        if self.table_bits > 0 or self.pondering or self.uses_lazy_smp():
+            if self.table is None or not (self.persistent_table or self.pondering):
+                self.table = self.create_table()
+            self.table.new_search()
+
+        if self.uses_lazy_smp():
+            search_class = LazySMPPVSearch if self.search_algorithm == SearchAlgorithm.pvs else LazySMPAlphaBeta
+            self.agent = search_class(max_level, self.player_type, workers=self.workers, table=self.table,
+                                      cancel_token=self.cancel_token, **self.search_options)
+        elif self.search_algorithm == SearchAlgorithm.pvs:
+            self.agent = PVSearch(max_level, self.player_type, table=self.table, cancel_token=self.cancel_token,
+                                  **self.search_options)
+        elif self.workers != 1:
+            self.agent = ParallelAlphaBeta(max_level, self.player_type, workers=self.workers, table=self.table,
+                                           cancel_token=self.cancel_token, **self.search_options)
+        elif self.batch_leaves and self.player_type in BATCH_AGENT_TYPES:
+            # NumPy is only needed (and imported) when the batch search is used
+            import batch_eval
+            self.agent = batch_eval.BatchAlphaBeta(max_level, self.player_type, table=self.table,
+                                                   cancel_token=self.cancel_token, **self.search_options)
+        else:
+            self.agent = AlphaBeta(max_level, self.player_type, table=self.table, cancel_token=self.cancel_token,
+                                   **self.search_options)
+        move, value = self.agent.get_best_action_and_value(board, time_out)
+
+        self.principal_variation = self.agent.get_principal_variation(board, max_level)
+        if self.principal_variation[:1] != [move]:
+            self.principal_variation = [move] if move is not None else []
+        return move, value
+
+    def ponder(self, board: Board, max_level):
+        """
+        Start searching, in a background thread, the position after the opponent's expected reply (the second
+        move of the principal variation), so the next get_best_move can answer at once if the opponent plays it.
+        The next get_best_move (or stop_pondering) stops the search.
+        :param board: board after this player's move (the opponent is to move)
+        :param max_level: level of the search
+        """
+        self.stop_pondering()
+        if self.cancel_token.cancelled or len(self.principal_variation) < 2:
+            return
+        if self.principal_variation[1] not in board.get_legal_moves():
+            return
+
+        if self.engine is not None:
+            board = convert_board(board, self.engine)
+        board = board.execute_move(self.principal_variation[1])
+
+        if self.table is None:
+            self.table = self.create_table()
+        self.table.new_search()
+
+        # Search deeper and deeper until the full depth is reached or the search is stopped
+        # (with the same algorithm as the moves: the values in the table depend on it)
+        options = dict(self.search_options, iterative=True, node_limit=0)
+        search_class = PVSearch if self.search_algorithm == SearchAlgorithm.pvs else AlphaBeta
+        self._ponder_agent = search_class(max_level, self.player_type, table=self.table, **options)
+        self._ponder_thread = threading.Thread(target=self._ponder, args=(board,), daemon=True)
+        self._ponder_thread.start()
+
+    def _ponder(self, board):
+        agent = self._ponder_agent
+        move, value = agent.get_best_action_and_value(board, float("inf"))
+        self._ponder_result = (board.get_hash(), agent.completed_depth, move, value)
+
+    def uses_lazy_smp(self):
+        """ Whether the moves are searched with Lazy SMP """
+        return self.lazy_smp and self.workers != 1
+
+    def create_table(self):
+        """
+        Create the transposition table of the searches (of table_bits, or ponder_table_bits if it's 0).
+        It's in shared memory when the moves are searched with Lazy SMP.
+        """
+        size_bits = self.table_bits or self.ponder_table_bits
+        if self.uses_lazy_smp():
+            return SharedTranspositionTable(size_bits)
+        return TranspositionTable(size_bits)
+
+    def stop_pondering(self):
+        """
+        Stop the ponder search (if any)
+        :return: the position searched by the ponder (its hash), the depth it completed and its best move and value
+                 (None if there wasn't any ponder search)
+        """
+        if self._ponder_thread is None:
+            return None
+
+        # The ponder search has its own token, so cancelling it doesn't stop the player
+        self._ponder_agent.cancel()
+        self._ponder_thread.join()
+
+        result = self._ponder_result
+        self.agent = self._ponder_agent
+        self._ponder_thread = self._ponder_agent = self._ponder_result = None
+        return result
 
     def stop_move(self):
-        self.agent.stop = True
+        """
+        Stop the player: its running search (or ponder) returns its best completed result at once,
+        and its next searches return right away (e.g. when the game is reset or the program exits)
+        """
+        self.cancel_token.cancel()
+        self.stop_pondering()
 
     def __str__(self):
         return self.name
@@ -101,6 +291,24 @@ class HalfPlayer(Player):
     def get_type_name(self):
         return 'Half'
 
+class PatternPlayer(Player):
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.player_type = AgentType.pattern
+
+    def get_type_name(self):
+        return 'Pattern'
+
+class TunedPlayer(Player):
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.player_type = AgentType.tuned
+
+    def get_type_name(self):
+        return 'Tuned'
+
 def create_player(player_type: PlayerType, player_name: str):
     """
     Create a player based on the type
@@ -122,3 +330,7 @@ def create_player(player_type: PlayerType, player_name: str):
         return CornerPlayer(player_name)
     if player_type == PlayerType.half:
         return HalfPlayer(player_name)
+    if player_type == PlayerType.pattern:
+        return PatternPlayer(player_name)
+    if player_type == PlayerType.tuned:
+        return TunedPlayer(player_name)
@@ -0,0 +1,93 @@
+"""
+Parameters of Multi-ProbCut (see AlphaBeta's probcut_threshold): the value of a deep search of a node is
+predicted from the value of a shallow search, as deep = slope * shallow + intercept, with an error of standard
+deviation sigma. A node is cut when the shallow search says the deep one is very likely outside of the window.
+Each depth can have several shallow depths (depth pairs): the shallowest one is tried first, and the deeper
+ones (slower, but better predictors) only when it couldn't cut.
+
+The parameters depend on the agent type (the scale of its heuristic), on the type of the node (the root
+player or the opponent to move: the leaves are evaluated for the player to move, so the values of the two
+aren't symmetric), on the depth pair and on the stage of the game. They're fitted offline by
+calibrate_probcut.py and read from PROBCUT_FILE (a JSON file). Until the file exists, nothing is cut.
+"""
+import json
+import os
+
+PROBCUT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'probcut.json')
+
+# Number of empty squares of each stage of the game
+STAGE_SIZE = 15
+STAGES = 4
+
+# Parameters in use, by agent type value (loaded on first use)
+_parameters = None
+
+
+def get_stage(empties: int) -> int:
+    """ Stage of the game (0 for the endgame) from the number of empty squares """
+    return min(empties // STAGE_SIZE, STAGES - 1)
+
+
+def load_parameters(path=PROBCUT_FILE):
+    """
+    Read the parameters from a file. The depth pairs whose slope isn't positive are skipped: the shallow search
+    doesn't predict the deep one (and the bounds of the shallow searches are divided by the slope).
+    :param path: file to read
+    :return: dictionary {agent type value: {(max node, depth, stage): list of (shallow depth, slope, intercept,
+             sigma), by shallow depth}}
+    """
+    with open(path) as parameters_file:
+        content = json.load(parameters_file)
+    parameters = dict()
+    for agent, cuts in content['agents'].items():
+        agent_cuts = parameters[agent] = dict()
+        for cut in cuts:
+            if cut['slope'] <= 0:
+                continue
+            agent_cuts.setdefault((cut['max_node'], cut['depth'], cut['stage']), []).append(
+                (cut['shallow_depth'], cut['slope'], cut['intercept'], cut['sigma']))
+        for pairs in agent_cuts.values():
+            pairs.sort()
+    return parameters
+
+
+def save_parameters(parameters, path=PROBCUT_FILE, details=None):
+    """
+    Write the parameters to a file
+    :param parameters: dictionary {agent type value: {(max node, depth, stage): list of (shallow depth, slope,
+                       intercept, sigma)}}
+    :param path: file to write
+    :param details: extra information stored with the parameters (e.g. how they were fitted)
+    """
+    content = {'agents': {agent: [{'max_node': max_node, 'depth': depth, 'stage': stage, 'shallow_depth': shallow,
+                                   'slope': slope, 'intercept': intercept, 'sigma': sigma}
+                                  for (max_node, depth, stage), pairs in sorted(cuts.items())
+                                  for shallow, slope, intercept, sigma in sorted(pairs)]
+                          for agent, cuts in parameters.items()}}
+    if details is not None:
+        content['details'] = details
+    with open(path, 'w') as parameters_file:
+        json.dump(content, parameters_file, indent=2)
+
+
+def get_cuts(agent_type):
+    """
+    Get the parameters of an agent type, loading them from PROBCUT_FILE on first use
+    :param agent_type: agent type
+    :return: dictionary {(max node, depth, stage): list of (shallow depth, slope, intercept, sigma)} (empty if
+             the agent type wasn't calibrated)
+    """
+    global _parameters
+    if _parameters is None:
+        _parameters = load_parameters() if os.path.exists(PROBCUT_FILE) else dict()
+    return _parameters.get(agent_type.value, dict())
+
+
+def set_parameters(parameters):
+    """
+    Replace the parameters in use
+    :param parameters: dictionary {agent type value: {(max node, depth, stage): list of (shallow depth, slope,
+                       intercept, sigma)}}
+    """
+    global _parameters
+    _parameters = parameters
@@ -0,0 +1,139 @@
+"""
+Principal variation search (PVS): a negamax alpha-beta search where only the first move of a node is
+searched with the full window. The other moves are scouted with a null window, which only tells whether
+they're better than the best move so far, and are searched again with the full window when they are.
+With a good move ordering the first move is usually the best one, so most of the moves only need the
+(much cheaper) scout.
+
+The values are the same as the ones of AlphaBeta: the value of a leaf is its heuristic value (for the
+player to move at the leaf), maximized at the root. In negamax form (value for the player to move at
+the node), the leaves at odd depths are negated.
+"""
+from mini_max import AlphaBeta
+from transposition import EXACT
+
+
+class PVSearch(AlphaBeta):
+
+    # The moves are scouted with null windows of width null_window (see AlphaBeta)
+    fail_soft = True
+
+    def __init__(self, max_depth: int, agent_type, **options):
+        """
+        :param max_depth: maximum depth of the search
+        :param agent_type: type of the agent (selects the heuristic used at the leaves)
+        :param options: other options of AlphaBeta
+        """
+        super().__init__(max_depth, agent_type, **options)
+
+        # Principal variation of the last completed search (or iteration)
+        self.principal_variation = []
+
+    def maxi_min(self, board, depth: int, alpha, beta):
+        """ Search a node where the root player is to move (AlphaBeta's interface) """
+        variation = []
+        value = self.negamax(board, depth, alpha, beta, variation)
+        if depth == 0 and not self.timed_out:
+            self.principal_variation = variation
+        return (variation[0] if variation else None), value
+
+    def mini_max(self, board, depth: int, alpha, beta):
+        """ Search a node where the opponent of the root player is to move (AlphaBeta's interface) """
+        variation = []
+        value = -self.negamax(board, depth, -beta, -alpha, variation)
+        return (variation[0] if variation else None), value
+
+    def negamax(self, board, depth: int, alpha, beta, variation: list):
+        """
+        Search a node (fail-soft: the value can be outside of the window)
+        :param board: board of the node (moves are made and unmade on it)
+        :param depth: depth (ply) of the node
+        :param alpha: value the player to move is already guaranteed
+        :param beta: value above which the opponent avoids the node
+        :param variation: list replaced by the principal variation of the node, when its value is in the window
+        :return: value of the node for the player to move
+        """
+        if self._is_timed_out():
+            return 0
+
+        stats = self.stats
+        if stats is not None:
+            stats.nodes += 1
+
+        key = table_move = None
+        if self.table is not None:
+            key = board.get_hash()
+            result, table_move = self._probe_table(key, depth, alpha, beta)
+            if result is not None:
+                return result[1]
+
+        if depth == self._depth_limit or board.is_game_over():
+            value = self._evaluate(board) if depth % 2 == 0 else -self._evaluate(board)
+            if stats is not None:
+                stats.leaf_evaluations[self.agent_type.value] = stats.leaf_evaluations.get(self.agent_type.value, 0) + 1
+            if key is not None and self._store_evaluations:
+                self.table.store(key, self._depth_limit - depth, value, EXACT, None)
+            return value
+
+        # ProbCut works with the values and windows of AlphaBeta (the root player's)
+        if self._probcuts and depth > 0:
+            cut = self._probcut(board, depth, alpha, beta) if depth % 2 == 0 else \
+                self._probcut(board, depth, -beta, -alpha)
+            if cut is not None:
+                if stats is not None:
+                    stats.probcuts += 1
+                return cut if depth % 2 == 0 else -cut
+
+        original_alpha = alpha
+        best_move = None
+        best_value = float("-inf")
+        for index, next_move in enumerate(self._ordered_moves(board, depth, table_move)):
+            child_variation = []
+            undo = board.make_move(next_move)
+            if index == 0:
+                value = -self.negamax(board, depth + 1, -beta, -alpha, child_variation)
+            else:
+                # Scout: is the move better than alpha? Only then its exact value is needed
+                value = -self.negamax(board, depth + 1, -alpha - self.null_window, -alpha, child_variation)
+                if alpha < value < beta and not self.timed_out:
+                    # The scout's value is a lower bound of the move's value (fail-soft)
+                    value = -self.negamax(board, depth + 1, -beta, -value, child_variation)
+            board.unmake_move(undo)
+
+            if self.timed_out:
+                break
+
+            if value > best_value:
+                best_move, best_value = next_move, value
+                if value > alpha:
+                    alpha = value
+                    variation[:] = [next_move] + child_variation
+
+            if alpha >= beta:
+                if self.ordering is not None:
+                    self.ordering.record_cutoff(next_move, depth, self._depth_limit - depth, index)
+                if stats is not None:
+                    stats.cutoffs[index] = stats.cutoffs.get(index, 0) + 1
+                break
+
+        if key is not None:
+            self._store_table(key, depth, best_value, original_alpha, beta, best_move)
+
+        return best_value
+
+    def get_principal_variation(self, board, max_length: int = 0):
+        """
+        Get the principal variation of the last search. The one found by the search stops at the nodes
+        whose value came from the transposition table: it's continued with the best moves of the table.
+        :param board: board the search started from
+        :param max_length: maximum number of moves (0 uses the depth of the search)
+        :return: list of moves (None for a pass)
+        """
+        length = max_length or self._max_depth
+        variation = self.principal_variation[:length]
+        if len(variation) < length and self.table is not None:
+            board = board.clone()
+            for move in variation:
+                board.make_move(move)
+            variation = variation + super().get_principal_variation(board, length - len(variation))
+        return variation
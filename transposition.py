@@ -0,0 +1,250 @@
+"""
+Fixed-size transposition table used by the search to remember positions it has already searched.
+Positions are identified by their Zobrist hash (see Board.get_hash).
+
+SharedTranspositionTable has the same interface, but its entries are in shared memory, so the searches of
+several processes can use the same table (see lazy_smp).
+"""
+import struct
+from multiprocessing import shared_memory
+
+# Type of the value stored in an entry
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+
+class TranspositionTable:
+
+    def __init__(self, size_bits: int = 20):
+        """
+        :param size_bits: the table holds 2 ** size_bits entries
+        """
+        self.size = 1 << size_bits
+        self.__mask = self.size - 1
+        self.__keys = [None] * self.size
+        self.__entries = [None] * self.size
+
+        # Search generation, so entries of previous searches can be replaced even if they're deeper
+        self.__generation = 0
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def new_search(self):
+        """ Mark the start of a new search (entries from older searches become replaceable) """
+        self.__generation += 1
+
+    def clear(self):
+        """ Remove all the entries and reset the statistics """
+        self.__keys = [None] * self.size
+        self.__entries = [None] * self.size
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def probe(self, key):
+        """
+        Look up a position in the table
+        :param key: Zobrist hash of the position
+        :return: (depth, value, bound, best move, generation) if the position is in the table, None otherwise
+        """
+        index = key & self.__mask
+        if self.__keys[index] == key:
+            self.hits += 1
+            return self.__entries[index]
+        self.misses += 1
+        return None
+
+    def store(self, key, depth: int, value, bound: int, best_move):
+        """
+        Store the result of a search. An existing entry for another position is only replaced
+        if it comes from an older search or if the new result is at least as deep (depth-preferred).
+        :param key: Zobrist hash of the position
+        :param depth: remaining depth that was searched below the position
+        :param value: value found by the search
+        :param bound: EXACT, LOWER_BOUND or UPPER_BOUND
+        :param best_move: best move found (or None)
+        """
+        index = key & self.__mask
+        entry = self.__entries[index]
+        if entry is not None and self.__keys[index] != key and \
+                entry[4] == self.__generation and entry[0] > depth:
+            return
+
+        self.__keys[index] = key
+        self.__entries[index] = (depth, value, bound, best_move, self.__generation)
+        self.stores += 1
+
+    def usage(self):
+        """ Get the fraction of the table that is in use """
+        return sum(1 for key in self.__keys if key is not None) / self.size
+
+    def hit_rate(self):
+        """ Get the fraction of probes that found their position """
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def __str__(self):
+        return 'Transposition table: {} entries, {} hits, {} misses ({:.1%} hit rate), {:.1%} used'.format(
+            self.size, self.hits, self.misses, self.hit_rate(), self.usage())
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """
+    Attach to shared memory created by another process, which stays responsible for freeing it.
+    From Python 3.13 the memory isn't registered with the resource tracker of this process. Before, it's
+    registered again, which is harmless only with the tracker of the creator (a set of names, emptied when the
+    creator frees it): the worker processes share it (see parallel_search.get_executor). With a tracker of
+    their own, it would free the memory again at exit (with warnings).
+    :param name: name of the shared memory
+    :return: the shared memory
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedTranspositionTable:
+    """
+    Transposition table in shared memory (multiprocessing.shared_memory), used by the searches of several
+    processes at the same time. It's created by one process, and the others attach to it by its name.
+
+    Each entry is packed in three 64-bit words: the key XOR the two other words, the value (as a double) and
+    the rest of the result (depth, bound, best move, generation). There are no locks: an entry being written
+    by another process while it's read (or written by two processes at once) has words of different stores,
+    so its first word doesn't give back the key when XOR'd with the others, and it's ignored (a miss).
+    """
+
+    # Layout of an entry, and of the header (generation of the searches) in front of the entries
+    entry_format = struct.Struct('<3Q')
+    header_format = struct.Struct('<Q')
+    # A value is stored as the bits of a double
+    word_format = struct.Struct('<Q')
+    value_format = struct.Struct('<d')
+
+    # Fields of the data word: flags, remaining depth, bound, best move (square or no_move) and generation
+    used_flag = 1
+    integer_flag = 2
+    depth_shift = 2
+    bound_shift = 10
+    move_shift = 12
+    generation_shift = 19
+    no_move = 64
+    generation_mask = 0xFFFF
+
+    def __init__(self, size_bits: int = 20, name: str = None):
+        """
+        :param size_bits: the table holds 2 ** size_bits entries
+        :param name: name of an existing table to attach to (None creates a new table)
+        """
+        self.size = 1 << size_bits
+        self.size_bits = size_bits
+        self.__mask = self.size - 1
+        self.__owner = name is None
+        self.__memory = None
+        if self.__owner:
+            self.__memory = shared_memory.SharedMemory(
+                create=True, size=self.header_format.size + self.size * self.entry_format.size)
+        else:
+            self.__memory = attach_shared_memory(name)
+        self.name = self.__memory.name
+        self.__buffer = self.__memory.buf
+
+        # Statistics (of this process)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def new_search(self):
+        """ Mark the start of a new search (entries from older searches become replaceable) """
+        self.header_format.pack_into(self.__buffer, 0, (self.__get_generation() + 1) & self.generation_mask)
+
+    def __get_generation(self):
+        return self.header_format.unpack_from(self.__buffer, 0)[0]
+
+    def clear(self):
+        """ Remove all the entries and reset the statistics """
+        self.__buffer[self.header_format.size:] = bytes(self.size * self.entry_format.size)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def __offset(self, key):
+        return self.header_format.size + (key & self.__mask) * self.entry_format.size
+
+    def probe(self, key):
+        """
+        Look up a position in the table
+        :param key: Zobrist hash of the position
+        :return: (depth, value, bound, best move, generation) if the position is in the table, None otherwise
+        """
+        check, value_bits, data = self.entry_format.unpack_from(self.__buffer, self.__offset(key))
+        if data & self.used_flag and check ^ value_bits ^ data == key:
+            self.hits += 1
+            value = self.value_format.unpack(self.word_format.pack(value_bits))[0]
+            if data & self.integer_flag:
+                value = int(value)
+            square = (data >> self.move_shift) & 127
+            return ((data >> self.depth_shift) & 255, value, (data >> self.bound_shift) & 3,
+                    None if square == self.no_move else (square >> 3, square & 7),
+                    data >> self.generation_shift)
+        self.misses += 1
+        return None
+
+    def store(self, key, depth: int, value, bound: int, best_move):
+        """
+        Store the result of a search. An existing entry for another position is only replaced
+        if it comes from an older search or if the new result is at least as deep (depth-preferred).
+        :param key: Zobrist hash of the position
+        :param depth: remaining depth that was searched below the position
+        :param value: value found by the search
+        :param bound: EXACT, LOWER_BOUND or UPPER_BOUND
+        :param best_move: best move found (or None)
+        """
+        offset = self.__offset(key)
+        generation = self.__get_generation()
+        check, value_bits, data = self.entry_format.unpack_from(self.__buffer, offset)
+        if data & self.used_flag and check ^ value_bits ^ data != key and \
+                data >> self.generation_shift == generation and (data >> self.depth_shift) & 255 > depth:
+            return
+
+        value_bits = self.word_format.unpack(self.value_format.pack(value))[0]
+        square = self.no_move if best_move is None else best_move[0] * 8 + best_move[1]
+        data = (self.used_flag | (self.integer_flag if isinstance(value, int) else 0) |
+                min(depth, 255) << self.depth_shift | bound << self.bound_shift | square << self.move_shift |
+                generation << self.generation_shift)
+        self.entry_format.pack_into(self.__buffer, offset, key ^ value_bits ^ data, value_bits, data)
+        self.stores += 1
+
+    def usage(self):
+        """ Get the fraction of the table that is in use """
+        words = self.__buffer[self.header_format.size:].cast('Q')
+        used = sum(1 for data in words[2::3] if data & self.used_flag)
+        words.release()
+        return used / self.size
+
+    def hit_rate(self):
+        """ Get the fraction of probes that found their position """
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def release(self):
+        """ Detach from the shared memory (and free it, in the process that created the table) """
+        if self.__memory is None:
+            return
+        self.__buffer = None
+        self.__memory.close()
+        if self.__owner:
+            self.__memory.unlink()
+        self.__memory = None
+
+    def __del__(self):
+        self.release()
+
+    def __str__(self):
+        return 'Shared transposition table: {} entries, {} hits, {} misses ({:.1%} hit rate), {:.1%} used'.format(
+            self.size, self.hits, self.misses, self.hit_rate(), self.usage())
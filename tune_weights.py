@@ -0,0 +1,175 @@
+"""
+Offline tuning of the weights of the tuned heuristic (AgentType.tuned, see tuned_weights.py).
+
+Pipeline:
+    1. positions: self-play games played by OthelloRunner (each game starts with a few random moves,
+       so the games differ), and/or positions recorded by othello_runner.py --record_positions
+    2. labels: the final disc difference for the player to move; it's solved exactly (EndgameSolver)
+       for the positions with few empty squares, and taken from the result of the game otherwise
+    3. features: batch_eval.composite_features, computed on all the positions at once
+    4. fit: least squares regression of the labels on the features (numpy.linalg.lstsq)
+The fitted weights are written to tuned_weights.WEIGHTS_FILE, where AgentType.tuned loads them.
+
+Examples:
+    python tune_weights.py -g 200 -l 2
+    python tune_weights.py -g 0 -i positions.bin
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+import batch_eval
+import tuned_weights
+from board import Board, BLACK, WHITE
+from mini_max import EndgameSolver
+from othello_runner import OthelloRunner
+from player import PlayerType, create_player
+from utils import BoardEngine, create_board, convert_board, load_positions, save_positions
+
+
+def create_opening(engine: BoardEngine, plies: int, generator: random.Random):
+    """
+    Play random moves from the initial position
+    :param engine: board representation to use
+    :param plies: number of random moves
+    :param generator: random generator
+    :return: the board after the moves (or the end of the game)
+    """
+    board = create_board(engine)
+    for _ in range(plies):
+        if board.is_game_over():
+            break
+        # Sort the moves so the openings don't depend on the engine
+        moves = sorted(board.get_legal_moves())
+        board = board.execute_move(generator.choice(moves) if moves else None)
+    return board
+
+
+def play_games(games: int, level: int, player_types, engine: BoardEngine, random_plies: int, seed: int):
+    """
+    Play self-play games with OthelloRunner, recording their positions
+    :param games: number of games
+    :param level: level (search depth) of the players
+    :param player_types: types of players to pick from (at random) for each side
+    :param engine: board representation to use
+    :param random_plies: number of random moves played before the players take over
+    :param seed: seed of the random generator
+    :return: list of (cells, color to move, final disc difference (white - black))
+    """
+    generator = random.Random(seed)
+    runner = OthelloRunner(engine)
+    runner.time_out = float("inf")
+    runner.positions = []
+    for game in range(games):
+        runner.board = create_opening(engine, random_plies, generator)
+        runner.players[BLACK] = create_player(generator.choice(player_types), 'BLACK')
+        runner.players[WHITE] = create_player(generator.choice(player_types), 'WHITE')
+        runner.run_game(level)
+        print('\rgame {:5}/{}: {:7} positions'.format(game + 1, games, len(runner.positions)), end='', flush=True)
+    print()
+    return runner.positions
+
+
+def board_from_cells(cells, turn):
+    """ Create a Board with the given cells (indexed by x * 8 + y) and color to move """
+    board = Board(turn)
+    for square, cell in enumerate(cells):
+        board.set_cell(square >> 3, square & 7, cell)
+    return board
+
+
+def label_positions(positions, exact_empties: int, engine: BoardEngine):
+    """
+    Compute the target value of each position: the final disc difference for the player to move
+    :param positions: list of (cells, color to move, final disc difference (white - black))
+    :param exact_empties: solve the positions with this many empty squares or fewer with EndgameSolver
+    :param engine: board representation used by the solver
+    :return: array of labels, and the number of positions that were solved
+    """
+    labels = np.empty(len(positions))
+    solved = 0
+    for index, (cells, turn, score) in enumerate(positions):
+        if cells.count(0) <= exact_empties:
+            board = convert_board(board_from_cells(cells, turn), engine)
+            _, labels[index] = EndgameSolver(exact=True).solve(board)
+            solved += 1
+        else:
+            labels[index] = score * turn
+    return labels, solved
+
+
+def fit_weights(features, labels):
+    """
+    Fit the weights by least squares
+    :param features: (N, F) array of features
+    :param labels: (N,) array of labels
+    :return: the weights, and the root mean squared error of the fit
+    """
+    weights = np.linalg.lstsq(features, labels, rcond=None)[0]
+    error = np.sqrt(np.mean((features @ weights - labels) ** 2))
+    return weights, error
+
+
+def main():
+    player_choices = [member.value for _, member in PlayerType.__members__.items() if member.value != 'Human']
+    engines = [member.value for _, member in BoardEngine.__members__.items()]
+
+    parser = argparse.ArgumentParser(description='Fit the Weights of the Tuned Heuristic from Self-Play Games')
+    parser.add_argument('-g', '--games', help='Number of Self-Play Games (default = 100)', type=int, default=100)
+    parser.add_argument('-l', '--level', help='Level of the Self-Play Players (default = 2)', type=int, default=2)
+    parser.add_argument('-p', '--players', help='Player Types used in Self-Play (default = all)',
+                        choices=player_choices, nargs='+', default=player_choices)
+    parser.add_argument('-rm', '--random_moves', help='Random Moves at the Start of each Game (default = 6)',
+                        type=int, default=6)
+    parser.add_argument('-x', '--exact_empties',
+                        help='Solve Positions with this many Empty Squares or Fewer (default = 10)',
+                        type=int, default=10)
+    parser.add_argument('-i', '--input', help='Files of Recorded Positions to use too', nargs='*', default=[])
+    parser.add_argument('-rp', '--record_positions', help='Append the Self-Play Positions to this File', type=str)
+    parser.add_argument('-e', '--engine', help='Board Engine (default = Bitboard)',
+                        choices=engines, default=BoardEngine.bitboard.value)
+    parser.add_argument('--seed', help='Seed of the Random Moves (default = 472)', type=int, default=472)
+    parser.add_argument('-w', '--weights', help='File to Write the Weights to (default = {})'.format(
+        tuned_weights.WEIGHTS_FILE), default=tuned_weights.WEIGHTS_FILE)
+    args = parser.parse_args()
+
+    engine = BoardEngine(args.engine)
+    start_time = time.time()
+
+    positions = play_games(args.games, args.level, [PlayerType(value) for value in args.players], engine,
+                           args.random_moves, args.seed)
+    if args.record_positions:
+        save_positions(args.record_positions, positions)
+    for path in args.input:
+        positions.extend(load_positions(path))
+    if not positions:
+        print('No positions to fit')
+        return 1
+    print('{} positions ({:.1f}s)'.format(len(positions), time.time() - start_time))
+
+    labels, solved = label_positions(positions, args.exact_empties, engine)
+    print('{} positions solved exactly ({:.1f}s)'.format(solved, time.time() - start_time))
+
+    cells = np.array([position[0] for position in positions], dtype=np.int8)
+    turns = np.array([position[1] for position in positions], dtype=np.int8)
+    features = batch_eval.composite_features(cells, turns)
+
+    weights, error = fit_weights(features, labels)
+    default_values = features @ np.array(tuned_weights.DEFAULT_WEIGHTS)
+    print('Fit error (RMSE): {:.3f} discs'.format(error))
+    print('Correlation with the labels: tuned {:.3f}, composite {:.3f}'.format(
+        np.corrcoef(features @ weights, labels)[0, 1], np.corrcoef(default_values, labels)[0, 1]))
+    for name, weight in zip(tuned_weights.FEATURES, weights):
+        print('\t{:18} {:12.6f}'.format(name, weight))
+
+    tuned_weights.save_weights(weights, args.weights, details={
+        'positions': len(positions), 'solved_positions': solved, 'games': args.games, 'level': args.level,
+        'rmse': float(error), 'date': time.strftime('%Y-%m-%d %H:%M:%S')})
+    print('Weights written to {} ({:.1f}s)'.format(args.weights, time.time() - start_time))
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
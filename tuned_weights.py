@@ -0,0 +1,67 @@
+"""
+Weights of the tuned heuristic (AgentType.tuned): a weighted sum of the composite heuristic terms
+(see Board.composite_features) and of the token difference.
+
+The weights are fitted offline by tune_weights.py and read from WEIGHTS_FILE (a JSON file).
+Until the file exists, the weights of the composite heuristic are used.
+"""
+import json
+import os
+
+WEIGHTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tuned_weights.json')
+
+# Names of the features, in the order they're computed by the boards
+FEATURES = ('discs', 'corner_occupancy', 'corner_closeness', 'mobility', 'frontier', 'square_weights',
+            'token_difference')
+
+# Weights of the composite heuristic (the token difference isn't part of it)
+DEFAULT_WEIGHTS = (10.0, 801.724, 382.026, 78.922, 74.396, 10.0, 0.0)
+
+# Weights in use (loaded on first use)
+_weights = None
+
+
+def load_weights(path=WEIGHTS_FILE):
+    """
+    Read the weights from a file
+    :param path: file to read
+    :return: tuple of weights (same order as FEATURES)
+    """
+    with open(path) as weights_file:
+        content = json.load(weights_file)
+    weights = content['weights']
+    missing = [name for name in FEATURES if name not in weights]
+    if missing:
+        raise ValueError('{}: missing weights for {}'.format(path, ', '.join(missing)))
+    return tuple(float(weights[name]) for name in FEATURES)
+
+
+def save_weights(weights, path=WEIGHTS_FILE, details=None):
+    """
+    Write the weights to a file
+    :param weights: weights (same order as FEATURES)
+    :param path: file to write
+    :param details: extra information stored with the weights (e.g. how they were fitted)
+    """
+    content = {'weights': dict(zip(FEATURES, (float(weight) for weight in weights)))}
+    if details is not None:
+        content['details'] = details
+    with open(path, 'w') as weights_file:
+        json.dump(content, weights_file, indent=2)
+
+
+def get_weights():
+    """ Get the weights in use, loading them from WEIGHTS_FILE (or using the defaults) on first use """
+    global _weights
+    if _weights is None:
+        _weights = load_weights() if os.path.exists(WEIGHTS_FILE) else DEFAULT_WEIGHTS
+    return _weights
+
+
+def set_weights(weights):
+    """
+    Replace the weights in use
+    :param weights: weights (same order as FEATURES)
+    """
+    global _weights
+    _weights = tuple(float(weight) for weight in weights)
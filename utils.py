@@ -1,4 +1,64 @@
-from board import Board
+import struct
+from enum import Enum
+from board import Board, BLACK
+from bit_board import BitBoard
+
+# Layout of a recorded position: the 64 cells (indexed by x * 8 + y), the color to move
+# and the final disc difference of the game (white - black)
+POSITION_RECORD = struct.Struct('<64bbb')
+
+
+class BoardEngine(Enum):
+    list = 'List'
+    bitboard = 'Bitboard'
+
+
+def create_board(engine: BoardEngine = BoardEngine.list, turn=BLACK):
+    """
+    Create a board in the initial configuration using the specified engine
+    :param engine: board representation to use
+    :param turn: color of the player to start
+    :return: a new board
+    """
+    if engine == BoardEngine.bitboard:
+        return BitBoard(turn)
+    return Board(turn)
+
+
+def convert_board(board, engine: BoardEngine):
+    """
+    Convert a board to the specified engine (the same board is returned if no conversion is needed)
+    :param board: board to convert
+    :param engine: board representation to convert to
+    :return: a board using the specified engine
+    """
+    if engine == BoardEngine.bitboard and not isinstance(board, BitBoard):
+        return BitBoard.from_board(board)
+    if engine == BoardEngine.list and not isinstance(board, Board):
+        return board.to_board()
+    return board
+
+
+def save_positions(path: str, positions):
+    """
+    Append recorded positions to a file
+    :param path: file to write to
+    :param positions: list of (cells, color to move, final disc difference (white - black))
+    """
+    with open(path, 'ab') as positions_file:
+        for cells, turn, score in positions:
+            positions_file.write(POSITION_RECORD.pack(*cells, turn, score))
+
+
+def load_positions(path: str):
+    """
+    Read recorded positions from a file
+    :param path: file to read
+    :return: list of (cells, color to move, final disc difference (white - black))
+    """
+    with open(path, 'rb') as positions_file:
+        content = positions_file.read()
+    return [(list(values[:64]), values[64], values[65]) for values in POSITION_RECORD.iter_unpack(content)]
 
 
 def create_pass_configuration_board() -> Board: